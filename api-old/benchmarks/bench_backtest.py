@@ -0,0 +1,54 @@
+"""
+バックテストのベンチマーク
+合成データで run_backtest の所要時間と最大メモリを計測
+
+実行方法:
+    python benchmarks/bench_backtest.py --symbols 6000 --days 1260
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+from pathlib import Path
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.backtest import run_backtest, BACKTEST_SYMBOL_CHUNK
+from synthetic import generate_ohlcv
+
+FILTERS = {
+    'technical': {
+        'price_above_ma': {'ma_50': True, 'ma_200': True},
+        'rsi_14': {'min': 50, 'max': 70},
+    },
+    'comparisons': ['close > ema_21'],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='バックテストのベンチマーク')
+    parser.add_argument('--symbols', type=int, default=6000)
+    parser.add_argument('--days', type=int, default=1260)
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--symbol-chunk', type=int, default=BACKTEST_SYMBOL_CHUNK)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    frames = generate_ohlcv(args.symbols, args.days, seed=args.seed)
+    infos = {s: {'market_cap': (i % 50 + 1) * 1e9} for i, s in enumerate(frames)}
+
+    start = time.perf_counter()
+    result = run_backtest(frames, FILTERS, infos, top_k=args.top_k, symbol_chunk=args.symbol_chunk)
+    elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"銘柄数: {args.symbols}  日数: {args.days}  所要時間: {elapsed:.1f}秒  最大メモリ: {peak_mb:.0f}MB")
+    print(json.dumps(result.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
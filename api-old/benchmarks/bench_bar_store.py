@@ -0,0 +1,105 @@
+"""
+省メモリOHLCVストアのベンチマーク
+yfinance 形式の DataFrame（未使用カラム込み）と calculate_all_indicators の結果を常駐させる場合と、
+BarStore + IndicatorRecord で常駐させる場合のメモリ使用量を比較し、最新指標の誤差を確認する
+
+実行方法:
+    python benchmarks/bench_bar_store.py --symbols 6000 --days 1260
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.technical_indicators import TechnicalIndicators
+from utils.bar_store import BarStore, FLOAT32_TOLERANCES
+from synthetic import generate_ohlcv
+
+
+def as_yfinance(frames: dict) -> dict:
+    """Ticker.history と同じ形（タイムゾーン付き日付インデックス・dividends/stock splits 列あり）に変換"""
+    result = {}
+    for symbol, df in frames.items():
+        df = df.set_index('Date')
+        df.index = df.index.tz_localize('America/New_York')
+        df['dividends'] = 0.0
+        df['stock splits'] = 0.0
+        result[symbol] = df
+    return result
+
+
+def traced(build) -> tuple:
+    """build() が確保したまま保持しているメモリ（バイト）を計測"""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current
+
+
+def max_error(expected: dict, actual: dict) -> tuple:
+    """全銘柄・全指標の (最大相対誤差, 最大絶対誤差, 許容誤差を超えた件数)"""
+    worst_rel = worst_abs = 0.0
+    violations = 0
+    for symbol, values in expected.items():
+        record = actual[symbol]
+        for key, value in values.items():
+            other = record[key]
+            if value is None or other is None or isinstance(value, bool):
+                if value != other:
+                    violations += 1
+                continue
+            diff = abs(value - other)
+            rel = diff / abs(value) if value else diff
+            worst_rel, worst_abs = max(worst_rel, rel), max(worst_abs, diff)
+            if rel > FLOAT32_TOLERANCES['rel'] and diff > FLOAT32_TOLERANCES['abs']:
+                violations += 1
+    return worst_rel, worst_abs, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='省メモリOHLCVストアのベンチマーク')
+    parser.add_argument('--symbols', type=int, default=6000)
+    parser.add_argument('--days', type=int, default=1260)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    frames = as_yfinance(generate_ohlcv(args.symbols, args.days, seed=args.seed))
+
+    # 従来: 取得した DataFrame と全指標計算結果・最新指標の辞書を保持
+    def build_frames():
+        full = {s: TechnicalIndicators.calculate_all_indicators(df) for s, df in frames.items()}
+        return full, {s: TechnicalIndicators.get_latest_indicators(df) for s, df in full.items()}
+    frame_memory = sum(df.memory_usage(deep=True).sum() for df in frames.values())
+    (full, expected), indicator_memory = traced(build_frames)
+    del full
+
+    # BarStore: 使うカラムだけを float32 / uint32 / int32 で保持し、最新指標はレコードで保持
+    def build_store():
+        store = BarStore()
+        store.put_frames(frames)
+        return store, store.latest_all()
+    (store, records), store_memory = traced(build_store)
+
+    worst_rel, worst_abs, violations = max_error(expected, records)
+    mb = 1024 * 1024
+    print(f"銘柄数: {args.symbols}  本数: {args.days}")
+    print(f"DataFrame（取得直後）           {frame_memory / mb:>10.1f} MB")
+    print(f"  + calculate_all_indicators    {(frame_memory + indicator_memory) / mb:>10.1f} MB")
+    print(f"BarStore + IndicatorRecord      {store_memory / mb:>10.1f} MB  （配列 {store.nbytes / mb:.1f} MB）")
+    print(f"最大相対誤差 {worst_rel:.2e}  最大絶対誤差 {worst_abs:.2e}  許容誤差超過 {violations}件")
+    assert violations == 0, '許容誤差を超えた指標があります'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+FetchScheduler / TokenBucket の動作確認（ローカルのスタブHTTPサーバー）
+遅延と 429 を返すサーバーに対して並列取得し、スループット・リトライ・レート制限を確認する
+
+スタブサーバー:
+    - 全リクエストに --latency 秒の遅延を入れる
+    - 各キーの最初の試行の --reject-rate の割合に 429 を返す（2回目以降は 200）
+    - 受け付けた時刻を記録し、任意の1秒間のリクエスト数を集計する
+
+確認する内容:
+    - 全キーが取得できる（429 はバックオフ後のリトライで成功する）
+    - リトライ回数 = 429 を返した回数
+    - サーバーが受けた任意の1秒間のリクエスト数が calls_per_second + burst を超えない
+    - 全体のスループットが calls_per_second を大きく超えない
+
+実行方法:
+    python benchmarks/bench_fetch_scheduler.py --keys 200 --workers 8 --rate 50
+"""
+import argparse
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+
+from utils.fetch_scheduler import FetchScheduler, TokenBucket, RateLimitError
+
+
+class StubServer:
+    """遅延と 429 を返すスタブサーバー（受付時刻と 429 の回数を記録）"""
+
+    def __init__(self, latency: float, reject_rate: float, seed: int = 0):
+        self.latency = latency
+        self.reject_rate = reject_rate
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.arrivals = []
+        self.rejected = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                key = self.path.lstrip('/')
+                with stub.lock:
+                    stub.arrivals.append(time.monotonic())
+                    first = key not in stub.seen
+                    stub.seen.add(key)
+                    reject = first and stub.rng.random() < stub.reject_rate
+                    if reject:
+                        stub.rejected += 1
+                time.sleep(stub.latency)
+                body = b'rate limited' if reject else key.encode()
+                self.send_response(429 if reject else 200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def max_per_second(self) -> int:
+        """任意の1秒間に受け付けたリクエスト数の最大値"""
+        arrivals = np.sort(np.array(self.arrivals))
+        if len(arrivals) == 0:
+            return 0
+        ends = np.searchsorted(arrivals, arrivals + 1.0, side='left')
+        return int((ends - np.arange(len(arrivals))).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FetchScheduler / TokenBucket のスタブサーバー確認')
+    parser.add_argument('--keys', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=50.0, help='calls_per_second')
+    parser.add_argument('--latency', type=float, default=0.05, help='サーバーの遅延（秒）')
+    parser.add_argument('--reject-rate', type=float, default=0.3, help='最初の試行に 429 を返す割合')
+    parser.add_argument('--base-delay', type=float, default=0.2, help='バックオフの基準秒数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with StubServer(args.latency, args.reject_rate, args.seed) as stub:
+        def fetch(key: str) -> str:
+            try:
+                with urllib.request.urlopen(f'{stub.url}/{key}', timeout=10) as response:
+                    return response.read().decode()
+            except urllib.error.HTTPError as e:
+                if e.code == 429:
+                    raise RateLimitError(f'429 Too Many Requests: {key}') from e
+                raise
+
+        limiter = TokenBucket(calls_per_second=args.rate, calls_per_hour=1_000_000)
+        scheduler = FetchScheduler(
+            max_workers=args.workers, limiter=limiter, max_retries=5, base_delay=args.base_delay
+        )
+        keys = [f'SYM{i:05d}' for i in range(args.keys)]
+
+        started = time.perf_counter()
+        results = list(scheduler.stream(keys, fetch))
+        elapsed = time.perf_counter() - started
+
+    succeeded = [r for r in results if r.error is None and r.value == r.key]
+    retries = sum(r.attempts - 1 for r in results)
+    requests = len(stub.arrivals)
+    throughput = requests / elapsed
+    peak = stub.max_per_second()
+    capacity = limiter.second_capacity
+
+    print(f"キー数:            {args.keys}（workers {args.workers}, {args.rate:g} calls/s, 遅延 {args.latency * 1000:.0f}ms）")
+    print(f"成功:              {len(succeeded)} / {len(results)}")
+    print(f"429 / リトライ:    {stub.rejected} / {retries}")
+    print(f"リクエスト数:      {requests}（{elapsed:.2f}秒, {throughput:.1f} req/s）")
+    print(f"1秒間の最大件数:   {peak}（上限 {args.rate:g} + バースト {capacity:g}）")
+    print(f"リミッターの待機:  {limiter.stats()['total_wait_seconds']}秒（累計）")
+
+    assert len(succeeded) == args.keys, '取得できなかったキーがあります'
+    assert retries == stub.rejected, 'リトライ回数が 429 の回数と一致しません'
+    assert requests == args.keys + stub.rejected
+    assert peak <= args.rate + capacity, '1秒間のリクエスト数がレート制限を超えています'
+    # 最初のバースト分を除いた平均レートが上限を超えない
+    assert (requests - capacity) / elapsed <= args.rate * 1.05, 'スループットがレート制限を超えています'
+    print('\nOK')
+
+
+if __name__ == '__main__':
+    main()
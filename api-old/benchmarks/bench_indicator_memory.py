@@ -0,0 +1,79 @@
+"""
+calculate_all_indicators のメモリ・速度ベンチマーク
+1銘柄あたりの確保メモリのピーク（tracemalloc）と所要時間を計測する
+
+実行方法:
+    python benchmarks/bench_indicator_memory.py --symbols 200 --days 252 1260
+"""
+import argparse
+import gc
+import inspect
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+
+from utils.technical_indicators import TechnicalIndicators
+from synthetic import generate_ohlcv
+
+
+def peak_per_symbol(frames: dict, **kwargs) -> float:
+    """1銘柄ずつ計算して結果を捨てた場合の確保メモリのピーク（平均、バイト）"""
+    peaks = []
+    for df in frames.values():
+        gc.collect()
+        tracemalloc.start()
+        TechnicalIndicators.calculate_all_indicators(df, **kwargs)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def seconds_per_symbol(frames: dict, **kwargs) -> float:
+    start = time.perf_counter()
+    for df in frames.values():
+        TechnicalIndicators.calculate_all_indicators(df, **kwargs)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='calculate_all_indicators のメモリ・速度ベンチマーク')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--days', type=int, nargs='+', default=[252, 1260])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # 変更前の版と比較できるよう、引数がない場合は既定の呼び出しだけ計測する
+    parameters = inspect.signature(TechnicalIndicators.calculate_all_indicators).parameters
+
+    print(f"{'days':>6} {'variant':>8} {'peak(KB)/symbol':>16} {'ms/symbol':>10}")
+    for days in args.days:
+        frames = generate_ohlcv(args.symbols, days, seed=args.seed)
+        variants = {'copy': {}}
+        if 'inplace' in parameters:
+            variants['inplace'] = {'inplace': True}
+        if 'out' in parameters:
+            from utils.technical_indicators import INDICATOR_COLUMNS
+            variants['out'] = {'out': np.empty((len(INDICATOR_COLUMNS), days))}
+        for name, kwargs in variants.items():
+            if kwargs.get('inplace'):
+                # 入力を書き換えるため、計測ごとに複製する（複製は計測に含めない）
+                peak = sum(
+                    peak_per_symbol({s: df.copy()}, **kwargs) for s, df in frames.items()
+                ) / len(frames)
+                elapsed = seconds_per_symbol({s: df.copy() for s, df in frames.items()}, **kwargs)
+            else:
+                peak = peak_per_symbol(frames, **kwargs)
+                elapsed = seconds_per_symbol(frames, **kwargs)
+            print(f"{days:>6} {name:>8} {peak / 1024:>16.1f} {elapsed * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
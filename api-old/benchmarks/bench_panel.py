@@ -0,0 +1,123 @@
+"""
+パネル計算ベンチマーク
+銘柄別ループ（calculate_all_indicators）とパネル一括計算の速度を比較
+
+速度の計測とは別に、上場日がずれた銘柄・途中に欠損日がある銘柄を含む場合も
+パネルの全系列（最新行だけでなく全行）が銘柄別計算と一致することを確認する。
+
+実行方法:
+    python benchmarks/bench_panel.py --sizes 500 2000 6000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.technical_indicators import TechnicalIndicators, INDICATOR_COLUMNS
+from synthetic import generate_ohlcv
+
+
+def run_per_symbol(frames: dict) -> dict:
+    """銘柄別ループで最新指標を計算"""
+    return {
+        symbol: TechnicalIndicators.get_latest_indicators(
+            TechnicalIndicators.calculate_all_indicators(df)
+        )
+        for symbol, df in frames.items()
+    }
+
+
+def run_panel(frames: dict) -> dict:
+    """パネル一括計算で最新指標を計算"""
+    panel = TechnicalIndicators.build_panel(frames)
+    indicators = TechnicalIndicators.calculate_all_indicators_panel(panel)
+    return TechnicalIndicators.get_latest_indicators_panel(indicators)
+
+
+def assert_identical(expected: dict, actual: dict):
+    """両経路の結果が完全一致することを確認"""
+    assert expected.keys() == actual.keys(), '銘柄集合が一致しません'
+    for symbol, row in expected.items():
+        for key, value in row.items():
+            other = actual[symbol][key]
+            if value is None or other is None:
+                assert value is other, f'{symbol}.{key}: {value} != {other}'
+            else:
+                assert value == other or (np.isnan(value) and np.isnan(other)), \
+                    f'{symbol}.{key}: {value} != {other}'
+
+
+def irregular_frames(frames: dict, seed: int) -> dict:
+    """
+    1/3 の銘柄は上場日を遅らせ（先頭を削る）、1/3 の銘柄は途中の日付を削った履歴にする
+    """
+    rng = np.random.default_rng(seed)
+    result = {}
+    for i, (symbol, df) in enumerate(frames.items()):
+        n = len(df)
+        if i % 3 == 1:
+            df = df.iloc[rng.integers(1, n // 2):]
+        elif i % 3 == 2:
+            keep = np.ones(n, dtype=bool)
+            keep[rng.choice(np.arange(1, n - 1), size=max(n // 20, 1), replace=False)] = False
+            df = df[keep]
+        result[symbol] = df.reset_index(drop=True)
+    return result
+
+
+def assert_series_match(frames: dict):
+    """パネルの全系列が銘柄別計算と一致し、銘柄にない日付の行は NaN であることを確認"""
+    indicators = TechnicalIndicators.calculate_all_indicators_panel(TechnicalIndicators.build_panel(frames))
+    index = indicators['close'].index
+    for symbol, df in frames.items():
+        expected = TechnicalIndicators.calculate_all_indicators(df)
+        rows = index.get_indexer(pd.DatetimeIndex(df['Date']))
+        others = np.setdiff1d(np.arange(len(index)), rows)
+        for name in INDICATOR_COLUMNS:
+            actual = indicators[name][symbol].to_numpy()
+            np.testing.assert_allclose(
+                actual[rows], expected[name].to_numpy(), rtol=1e-9, atol=1e-9, err_msg=f'{symbol}.{name}'
+            )
+            assert np.isnan(actual[others]).all(), f'{symbol}.{name}: 銘柄にない日付に値があります'
+        perfect_order = indicators['perfect_order_bullish'][symbol].to_numpy()
+        assert (perfect_order[rows] == expected['perfect_order_bullish'].to_numpy()).all(), symbol
+        assert not perfect_order[others].any(), symbol
+
+
+def main():
+    parser = argparse.ArgumentParser(description='パネル計算ベンチマーク')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 6000])
+    parser.add_argument('--days', type=int, default=252)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # 上場日のずれ・途中の欠損日を含む履歴で全系列の一致を確認
+    assert_series_match(irregular_frames(generate_ohlcv(60, args.days, seed=args.seed), args.seed))
+    print('全系列の一致: OK（上場日のずれ・途中の欠損日を含む60銘柄）\n')
+
+    print(f"{'symbols':>8} {'per-symbol(s)':>14} {'panel(s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        frames = generate_ohlcv(size, args.days, seed=args.seed)
+
+        start = time.perf_counter()
+        expected = run_per_symbol(frames)
+        per_symbol_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = run_panel(frames)
+        panel_time = time.perf_counter() - start
+
+        assert_identical(expected, actual)
+        print(f"{size:>8} {per_symbol_time:>14.2f} {panel_time:>10.2f} {per_symbol_time / panel_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
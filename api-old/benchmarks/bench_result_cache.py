@@ -0,0 +1,121 @@
+"""
+スクリーニング結果キャッシュのベンチマーク
+同じ条件のリクエストを同時に送った場合と、同じ条件を繰り返した場合の
+スクリーニング実行回数・一括ダウンロードした銘柄数・応答時間を、結果キャッシュあり / なしで比較する
+
+ネットワークは使わない（yf.download の代わりに --fetch-delay 秒待って合成データを返す）。
+日足キャッシュは一時ディレクトリに作り、シナリオごとに空にする。
+
+実行方法:
+    python benchmarks/bench_result_cache.py --symbols 500 --concurrency 8
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# 日足キャッシュは screen の読み込み前に一時ディレクトリへ向ける
+cache_dir = tempfile.mkdtemp(prefix='bench-result-cache-')
+os.environ['OHLCV_CACHE_DIR'] = cache_dir
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import screen
+from utils import shared_state
+from utils.fundamentals_cache import FundamentalsCache
+from utils.result_cache import ScreenResultCache
+from utils.yfinance_wrapper import YFinanceWrapper
+from bench_suite import FILTERS, call_handler, synthetic_info
+from synthetic import generate_ohlcv
+
+
+def main():
+    parser = argparse.ArgumentParser(description='スクリーニング結果キャッシュのベンチマーク')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8, help='同時に送る同じ条件のリクエスト数')
+    parser.add_argument('--repeat', type=int, default=5, help='繰り返し送るリクエスト数')
+    parser.add_argument('--fetch-delay', type=float, default=0.2, help='一括ダウンロード1回の待ち時間（秒）')
+    args = parser.parse_args()
+
+    frames = generate_ohlcv(args.symbols, 252, seed=42)
+    symbols = list(frames)
+    counts = {'downloaded': 0, 'screens': 0}
+    lock = threading.Lock()
+
+    def download_history_chunks(self, chunk, chunk_size, raise_errors, **kwargs):
+        time.sleep(args.fetch_delay)
+        with lock:
+            counts['downloaded'] += len(chunk)
+        return {s: frames[s] for s in chunk}, {}
+
+    screen_stocks = screen.handler._screen_stocks
+
+    def counted_screen_stocks(self, *a, **kw):
+        with lock:
+            counts['screens'] += 1
+        return screen_stocks(self, *a, **kw)
+
+    YFinanceWrapper._download_history_chunks = download_history_chunks
+    YFinanceWrapper.get_stock_info = lambda self, symbol, raise_errors=False, fields=None: synthetic_info(symbol)
+    screen.handler._screen_stocks = counted_screen_stocks
+    screen.FUNDAMENTALS_CACHE = FundamentalsCache()
+
+    def reset():
+        shutil.rmtree(cache_dir)
+        os.makedirs(cache_dir)
+        screen.RESULT_CACHE = ScreenResultCache(ohlcv_cache=screen.OHLCV_CACHE)
+        counts.update(downloaded=0, screens=0)
+
+    def request(cache: bool) -> float:
+        started = time.perf_counter()
+        body = json.loads(call_handler({'symbols': symbols, 'filters': FILTERS, 'cache': cache}))
+        assert body['total_count'] >= 0
+        return (time.perf_counter() - started) * 1000
+
+    rows = []
+    for cache in (False, True):
+        # 同じ条件の同時リクエスト（日足キャッシュが空の状態から）
+        reset()
+        flights_before = shared_state.yf_wrapper().history_flights.stats()['coalesced']
+        # call_handler は標準出力を差し替えるため、スレッド間で入れ替わらないよう外側でも差し替える
+        with redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            timings = list(executor.map(lambda _: request(cache), range(args.concurrency)))
+        coalesced_fetches = shared_state.yf_wrapper().history_flights.stats()['coalesced'] - flights_before
+        rows.append((
+            f"concurrent x{args.concurrency}", cache, counts['screens'], counts['downloaded'],
+            coalesced_fetches, screen.RESULT_CACHE.stats()['coalesced'], max(timings),
+        ))
+
+        # 同じ条件の繰り返し（日足キャッシュは作成済み）
+        counts.update(downloaded=0, screens=0)
+        timings = [request(cache) for _ in range(args.repeat)]
+        rows.append((
+            f"repeat x{args.repeat}", cache, counts['screens'], counts['downloaded'],
+            0, screen.RESULT_CACHE.stats()['hits'], statistics.median(timings),
+        ))
+
+    print(f"{args.symbols}銘柄 / ダウンロード待ち {args.fetch_delay}s")
+    print(f"\n{'scenario':<16} {'cache':>6} {'screens':>8} {'downloaded':>11} "
+          f"{'fetch shared':>13} {'cache shared':>13} {'latency(ms)':>12}")
+    for name, cache, screens, downloaded, fetch_shared, cache_shared, latency in rows:
+        print(f"{name:<16} {str(cache):>6} {screens:>8} {downloaded:>11} "
+              f"{fetch_shared:>13} {cache_shared:>13} {latency:>12.1f}")
+    print("\n(concurrent の latency は最も遅いリクエスト、repeat は中央値。"
+          "cache shared は concurrent が集約したリクエスト数、repeat がキャッシュヒット数)")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+プロセス並列化ベンチマーク
+ScreenPlan.evaluate_history の単一プロセス実行と ShardedEvaluator のプロセス数別の速度を比較
+
+実行方法:
+    python benchmarks/bench_sharded.py --symbols 6000 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.screen_planner import ScreenPlan
+from utils.sharded_compute import ShardedEvaluator, DEFAULT_SHARD_SIZE
+from synthetic import generate_ohlcv
+
+# 半数程度が通過する条件（通過銘柄は全指標を計算する）
+FILTERS = {'technical': {'price_above_ma': {'ma_200': True}}}
+
+# screen.py の HISTORY_CHUNK_SIZE と同じ単位で届く想定
+FETCH_CHUNK = 100
+
+
+def run_single(frames: dict) -> dict:
+    """単一プロセスで判定・計算"""
+    plan = ScreenPlan(FILTERS)
+    passed = {}
+    for symbol, df in frames.items():
+        values = plan.evaluate_history(df)
+        if values is not None:
+            passed[symbol] = values
+    return passed
+
+
+def run_sharded(frames: dict, workers: int, shard_size: int) -> dict:
+    """プロセスプールで判定・計算"""
+    symbols = list(frames)
+    stream = (
+        {s: frames[s] for s in symbols[i:i + FETCH_CHUNK]}
+        for i in range(0, len(symbols), FETCH_CHUNK)
+    )
+    with ShardedEvaluator(ScreenPlan(FILTERS), FILTERS, workers=workers, shard_size=shard_size) as evaluator:
+        return dict(evaluator.evaluate(stream))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='プロセス並列化ベンチマーク')
+    parser.add_argument('--symbols', type=int, default=6000)
+    parser.add_argument('--days', type=int, default=252)
+    parser.add_argument('--workers', type=int, nargs='+', default=None)
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers_list = args.workers or sorted({1, 2, 4, 8, 16, cores} & set(range(1, cores + 1)))
+    frames = generate_ohlcv(args.symbols, args.days, seed=args.seed)
+
+    start = time.perf_counter()
+    expected = run_single(frames)
+    single_time = time.perf_counter() - start
+
+    print(f"CPUコア数: {cores}  銘柄数: {args.symbols}  通過: {len(expected)}")
+    print(f"{'workers':>8} {'time(s)':>10} {'speedup':>8}")
+    print(f"{'single':>8} {single_time:>10.2f} {1.0:>7.1f}x")
+    for workers in workers_list:
+        start = time.perf_counter()
+        actual = run_sharded(frames, workers, args.shard_size)
+        elapsed = time.perf_counter() - start
+
+        assert actual == expected, f'workers={workers}: 結果が一致しません'
+        print(f"{workers:>8} {elapsed:>10.2f} {single_time / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
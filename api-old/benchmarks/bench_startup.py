@@ -0,0 +1,92 @@
+"""
+コールドスタートのベンチマーク
+各エントリポイントを新しいPythonプロセスで読み込んだときの import 時間と、
+screen の1回目・2回目のリクエスト（合成データ、ネットワークなし）の応答時間を計測する
+
+Serverless Function はリクエストのたびにこの import 時間と1回目の応答時間がかかりうる。
+常駐サービス（service.py）では2回目以降の応答時間になる。
+
+実行方法:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+api_dir = Path(__file__).parent.parent
+
+# エントリポイント → 読み込み方法
+ENTRY_POINTS = {
+    'screen.py': 'import screen',
+    'python/get-stock-data.py': 'load("python/get-stock-data.py")',
+    'cron/update-symbols.py': 'load("cron/update-symbols.py")',
+    'cron/update-snapshot.py': 'load("cron/update-snapshot.py")',
+    'service.py': 'import service',
+}
+
+IMPORT_SCRIPT = """
+import importlib.util, json, sys, time
+sys.path.insert(0, {api_dir!r})
+def load(path):
+    spec = importlib.util.spec_from_file_location('entry', {api_dir!r} + '/' + path)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'ms': elapsed * 1000, 'yfinance': 'yfinance' in sys.modules, 'pandas': 'pandas' in sys.modules}}))
+"""
+
+REQUEST_SCRIPT = """
+import io, json, sys, time
+from contextlib import redirect_stdout
+sys.path.insert(0, {api_dir!r})
+sys.path.insert(0, {api_dir!r} + '/benchmarks')
+started = time.perf_counter()
+import bench_suite
+from synthetic import generate_ohlcv
+import_ms = (time.perf_counter() - started) * 1000
+frames = generate_ohlcv({symbols}, 252, seed=42)
+timings = []
+with bench_suite.offline_wrapper(frames):
+    for _ in range(2):
+        started = time.perf_counter()
+        bench_suite.call_handler({{'symbols': list(frames), 'filters': bench_suite.FILTERS}})
+        timings.append((time.perf_counter() - started) * 1000)
+print(json.dumps({{'import_ms': import_ms, 'first_ms': timings[0], 'second_ms': timings[1]}}))
+"""
+
+
+def run_python(script: str) -> dict:
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='コールドスタートのベンチマーク')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--symbols', type=int, default=100, help='screen のリクエストの銘柄数')
+    args = parser.parse_args()
+
+    print(f"{'entry point':<28} {'import(ms)':>11} {'pandas':>7} {'yfinance':>9}")
+    for name, statement in ENTRY_POINTS.items():
+        runs = [
+            run_python(IMPORT_SCRIPT.format(api_dir=str(api_dir), statement=statement))
+            for _ in range(args.repeat)
+        ]
+        median = statistics.median(r['ms'] for r in runs)
+        print(f"{name:<28} {median:>11.1f} {str(runs[0]['pandas']):>7} {str(runs[0]['yfinance']):>9}")
+
+    runs = [
+        run_python(REQUEST_SCRIPT.format(api_dir=str(api_dir), symbols=args.symbols))
+        for _ in range(args.repeat)
+    ]
+    print(f"\nscreen（{args.symbols}銘柄、新しいプロセス、中央値）")
+    for key, label in (('import_ms', 'import'), ('first_ms', '1回目のリクエスト'), ('second_ms', '2回目のリクエスト')):
+        print(f"   {label:<20} {statistics.median(r[key] for r in runs):>9.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+get-stock-data の時系列ペイロードのベンチマーク
+従来の行ごとの組み立て（itertuples + セルごとの pd.isna、標準の json）と、
+列指向の組み立て（series_columns、orjson / json、gzip）の所要時間・サイズを比較する
+
+実行方法:
+    python benchmarks/bench_stock_payload.py --window 90 --repeat 200
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import response_encoding
+from utils.technical_indicators import TechnicalIndicators
+from synthetic import generate_ohlcv
+
+SERIES_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'ma_10', 'ma_20', 'ma_50', 'ma_200')
+
+
+def legacy_rows(df: pd.DataFrame, window: int) -> list:
+    """従来の組み立て（列名は小文字に直したもの）"""
+    return [
+        {
+            'date': str(row.Date.date()),
+            'open': float(row.open),
+            'high': float(row.high),
+            'low': float(row.low),
+            'close': float(row.close),
+            'volume': int(row.volume),
+            **{
+                ma: float(getattr(row, ma)) if hasattr(row, ma) and not pd.isna(getattr(row, ma)) else None
+                for ma in ('ma_10', 'ma_20', 'ma_50', 'ma_200')
+            },
+        }
+        for row in df.iloc[-window:].itertuples()
+    ]
+
+
+def per_call_ms(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='get-stock-data の時系列ペイロードのベンチマーク')
+    parser.add_argument('--window', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    df = next(iter(generate_ohlcv(1, args.window + 252, seed=42).values()))
+    df = TechnicalIndicators.calculate_all_indicators(df)
+
+    def columnar():
+        return response_encoding.series_columns(df, SERIES_COLUMNS, window=args.window)
+
+    def stdlib_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    cases = [
+        ('rows + json (legacy)', lambda: json.dumps(legacy_rows(df, args.window)).encode()),
+        ('columns + json', lambda: stdlib_dumps(columnar())),
+    ]
+    if response_encoding.orjson is not None:
+        cases.append(('columns + orjson', lambda: response_encoding.dumps(columnar())))
+
+    print(f"{args.window}本 × {len(SERIES_COLUMNS)}列（orjson: {response_encoding.orjson is not None}）")
+    print(f"\n{'case':<24} {'build+encode(ms)':>17} {'bytes':>9} {'gzip bytes':>11} {'gzip(ms)':>9}")
+    for name, func in cases:
+        body = func()
+        compressed = gzip.compress(body, compresslevel=response_encoding.GZIP_LEVEL)
+        gzip_ms = per_call_ms(lambda: gzip.compress(body, compresslevel=response_encoding.GZIP_LEVEL), args.repeat)
+        print(f"{name:<24} {per_call_ms(func, args.repeat):>17.3f} {len(body):>9} {len(compressed):>11} {gzip_ms:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
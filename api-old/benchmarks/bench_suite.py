@@ -0,0 +1,338 @@
+"""
+オフライン・ベンチマークスイート
+シード固定の合成OHLCVで指標計算・フィルター・スコア・スクリーニングAPI全体・JSONシリアライズを計測し、
+結果をJSONで保存する。基準の結果と比較して、しきい値を超えて遅くなったケースを検出する。
+
+ネットワークは使わない（YFinanceWrapper の取得メソッドは合成データを返すスタブに差し替える）。
+
+実行方法:
+    python benchmarks/bench_suite.py --output bench-results.json
+    python benchmarks/bench_suite.py --sizes 100 --periods 1y --compare bench-results.json
+    python benchmarks/bench_suite.py --compare base.json head.json --threshold 0.15
+
+既定（100/1,000/6,000銘柄 × 1y/5y、各3回）は数十分かかる。性能低下があれば終了コード1で終わる。
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import screen
+from utils.technical_indicators import TechnicalIndicators
+from utils.yfinance_wrapper import YFinanceWrapper
+from utils.fundamentals_cache import FundamentalsCache
+from utils.result_cache import ScreenResultCache
+from synthetic import generate_ohlcv
+
+# 期間 → 営業日数
+PERIODS = {'1y': 252, '5y': 1260}
+
+DEFAULT_SIZES = [100, 1000, 6000]
+DEFAULT_PERIODS = ['1y', '5y']
+
+# 計測対象のフィルター条件（フロントエンドの初期値に近い組み合わせ）
+FILTERS = {
+    'technical': {
+        'price_above_ma': {'ma_50': True, 'ma_200': True},
+        'rsi_14': {'min': 30, 'max': 80},
+    },
+    'fundamental': {
+        'price_range': {'min': 5},
+        'market_cap': {'min': 300_000_000},
+    },
+}
+
+# 比較時にこれより小さい差（秒）は誤差として扱う
+NOISE_FLOOR_SECONDS = 0.001
+
+SECTORS = ('Technology', 'Healthcare', 'Energy', 'Financial Services', 'Industrials')
+
+
+def synthetic_info(symbol: str) -> Dict[str, Any]:
+    """シンボルから決まる合成の銘柄情報（get_stock_info と同じ形式）"""
+    i = int(symbol[3:])
+    return {
+        'symbol': symbol,
+        'name': f'Synthetic {symbol}',
+        'sector': SECTORS[i % len(SECTORS)],
+        'industry': 'Synthetic',
+        'market_cap': (i % 97 + 1) * 250_000_000,
+        'current_price': 0,
+        'exchange': 'NASDAQ' if i % 2 else 'NYSE',
+        'country': 'United States',
+    }
+
+
+@contextmanager
+def offline_wrapper(frames: Dict[str, pd.DataFrame]) -> Iterator[None]:
+    """
+    YFinanceWrapper の取得メソッドと screen.py のキャッシュを差し替える
+
+    Args:
+        frames: 過去データとして返す合成OHLCV
+    """
+    def get_historical_data_bulk(self, symbols, period='1y', **kwargs):
+        return {s: frames[s] for s in symbols if s in frames}
+
+    def get_historical_data(self, symbol, period='1y', **kwargs):
+        return frames.get(symbol)
+
+    def get_stock_info(self, symbol, raise_errors=False, fields=None):
+        return synthetic_info(symbol)
+
+    originals = {
+        name: getattr(YFinanceWrapper, name)
+        for name in ('get_historical_data_bulk', 'get_historical_data', 'get_stock_info')
+    }
+    fundamentals_cache = screen.FUNDAMENTALS_CACHE
+    result_cache = screen.RESULT_CACHE
+    YFinanceWrapper.get_historical_data_bulk = get_historical_data_bulk
+    YFinanceWrapper.get_historical_data = get_historical_data
+    YFinanceWrapper.get_stock_info = get_stock_info
+    # ディスク上のキャッシュに左右されないよう、メモリのみの空キャッシュを使う
+    screen.FUNDAMENTALS_CACHE = FundamentalsCache()
+    # 繰り返し計測するため結果キャッシュは保存しない
+    screen.RESULT_CACHE = ScreenResultCache(max_entries=0)
+    try:
+        yield
+    finally:
+        for name, method in originals.items():
+            setattr(YFinanceWrapper, name, method)
+        screen.FUNDAMENTALS_CACHE = fundamentals_cache
+        screen.RESULT_CACHE = result_cache
+
+
+def bare_handler() -> 'screen.handler':
+    """ソケットを持たない screen.handler（メソッド単体の計測用）"""
+    h = screen.handler.__new__(screen.handler)
+    h.diagnostics = screen.Diagnostics(enabled=False)
+    return h
+
+
+def call_handler(body: dict) -> bytes:
+    """
+    screen.handler.do_POST をメモリ上のリクエストで実行
+
+    Returns:
+        レスポンスボディ
+    """
+    h = screen.handler.__new__(screen.handler)
+    raw = json.dumps(body).encode('utf-8')
+    h.headers = {'Content-Length': str(len(raw))}
+    h.rfile = io.BytesIO(raw)
+    h.wfile = io.BytesIO()
+    h.path = '/api/screen'
+    status = []
+    h.send_response = status.append
+    h.send_header = lambda *args: None
+    h.end_headers = lambda: None
+    # ステージ別件数などのログは計測結果の表示と混ざるため捨てる
+    with redirect_stdout(io.StringIO()):
+        h.do_POST()
+    if status != [200]:
+        raise RuntimeError(f'screen handler が {status} を返しました: {h.wfile.getvalue()[:200]!r}')
+    return h.wfile.getvalue()
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    func を repeat 回実行して所要時間を集計
+
+    Returns:
+        最小・中央値・平均（秒）と各回の計測値
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min_s': round(min(timings), 6),
+        'median_s': round(statistics.median(timings), 6),
+        'mean_s': round(statistics.fmean(timings), 6),
+        'runs_s': [round(t, 6) for t in timings],
+    }
+
+
+def run_case_set(size: int, period: str, repeat: int, seed: int) -> Dict[str, Dict[str, Any]]:
+    """
+    1つの銘柄数 × 期間の組み合わせで全ケースを計測
+
+    Returns:
+        ケース名をキーとした計測結果
+    """
+    frames = generate_ohlcv(size, PERIODS[period], seed=seed)
+    symbols = list(frames)
+    h = bare_handler()
+
+    # 後続のケースの入力を作る（計測対象外）
+    full = {s: TechnicalIndicators.calculate_all_indicators(df) for s, df in frames.items()}
+    latest = [TechnicalIndicators.get_latest_indicators(df) for df in full.values()]
+    infos = [synthetic_info(s) for s in symbols]
+
+    with offline_wrapper(frames):
+        response = json.loads(call_handler({'symbols': symbols, 'filters': FILTERS}))
+
+    cases = {
+        'calculate_all_indicators': lambda: [
+            TechnicalIndicators.calculate_all_indicators(df) for df in frames.values()
+        ],
+        'get_latest_indicators': lambda: [
+            TechnicalIndicators.get_latest_indicators(df) for df in full.values()
+        ],
+        '_apply_filters': lambda: [h._apply_filters(values, FILTERS) for values in latest],
+        '_calculate_score': lambda: [
+            h._calculate_score(values, info) for values, info in zip(latest, infos)
+        ],
+        'json_serialize': lambda: json.dumps(response, ensure_ascii=False),
+    }
+
+    results = {}
+    for name, func in cases.items():
+        results[name] = measure(func, repeat)
+
+    def screen_end_to_end():
+        with offline_wrapper(frames):
+            call_handler({'symbols': symbols, 'filters': FILTERS})
+
+    results['screen_handler'] = measure(screen_end_to_end, repeat)
+    results['screen_handler']['matched'] = response['total_count']
+    results['json_serialize']['rows'] = len(response['results'])
+
+    for name, result in results.items():
+        result.update({
+            'symbols': size,
+            'period': period,
+            'days': PERIODS[period],
+            'per_symbol_us': round(result['median_s'] / size * 1e6, 3),
+        })
+    return results
+
+
+def environment(seed: int, repeat: int) -> Dict[str, Any]:
+    """計測環境（結果を比較するときの前提条件）"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=api_dir,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'repeat': repeat,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[Dict[str, Any]]:
+    """
+    中央値で2つの結果を比較
+
+    Args:
+        baseline: 基準の結果
+        current: 比較対象の結果
+        threshold: 遅くなった割合のしきい値（0.1 = 10%）
+
+    Returns:
+        両方に存在するケースごとの比較結果（regression=True が性能低下）
+    """
+    rows = []
+    for key, result in current['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+        ratio = result['median_s'] / base['median_s'] if base['median_s'] > 0 else float('inf')
+        rows.append({
+            'case': key,
+            'baseline_s': base['median_s'],
+            'current_s': result['median_s'],
+            'ratio': round(ratio, 3),
+            'regression': ratio > 1 + threshold and result['median_s'] - base['median_s'] > NOISE_FLOOR_SECONDS,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], threshold: float):
+    print(f"\n{'case':<40} {'base(s)':>10} {'current(s)':>11} {'ratio':>7}")
+    for row in rows:
+        mark = '  ⚠️ REGRESSION' if row['regression'] else ''
+        print(f"{row['case']:<40} {row['baseline_s']:>10.4f} {row['current_s']:>11.4f} {row['ratio']:>6.2f}x{mark}")
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f"\n❌ {len(regressions)}件のケースが {threshold:.0%} 以上遅くなりました")
+    else:
+        print(f"\n✅ {threshold:.0%} を超える性能低下はありません（{len(rows)}ケース）")
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='オフライン・ベンチマークスイート')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--periods', nargs='+', choices=sorted(PERIODS), default=DEFAULT_PERIODS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='結果のJSONの保存先')
+    parser.add_argument(
+        '--compare', nargs='+', metavar='RESULTS',
+        help='基準の結果（2つ指定した場合は計測せず、2つのファイルを比較）'
+    )
+    parser.add_argument('--threshold', type=float, default=0.10, help='性能低下とみなす割合（既定 0.10）')
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error('--compare には1つまたは2つのファイルを指定してください')
+
+    if args.compare and len(args.compare) == 2:
+        baseline, current = (load_results(path) for path in args.compare)
+    else:
+        current = {'environment': environment(args.seed, args.repeat), 'results': {}}
+        print(f"{'case':<40} {'median(s)':>10} {'per-symbol(us)':>15}")
+        for period in args.periods:
+            for size in args.sizes:
+                for name, result in run_case_set(size, period, args.repeat, args.seed).items():
+                    key = f'{name}/{size}x{period}'
+                    current['results'][key] = result
+                    print(f"{key:<40} {result['median_s']:>10.4f} {result['per_symbol_us']:>15.1f}")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, ensure_ascii=False, indent=2)
+            print(f"💾 {args.output} に保存")
+        baseline = load_results(args.compare[0]) if args.compare else None
+
+    if baseline is not None:
+        rows = compare(baseline, current, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
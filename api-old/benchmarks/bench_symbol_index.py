@@ -0,0 +1,79 @@
+"""
+銘柄インデックスのベンチマーク
+public/all-symbols.json を毎回読み込んで線形に探す場合と、SymbolIndex（SQLite）で
+完全一致・前方一致・ユニバース取得を行う場合の所要時間を比較する
+
+実行方法:
+    python benchmarks/bench_symbol_index.py --repeat 1000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+
+from utils.symbol_index import SymbolIndex, DEFAULT_SOURCE_PATH, build_index, classify_security, DERIVATIVE_KINDS
+
+
+def per_call_us(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='銘柄インデックスのベンチマーク')
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    def load_json():
+        with open(DEFAULT_SOURCE_PATH) as f:
+            return json.load(f)
+
+    def json_lookup():
+        return next((e for e in load_json() if e['symbol'] == 'MSFT'), None)
+
+    def json_prefix():
+        return [e for e in load_json() if e['symbol'].startswith('AP') or e['name'].lower().startswith('ap')][:10]
+
+    def json_universe():
+        return sorted(
+            e['symbol'] for e in load_json()
+            if e['exchange'] == 'NASDAQ' and classify_security(e['name']) not in DERIVATIVE_KINDS
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = str(Path(tmp) / 'symbol-index.sqlite')
+        start = time.perf_counter()
+        count = build_index(index_path=index_path)
+        build_ms = (time.perf_counter() - start) * 1000
+        size_kb = Path(index_path).stat().st_size / 1024
+
+        index = SymbolIndex(index_path=index_path)
+        start = time.perf_counter()
+        index.lookup('MSFT')
+        open_ms = (time.perf_counter() - start) * 1000
+        assert index.universe(exchanges=['NASDAQ']) == json_universe()
+
+        json_repeat = max(1, args.repeat // 100)
+        rows = [
+            ('lookup', per_call_us(json_lookup, json_repeat), per_call_us(lambda: index.lookup('MSFT'), args.repeat)),
+            ('prefix search', per_call_us(json_prefix, json_repeat), per_call_us(lambda: index.search('ap'), args.repeat)),
+            ('universe (NASDAQ)', per_call_us(json_universe, json_repeat),
+             per_call_us(lambda: index.universe(exchanges=['NASDAQ']), args.repeat)),
+        ]
+
+    print(f"🗂️ {count}銘柄: 作成 {build_ms:.1f}ms / {size_kb:.0f}KB / 初回オープン {open_ms:.2f}ms")
+    print(f"\n{'operation':<20} {'json(us)':>12} {'index(us)':>12} {'speedup':>9}")
+    for name, json_us, index_us in rows:
+        print(f"{name:<20} {json_us:>12.1f} {index_us:>12.1f} {json_us / index_us:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
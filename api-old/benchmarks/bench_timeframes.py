@@ -0,0 +1,140 @@
+"""
+週足・月足（日足からのリサンプリング）のベンチマーク
+1. 週足・月足の作成: 全期間の集計（resample_bars）・新しい日足1本の追加後の差分集計（update_resampled）・
+   pandas の resample を1銘柄あたりの時間で比較する
+2. 週足条件のスクリーニング: 日足だけの条件と weekly_close > weekly_ma_30 の条件で、
+   一括ダウンロードした銘柄数・応答時間を比較する（週足は取得した日足から作るため、ダウンロードは増えない）
+
+ネットワークは使わない（yf.download の代わりに合成データを返す）。日足キャッシュは一時ディレクトリに作る。
+
+実行方法:
+    python benchmarks/bench_timeframes.py --symbols 500 --bars 1260
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# 日足キャッシュは screen の読み込み前に一時ディレクトリへ向ける
+cache_dir = tempfile.mkdtemp(prefix='bench-timeframes-')
+os.environ['OHLCV_CACHE_DIR'] = cache_dir
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+
+import screen
+from utils import shared_state
+from utils.fundamentals_cache import FundamentalsCache
+from utils.ohlcv_cache import OHLCVCache
+from utils.result_cache import ScreenResultCache
+from utils.timeframes import HIGHER_TIMEFRAMES, resample_bars, update_resampled
+from utils.yfinance_wrapper import YFinanceWrapper
+from bench_suite import call_handler, synthetic_info
+from synthetic import generate_ohlcv
+
+FILTERS = {
+    'daily': {'technical': {'price_above_ma': {'ma_50': True}}},
+    'weekly': {'comparisons': ['weekly_close > weekly_ma_30']},
+    'daily + weekly': {
+        'technical': {'price_above_ma': {'ma_50': True}},
+        'comparisons': ['weekly_close > weekly_ma_30'],
+    },
+}
+
+
+def per_symbol_ms(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / len(items) * 1000
+
+
+def bench_resample(frames: dict) -> None:
+    """週足・月足の作成時間（1銘柄あたり）"""
+    bars = {s: OHLCVCache._to_bars(df, OHLCVCache._normalize_dates(df)[0]) for s, df in frames.items()}
+    print(f"\n{'timeframe':<10} {'full(ms)':>9} {'append 1 bar(ms)':>17} {'pandas resample(ms)':>20}")
+    for timeframe in HIGHER_TIMEFRAMES:
+        rule = 'W-SUN' if timeframe == 'weekly' else 'MS'
+        # 最新の日足1本を除いた状態の上位足に、最新の1本を追加する
+        previous = {s: resample_bars(b[:-1], timeframe) for s, b in bars.items()}
+        full = per_symbol_ms(lambda s: resample_bars(bars[s], timeframe), list(bars))
+        append = per_symbol_ms(
+            lambda s: update_resampled(previous[s], bars[s], timeframe, bars[s]['date'][-1]), list(bars)
+        )
+        reference = per_symbol_ms(
+            lambda s: frames[s].set_index('Date').resample(rule).agg(
+                {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+            ),
+            list(frames)[:50],
+        )
+        print(f"{timeframe:<10} {full:>9.3f} {append:>17.3f} {reference:>20.3f}")
+
+        # 差分集計は全期間の集計と同じ結果
+        s = next(iter(bars))
+        expected = resample_bars(bars[s], timeframe)
+        updated = update_resampled(previous[s], bars[s], timeframe, bars[s]['date'][-1])
+        assert (expected == updated).all()
+
+
+def bench_screen(frames: dict, repeat: int) -> None:
+    """日足条件・週足条件のスクリーニング（ダウンロード数・応答時間）"""
+    symbols = list(frames)
+    counts = {'downloaded': 0}
+
+    def download_history_chunks(self, chunk, chunk_size, raise_errors, **kwargs):
+        counts['downloaded'] += len(chunk)
+        return {s: frames[s] for s in chunk}, {}
+
+    YFinanceWrapper._download_history_chunks = download_history_chunks
+    YFinanceWrapper.get_stock_info = lambda self, symbol, raise_errors=False, fields=None: synthetic_info(symbol)
+    screen.FUNDAMENTALS_CACHE = FundamentalsCache()
+    screen.RESULT_CACHE = ScreenResultCache(max_entries=0)
+
+    print(f"\n{'filters':<16} {'workers':>8} {'downloaded':>11} {'matched':>8} {'latency(ms)':>12}")
+    for name, filters in FILTERS.items():
+        for workers in (1, 2):
+            counts['downloaded'] = 0
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    body = json.loads(call_handler({'symbols': symbols, 'filters': filters, 'workers': workers}))
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{name:<16} {workers:>8} {counts['downloaded']:>11} {body['total_count']:>8} "
+                  f"{statistics.median(timings):>12.1f}")
+
+    # 週足を直接要求しても日足キャッシュから作るため、ダウンロードは発生しない
+    counts['downloaded'] = 0
+    weekly = shared_state.yf_wrapper().get_historical_data_bulk(symbols, period='1y', interval='1wk')
+    print(f"\nget_historical_data_bulk(interval='1wk'): {len(weekly)}銘柄 / ダウンロード {counts['downloaded']}銘柄")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='週足・月足（日足からのリサンプリング）のベンチマーク')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=1260, help='1銘柄あたりの日足の本数')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    frames = generate_ohlcv(args.symbols, args.bars, seed=42)
+    print(f"{args.symbols}銘柄 × {args.bars}本")
+    bench_resample(frames)
+
+    # スクリーニングは 1y の日足（screen が取得する期間）
+    bench_screen({s: df.iloc[-252:].reset_index(drop=True) for s, df in frames.items()}, args.repeat)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
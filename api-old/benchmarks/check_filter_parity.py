@@ -0,0 +1,167 @@
+"""
+フィルター判定の一致確認
+ライブのスクリーニング（screen_planner のステージ別判定）と
+スナップショット・バックテスト（filter_compiler.compile_filters のテーブル一括判定）が
+同じ条件で同じ銘柄を通過させることを確認する
+
+1. 条件単位: 乱数の指標・銘柄情報（約2割の値は None・NaN・数値でない文字列）に対して、
+   ScreenPlan の short_window → long_window → fundamentals の判定と compiled.evaluate のマスクを比較
+2. API全体: 合成OHLCVで live モードと snapshot モード（同じ合成データから作ったスナップショット）の
+   通過銘柄とスコアを比較（指標と銘柄情報の両方を参照する比較条件を含む）
+
+実行方法:
+    python benchmarks/check_filter_parity.py --rows 5000 --symbols 300
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import screen
+from utils.technical_indicators import TechnicalIndicators
+from utils.filter_compiler import compile_filters, build_snapshot_table, score_table
+from utils.screen_planner import ScreenPlan
+from utils.snapshot_store import SNAPSHOT_INDICATOR_KEYS, export_snapshot
+from bench_suite import call_handler, offline_wrapper, synthetic_info, SECTORS
+from synthetic import generate_ohlcv
+
+# 確認するフィルター条件（指標と銘柄情報の両方を参照する比較を含む）
+FILTER_CASES = {
+    'technical': {
+        'technical': {
+            'price_above_ma': {'ma_50': True, 'ma_200': True},
+            'rsi_14': {'min': 40, 'max': 75},
+            'ma_alignment': {'enabled': True, 'order': 'bullish'},
+        },
+    },
+    'fundamental': {
+        'fundamental': {
+            'price_range': {'min': 20},
+            'market_cap': {'min': 5_000_000_000},
+            'sectors': list(SECTORS[:3]),
+            'exchange': ['NASDAQ'],
+        },
+    },
+    'ranges_comparisons': {
+        'ranges': {'distance_ma_10': {'min': -5, 'max': 5}, 'adr_20': {'min': 2}},
+        'comparisons': ['close > ema_21', 'ma_50 > ma_150', {'left': 'rsi_14', 'op': '>=', 'right': 45}],
+    },
+    # 合成データでは時価総額が常に ma_50・出来高平均より大きいため、RSI と組み合わせて通過銘柄を分ける
+    # （ライブで指標の取得前に判定すると全銘柄が不通過になる）
+    'mixed': {
+        'comparisons': ['market_cap > ma_50', {'left': 'volume_avg_20', 'op': '<', 'right': 'market_cap'}],
+        'technical': {'rsi_14': {'min': 50}},
+        'fundamental': {'country': ['United States']},
+    },
+}
+
+# 条件単位の確認で使う項目と値の候補
+RECORD_FIELDS = {
+    'price': lambda rng: rng.uniform(1, 200),
+    'ma_10': lambda rng: rng.uniform(1, 200),
+    'ma_50': lambda rng: rng.uniform(1, 200),
+    'ma_150': lambda rng: rng.uniform(1, 200),
+    'ma_200': lambda rng: rng.uniform(1, 200),
+    'ema_21': lambda rng: rng.uniform(1, 200),
+    'rsi_14': lambda rng: rng.uniform(0, 100),
+    'adr_20': lambda rng: rng.uniform(0, 10),
+    'distance_ma_10': lambda rng: rng.uniform(-10, 10),
+    'volume_avg_20': lambda rng: rng.uniform(0, 1e10),
+    'perfect_order_bullish': lambda rng: bool(rng.integers(2)),
+    'market_cap': lambda rng: rng.uniform(0, 2e10),
+    'sector': lambda rng: SECTORS[rng.integers(len(SECTORS))],
+    'exchange': lambda rng: ('NASDAQ', 'NYSE')[rng.integers(2)],
+    'country': lambda rng: ('United States', 'Japan')[rng.integers(2)],
+}
+MISSING_VALUES = (None, float('nan'), 'n/a')
+
+
+def random_records(rows: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(rows):
+        record = {}
+        for field, draw in RECORD_FIELDS.items():
+            if rng.random() < 0.2:
+                record[field] = MISSING_VALUES[rng.integers(len(MISSING_VALUES))]
+            else:
+                record[field] = draw(rng)
+        records.append(record)
+    return records
+
+
+def check_conditions(rows: int, seed: int):
+    """条件単位で ScreenPlan のステージ別判定と compile_filters のマスクを比較"""
+    records = random_records(rows, seed)
+    table = pd.DataFrame(records)
+    for name, filters in FILTER_CASES.items():
+        plan = ScreenPlan(filters)
+        staged = np.array([
+            all(plan.check(stage, record) for stage in ('short_window', 'long_window', 'fundamentals'))
+            for record in records
+        ])
+        mask, _ = compile_filters(filters).evaluate(table)
+        mismatched = np.flatnonzero(staged != mask)
+        assert len(mismatched) == 0, \
+            f'{name}: {len(mismatched)}行で判定が一致しません（例: {records[mismatched[0]]}）'
+        print(f"条件単位 {name:<20} OK（{rows}行中 {int(mask.sum())}行が通過）")
+
+
+def snapshot_table(frames: dict) -> pd.DataFrame:
+    """合成OHLCVから cron/update-snapshot.py と同じ形式のスナップショットを作る"""
+    indicators = {}
+    for symbol, df in frames.items():
+        values = TechnicalIndicators.calculate_latest_indicators(df, fields=SNAPSHOT_INDICATOR_KEYS)
+        values['date'] = str(df['Date'].iloc[-1].date())
+        indicators[symbol] = values
+    table = build_snapshot_table(indicators, {symbol: synthetic_info(symbol) for symbol in frames})
+    table['score'] = score_table(table)
+    return table
+
+
+def check_handler(n_symbols: int, seed: int):
+    """live モードと snapshot モードの通過銘柄・スコアを比較"""
+    frames = generate_ohlcv(n_symbols, 300, seed=seed)
+    symbols = list(frames)
+    path = os.path.join(tempfile.mkdtemp(prefix='check-filter-parity-'), 'snapshot.csv')
+    export_snapshot(snapshot_table(frames), path)
+    screen.SNAPSHOT_PATH = path
+
+    with offline_wrapper(frames):
+        for name, filters in FILTER_CASES.items():
+            results = {}
+            for mode in ('live', 'snapshot'):
+                body = json.loads(call_handler({'symbols': symbols, 'filters': filters, 'mode': mode}))
+                results[mode] = {row['symbol']: row['score'] for row in body['results']}
+            assert results['live'] == results['snapshot'], (
+                f"{name}: live {len(results['live'])}銘柄 / snapshot {len(results['snapshot'])}銘柄 "
+                f"（live のみ {sorted(set(results['live']) - set(results['snapshot']))[:5]}、"
+                f"snapshot のみ {sorted(set(results['snapshot']) - set(results['live']))[:5]}）"
+            )
+            print(f"API全体 {name:<20} OK（{len(results['live'])}銘柄が通過）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ライブとスナップショットのフィルター判定の一致確認')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--symbols', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_conditions(args.rows, args.seed)
+    check_handler(args.symbols, args.seed)
+    print('\nすべての条件でライブとスナップショットの判定が一致')
+
+
+if __name__ == '__main__':
+    main()
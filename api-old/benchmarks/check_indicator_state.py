@@ -0,0 +1,119 @@
+"""
+IndicatorState（インクリメンタル指標）の一致確認
+乱数で作った履歴を1本ずつ流し込み、各バーの時点の全指標が
+calculate_all_indicators（全系列の一括計算）の同じ行と一致することを確認する
+
+確認するケース（シードごと）:
+    random:       幾何ブラウン運動の履歴
+    nan_gaps:     途中の足の一部の値が欠損（NaN）した履歴
+    split:        株式分割で価格が不連続に下がる（未調整の）履歴
+    after_split:  分割調整後の履歴で状態を作り直し、その後の足を追加した場合
+途中で to_dict → JSON → from_dict の往復を挟み、保存・復元後も一致することを確認する。
+
+実行方法:
+    python benchmarks/check_indicator_state.py --seeds 8 --bars 600
+"""
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.indicator_state import IndicatorState
+from utils.technical_indicators import TechnicalIndicators, INDICATOR_COLUMNS
+from synthetic import generate_ohlcv
+
+# 逐次計算と一括計算の許容誤差（移動平均の加減算による丸め誤差）
+RTOL = 1e-8
+ATOL = 1e-8
+
+
+def with_nan_gaps(df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """約2%の足で終値・高値・安値・出来高のいずれかを欠損にする"""
+    df = df.copy()
+    df['volume'] = df['volume'].astype(float)
+    for column in ('close', 'high', 'low', 'volume'):
+        rows = rng.choice(np.arange(1, len(df)), size=max(len(df) // 200, 1), replace=False)
+        df.loc[rows, column] = np.nan
+    return df
+
+
+def with_split(df: pd.DataFrame, split_at: int, ratio: float = 4.0) -> pd.DataFrame:
+    """split_at 行目以降の価格を 1/ratio、出来高を ratio 倍にする（未調整の分割）"""
+    df = df.copy()
+    for column in ('open', 'high', 'low', 'close'):
+        df.loc[split_at:, column] = df.loc[split_at:, column] / ratio
+    df['volume'] = df['volume'].astype(float)
+    df.loc[split_at:, 'volume'] = df.loc[split_at:, 'volume'] * ratio
+    return df
+
+
+def replay(df: pd.DataFrame, state: IndicatorState, start: int, roundtrip_every: int) -> IndicatorState:
+    """start 行目以降を1本ずつ追加し、各バーで一括計算と比較する"""
+    expected = TechnicalIndicators.calculate_all_indicators(df)
+    for i in range(start, len(df)):
+        row = df.iloc[i]
+        state.update({
+            'date': row['Date'], 'open': row['open'], 'high': row['high'],
+            'low': row['low'], 'close': row['close'], 'volume': row['volume'],
+        })
+        if roundtrip_every and (i + 1) % roundtrip_every == 0:
+            state = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+        compare(state.values(), expected.iloc[i], i)
+    return state
+
+
+def compare(values: dict, expected: pd.Series, row: int):
+    for column in INDICATOR_COLUMNS:
+        actual, wanted = float(values[column]), float(expected[column])
+        if math.isnan(wanted) or math.isnan(actual):
+            assert math.isnan(wanted) and math.isnan(actual), f'{row}行目 {column}: {actual} != {wanted}'
+        else:
+            assert math.isclose(actual, wanted, rel_tol=RTOL, abs_tol=ATOL), \
+                f'{row}行目 {column}: {actual} != {wanted}'
+    assert bool(values['perfect_order_bullish']) == bool(expected['perfect_order_bullish']), \
+        f'{row}行目 perfect_order_bullish'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IndicatorState と一括計算の一致確認')
+    parser.add_argument('--seeds', type=int, default=8)
+    parser.add_argument('--bars', type=int, default=600)
+    parser.add_argument('--roundtrip-every', type=int, default=97, help='JSON 保存・復元を挟む間隔（0 で無効）')
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        rng = np.random.default_rng(seed)
+        df = next(iter(generate_ohlcv(1, args.bars, seed=seed).values()))
+        split_at = int(rng.integers(args.bars // 4, args.bars * 3 // 4))
+
+        cases = {
+            'random': df,
+            'nan_gaps': with_nan_gaps(df, rng),
+            'split': with_split(df, split_at),
+        }
+        for name, history in cases.items():
+            replay(history, IndicatorState(), 0, args.roundtrip_every)
+            print(f"seed {seed} {name:<12} OK ({len(history)}本)")
+
+        # 分割を検出したら調整後の履歴で状態を作り直し、以降の足を追加する
+        adjusted = with_split(df, 0).iloc[:split_at]
+        adjusted = pd.concat([adjusted, with_split(df, split_at).iloc[split_at:]], ignore_index=True)
+        state = IndicatorState.from_history(adjusted.iloc[:split_at + 1])
+        compare(state.values(), TechnicalIndicators.calculate_all_indicators(adjusted).iloc[split_at], split_at)
+        replay(adjusted, state, split_at + 1, args.roundtrip_every)
+        print(f"seed {seed} {'after_split':<12} OK (作り直し {split_at + 1}本 + 追加 {args.bars - split_at - 1}本)")
+
+    print('\nすべてのバーで一括計算と一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+最新バーのみの指標計算（テール）と全系列計算の一致確認
+calculate_latest_indicators が get_latest_indicators(calculate_all_indicators(df)) と
+同じ辞書（同じキー・None の位置・丸め誤差の範囲の値）を返すことを確認する
+
+確認するケース（シードごと）:
+    random:            幾何ブラウン運動の履歴
+    last_volume_nan:   最新バーの出来高が欠損（NaN）
+    last_high_nan:     最新バーの高値が欠損
+    volume_gaps:       途中の足の出来高の一部が欠損
+    short_N:           本数が指標の窓に満たない・ちょうどの履歴（N = 14, 15, 20, 200）
+
+実行方法:
+    python benchmarks/check_latest_indicators.py --seeds 8 --bars 300
+"""
+import argparse
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils.technical_indicators import TechnicalIndicators
+from synthetic import generate_ohlcv
+
+# テールと全系列の許容誤差（移動平均の加算順の違いによる丸め誤差）
+RTOL = 1e-9
+ATOL = 1e-9
+
+
+def with_nan(df: pd.DataFrame, column: str, rows) -> pd.DataFrame:
+    """rows 行目の column を欠損にする"""
+    df = df.copy()
+    df[column] = df[column].astype(float)
+    df.loc[rows, column] = np.nan
+    return df
+
+
+def compare(name: str, df: pd.DataFrame):
+    expected = TechnicalIndicators.get_latest_indicators(TechnicalIndicators.calculate_all_indicators(df))
+    actual = TechnicalIndicators.calculate_latest_indicators(df)
+    assert actual.keys() == expected.keys(), f'{name}: キーが一致しません'
+    for key, wanted in expected.items():
+        value = actual[key]
+        if wanted is None or value is None:
+            assert wanted is None and value is None, f'{name} {key}: {value} != {wanted}'
+        elif isinstance(wanted, bool):
+            assert value == wanted, f'{name} {key}: {value} != {wanted}'
+        else:
+            assert math.isclose(value, wanted, rel_tol=RTOL, abs_tol=ATOL), f'{name} {key}: {value} != {wanted}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='calculate_latest_indicators と全系列計算の一致確認')
+    parser.add_argument('--seeds', type=int, default=8)
+    parser.add_argument('--bars', type=int, default=300)
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        rng = np.random.default_rng(seed)
+        df = next(iter(generate_ohlcv(1, args.bars, seed=seed).values()))
+        last = len(df) - 1
+        cases = {
+            'random': df,
+            'last_volume_nan': with_nan(df, 'volume', [last]),
+            'last_high_nan': with_nan(df, 'high', [last]),
+            'volume_gaps': with_nan(df, 'volume', rng.choice(last, size=5, replace=False)),
+        }
+        for n in (14, 15, 20, 200):
+            cases[f'short_{n}'] = df.iloc[-n:].reset_index(drop=True)
+
+        for name, history in cases.items():
+            compare(f'seed {seed} {name}', history)
+        print(f"seed {seed} OK（{', '.join(cases)}）")
+
+    print('\nすべてのケースで全系列計算と一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+スコア計算の一致確認
+ライブのスクリーニング（screen.handler._calculate_score、1銘柄ずつ）と
+スナップショット・バックテスト（filter_compiler.score_table、テーブル一括）が
+同じ銘柄に同じスコアを付けることを確認する
+
+値がない場合（キーなし・None・NaN・数値でない文字列）を混ぜた乱数の指標・銘柄情報で比較する。
+どちらも値がない項目は加点せず、銘柄は除外しない。
+
+実行方法:
+    python benchmarks/check_score_parity.py --rows 20000
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+
+import screen
+from utils.filter_compiler import score_table
+
+# スコアに使う項目と、配点の境界付近を含む値の候補
+VALUES = {
+    'price': [50.0, 100.0, 150.0, 0.0],
+    'ma_200': [100.0, 0.0, 99.99],
+    'adr_20': [3.99, 4.0, 5.5, 6.0, 8.0],
+    'rsi_14': [49.9, 50.0, 60.0, 70.0, 70.1],
+    'perfect_order_bullish': [True, False, 1, 0],
+    'market_cap': [9_999_999_999, 10_000_000_000, 2e12, '3000000000000'],
+}
+
+# 値がない場合の表現（MISSING はキー自体を持たない）
+MISSING = object()
+ABSENT = [MISSING, None, float('nan'), 'n/a']
+
+
+def random_records(rows: int, seed: int):
+    """(指標の辞書, 銘柄情報の辞書) を rows 件作る（各項目の約3割は値なし）"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(rows):
+        indicators, info = {}, {}
+        for field, candidates in VALUES.items():
+            pool = candidates if rng.random() >= 0.3 else ABSENT
+            value = pool[rng.integers(len(pool))]
+            if value is not MISSING:
+                (info if field == 'market_cap' else indicators)[field] = value
+        records.append((indicators, info))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='_calculate_score と score_table の一致確認')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    records = random_records(args.rows, args.seed)
+
+    # ライブ: 1銘柄ずつ（self は使わない）
+    live = np.array([
+        screen.handler._calculate_score(None, indicators, info) for indicators, info in records
+    ])
+
+    # スナップショット: 最新指標テーブルに銘柄情報の列を並べて一括計算
+    table = pd.DataFrame([{**indicators, **info} for indicators, info in records])
+    batch = score_table(table)
+
+    mismatched = np.flatnonzero(live != batch)
+    for row in mismatched[:10]:
+        indicators, info = records[row]
+        print(f"{row}行目: live={live[row]} table={batch[row]} indicators={indicators} info={info}")
+    assert len(mismatched) == 0, f'{len(mismatched)} / {args.rows} 行でスコアが一致しません'
+
+    print(f"{args.rows}行すべてで一致（スコアの分布: {dict(zip(*np.unique(live, return_counts=True)))}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+ベンチマーク用の合成株価データ生成
+ネットワークを使わず、シード固定で再現可能なOHLCVを作る
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+
+def generate_ohlcv(
+    n_symbols: int,
+    n_days: int = 252,
+    seed: int = 42,
+    end_date: str = '2024-12-31'
+) -> Dict[str, pd.DataFrame]:
+    """
+    幾何ブラウン運動ベースの合成OHLCVを生成
+
+    YFinanceWrapper.get_historical_data と同じ形式
+    （Date列 + open/high/low/close/volume の小文字カラム）で返す。
+
+    Args:
+        n_symbols: 銘柄数
+        n_days: 営業日数
+        seed: 乱数シード
+        end_date: 最終営業日
+
+    Returns:
+        シンボルをキーとしたDataFrameの辞書
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end_date, periods=n_days, name='Date')
+
+    start_price = rng.uniform(5, 500, size=n_symbols)
+    drift = rng.normal(0.0003, 0.0005, size=n_symbols)
+    vol = rng.uniform(0.01, 0.05, size=n_symbols)
+
+    returns = rng.normal(drift, vol, size=(n_days, n_symbols))
+    close = start_price * np.exp(np.cumsum(returns, axis=0))
+    open_ = close * np.exp(rng.normal(0, vol / 2, size=(n_days, n_symbols)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, vol / 2, size=(n_days, n_symbols))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, vol / 2, size=(n_days, n_symbols))))
+    volume = rng.integers(100_000, 50_000_000, size=(n_days, n_symbols))
+
+    frames = {}
+    for j in range(n_symbols):
+        frames[f'SYM{j:05d}'] = pd.DataFrame({
+            'Date': dates,
+            'open': open_[:, j],
+            'high': high[:, j],
+            'low': low[:, j],
+            'close': close[:, j],
+            'volume': volume[:, j],
+        })
+
+    return frames
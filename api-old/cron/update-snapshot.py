@@ -0,0 +1,233 @@
+"""
+スクリーニング用スナップショット更新Cronジョブ
+米国市場の引け後に実行し、完了するまで数分おきに呼び出す
+
+全銘柄の最新指標と _calculate_score のスコアを計算し、stock_data に書き込む。
+/api/screen の snapshot モードはこのテーブル（または SNAPSHOT_PATH の書き出し）から応答する。
+
+銘柄リスト更新（cron/update-symbols.py）と同じく utils/batch_jobs.py で作業単位に分けて進捗を記録し、
+1回の呼び出しは TIME_BUDGET_SECONDS で打ち切る。同じ日の次の呼び出しは前回止まった銘柄の次から再開する。
+作業単位ごとに日足を get_historical_data_bulk で一括取得し（yf.download は全スレッドで同時に1回まで）、
+作業単位の全銘柄を1回の write_snapshot で書き込んでから進捗を記録する。
+全銘柄が終わった呼び出しで SNAPSHOT_PATH に書き出す。
+
+ローカル実行:
+    python cron/update-snapshot.py --db sqlite:////tmp/stock-snapshot.sqlite --export /tmp/stock-snapshot.csv --budget 600
+"""
+from http.server import BaseHTTPRequestHandler
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# パス解決
+api_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(api_dir))
+
+from utils.symbol_lists import SymbolLists
+from utils.yfinance_wrapper import YFinanceWrapper
+from utils.technical_indicators import TechnicalIndicators
+from utils.ohlcv_cache import market_today
+from utils import shared_state
+from utils.filter_compiler import build_snapshot_table, score_table
+from utils.snapshot_store import SnapshotStore, SNAPSHOT_INDICATOR_KEYS, export_snapshot
+from utils.batch_jobs import BatchJobStore, run_batch, parse_time_budget, DEFAULT_UNIT_SIZE
+
+# 1回の呼び出しで処理に使う秒数（Vercel の制限時間より短くする。?budget= で指定できる上限も兼ねる）
+TIME_BUDGET_SECONDS = float(os.environ.get('UPDATE_SNAPSHOT_TIME_BUDGET', '50'))
+
+# スコア・レスポンスに必要な銘柄情報
+INFO_FIELDS = ('name', 'sector', 'industry', 'market_cap', 'exchange', 'country')
+
+
+def materialize_unit(
+    symbols: List[str],
+    store: SnapshotStore,
+    yf_wrapper: YFinanceWrapper,
+    with_info: bool = True
+) -> Dict[str, Exception]:
+    """
+    作業単位の銘柄の最新指標とスコアを計算し、まとめて stock_data に書き込み
+
+    日足は get_historical_data_bulk（OHLCVキャッシュの差分取得）で1回の一括取得にまとめ、
+    計算できた銘柄を1回の write_snapshot で書き込む。
+
+    Args:
+        symbols: 作業単位の（未処理の）ティッカーシンボル
+        store: 書き込み先
+        yf_wrapper: データ取得に使う YFinanceWrapper
+        with_info: Falseの場合は銘柄情報を取得しない（キャッシュ済みの情報のみ使用）
+
+    Returns:
+        失敗した銘柄をキーとした例外の辞書（過去データがない銘柄は LookupError）
+
+    Raises:
+        RateLimitError: 一括取得全体がレート制限で失敗した場合
+    """
+    frames = yf_wrapper.get_historical_data_bulk(
+        symbols, period='1y', chunk_size=len(symbols), raise_errors=True
+    )
+
+    failures = {}
+    indicators = {}
+    infos = {}
+    for symbol in symbols:
+        hist_data = frames.get(symbol)
+        if hist_data is None or hist_data.empty:
+            failures[symbol] = LookupError('過去データを取得できませんでした')
+            continue
+
+        try:
+            values = TechnicalIndicators.calculate_latest_indicators(hist_data, fields=SNAPSHOT_INDICATOR_KEYS)
+            last = hist_data.iloc[-1]
+            values.update({
+                'date': str(last['Date'].date()),
+                'open': last['open'],
+                'high': last['high'],
+                'low': last['low'],
+                'volume': last['volume'],
+                'dollar_volume': last['close'] * last['volume'],
+            })
+        except Exception as e:
+            failures[symbol] = e
+            continue
+        indicators[symbol] = values
+
+        if with_info:
+            try:
+                stock_info = yf_wrapper.get_stock_info(symbol, raise_errors=True, fields=INFO_FIELDS)
+            except Exception as e:
+                # 銘柄情報がなくても指標は書き込む（銘柄情報の条件・時価総額の配点は使えない）
+                print(f"⚠️ {symbol} の銘柄情報: {e}")
+                stock_info = None
+            if stock_info is not None:
+                infos[symbol] = stock_info
+        elif yf_wrapper.info_cache is not None:
+            cached = yf_wrapper.info_cache.get(symbol, INFO_FIELDS)
+            if cached is not None:
+                infos[symbol] = cached
+
+    if indicators:
+        table = build_snapshot_table(indicators, infos)
+        table['score'] = score_table(table)
+        store.write_snapshot(table)
+    return failures
+
+
+def run(
+    symbols: Optional[List[str]] = None,
+    database_url: Optional[str] = None,
+    export_path: Optional[str] = None,
+    time_budget: float = TIME_BUDGET_SECONDS,
+    unit_size: int = DEFAULT_UNIT_SIZE,
+    with_info: bool = True,
+    job_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    スナップショット更新を時間予算内で進め（続きがあれば次の呼び出しで再開）、
+    全銘柄が終わった呼び出しで必要ならファイルに書き出す
+
+    Args:
+        symbols: 対象銘柄（未指定時は全構成銘柄。実行の最初の呼び出しでのみ使う）
+        database_url: 書き込み先・進捗の記録先（未指定時は SNAPSHOT_DATABASE_URL）
+        export_path: 書き出し先（未指定時は SNAPSHOT_PATH、どちらもなければ書き出さない）
+        time_budget: この呼び出しで使える秒数
+        unit_size: 1作業単位あたりの銘柄数
+        with_info: 銘柄情報を取得するか
+        job_name: 実行の名前（未指定時は 'update-snapshot:<米国市場の日付>'）
+
+    Returns:
+        レスポンス用の辞書
+    """
+    job_name = job_name or f'update-snapshot:{market_today()}'
+
+    def load_symbols() -> List[str]:
+        if symbols is not None:
+            return symbols
+        print("📥 銘柄リスト取得開始...")
+        return SymbolLists.get_all_symbols()
+
+    yf_wrapper = shared_state.yf_wrapper()
+    store = SnapshotStore(database_url)
+    jobs = BatchJobStore(database_url)
+    as_of = None
+    try:
+        summary = run_batch(
+            jobs, job_name, load_symbols, None, time_budget,
+            unit_size=unit_size, job_type='update_snapshot',
+            process_unit=lambda unit_symbols: materialize_unit(unit_symbols, store, yf_wrapper, with_info=with_info)
+        )
+        recent_errors = jobs.errors(job_name, limit=10) if summary['invocation']['failed'] else []
+
+        # 書き出しは全銘柄の書き込みが終わった呼び出しで1回だけ行う
+        export_path = export_path or os.environ.get('SNAPSHOT_PATH')
+        if summary['status'] == 'completed' and summary['invocation']['processed'] and export_path:
+            table, as_of = store.load_latest()
+            export_snapshot(table, export_path)
+            print(f"💾 {export_path} に書き出し（{len(table)}銘柄）")
+    finally:
+        jobs.close()
+        store.close()
+
+    progress = summary['progress']
+    return {
+        'success': True,
+        **summary,
+        'as_of': as_of,
+        'recent_errors': recent_errors,
+        'message': (
+            f"スナップショット更新{'完了' if summary['status'] == 'completed' else '中'}: "
+            f"{progress['succeeded']}/{progress['total_symbols']} 成功（エラー {progress['failed']}）"
+        ),
+    }
+
+
+class handler(BaseHTTPRequestHandler):
+    """Vercel Serverless Function Handler"""
+
+    def do_POST(self):
+        """POSTリクエスト処理"""
+        try:
+            # ?budget=秒（TIME_BUDGET_SECONDS より短く打ち切る場合）
+            query = parse_qs(urlparse(self.path).query)
+            try:
+                time_budget = parse_time_budget(query.get('budget', [TIME_BUDGET_SECONDS])[0], TIME_BUDGET_SECONDS)
+            except ValueError as e:
+                self._send_json(400, {'success': False, 'error': str(e)})
+                return
+            self._send_json(200, run(time_budget=time_budget))
+
+        except Exception as e:
+            self.send_error(500, str(e))
+
+    def do_GET(self):
+        """GETリクエスト処理（手動トリガー用）"""
+        self.do_POST()
+
+    def _send_json(self, code: int, body: Dict[str, Any]):
+        """JSONレスポンス送信"""
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='スクリーニング用スナップショットを更新（時間予算内で進め、次回は続きから再開）')
+    parser.add_argument('--symbols', nargs='*', help='対象銘柄（未指定時は全構成銘柄）')
+    parser.add_argument('--db', help='書き込み先（例: sqlite:////tmp/stock-snapshot.sqlite, postgresql://...）')
+    parser.add_argument('--export', help='CSVの書き出し先')
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET_SECONDS, help='1回の実行で使う秒数')
+    parser.add_argument('--unit-size', type=int, default=DEFAULT_UNIT_SIZE)
+    parser.add_argument('--no-info', action='store_true', help='銘柄情報を取得しない（キャッシュのみ使用）')
+    parser.add_argument('--job-name', help='実行の名前（既定は update-snapshot:<米国市場の日付>）')
+    args = parser.parse_args()
+
+    result = run(
+        args.symbols, args.db, args.export, args.budget, args.unit_size,
+        with_info=not args.no_info, job_name=args.job_name
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
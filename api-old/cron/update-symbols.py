@@ -1,20 +1,144 @@
 """
 銘柄リスト更新Cronジョブ
-Vercel Cron: 毎日 23:00 UTC (米国市場開始前)
+Vercel Cron: 毎日 23:00 UTC (米国市場開始前) 以降、完了するまで数分おきに呼び出す
 
-銘柄マスタテーブルを最新の構成銘柄リストで更新
+銘柄マスタテーブル（stocks）を最新の構成銘柄リストで更新
+
+対象銘柄は銘柄インデックス（utils/symbol_index.py）から読む。
+指数の構成銘柄は MEMBERS_MAX_AGE より古い場合（または ?refresh_members=1）のみWikipediaから取り直して書き込む。
+
+全銘柄は1回の呼び出しの制限時間に収まらないため、utils/batch_jobs.py で作業単位に分けて
+batch_jobs に進捗を記録し、1回の呼び出しは TIME_BUDGET_SECONDS で打ち切る。
+同じ日（米国市場の日付）の次の呼び出しは、前回止まった銘柄の次から再開する。
+
+ローカル実行:
+    python cron/update-symbols.py --db sqlite:////tmp/stock-snapshot.sqlite --budget 300
 """
 from http.server import BaseHTTPRequestHandler
+import argparse
 import json
+import os
 import sys
+import time
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
 
 # パス解決
 api_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(api_dir))
 
 from utils.symbol_lists import SymbolLists
-from utils.yfinance_wrapper import YFinanceWrapper
+from utils.symbol_index import SymbolIndex
+from utils.ohlcv_cache import market_today
+from utils import shared_state
+from utils.snapshot_store import SnapshotStore
+from utils.batch_jobs import BatchJobStore, run_batch, parse_time_budget, DEFAULT_UNIT_SIZE
+
+# 指数の構成銘柄をWikipediaから取り直す間隔（秒）
+MEMBERS_MAX_AGE = 7 * 24 * 3600
+
+# 1回の呼び出しで処理に使う秒数（Vercel の制限時間より短くする。?budget= で指定できる上限も兼ねる）
+TIME_BUDGET_SECONDS = float(os.environ.get('UPDATE_SYMBOLS_TIME_BUDGET', '50'))
+
+# 銘柄マスタに保存する項目
+INFO_FIELDS = ('name', 'sector', 'industry', 'market_cap', 'exchange', 'country')
+
+
+def refresh_members(force: bool = False) -> List[str]:
+    """
+    古くなった指数の構成銘柄をWikipediaから取り直して銘柄インデックスに書き込む
+
+    Args:
+        force: 更新時刻に関係なく取り直す
+
+    Returns:
+        取り直した指数名のリスト
+    """
+    index = SymbolIndex.default()
+    fetchers = {
+        'sp500': SymbolLists.get_sp500_symbols,
+        'nasdaq100': SymbolLists.get_nasdaq100_symbols,
+    }
+    members = {}
+    for name, fetch in fetchers.items():
+        updated_at = index.members_updated_at(name)
+        if force or updated_at is None or time.time() - updated_at > MEMBERS_MAX_AGE:
+            symbols = fetch()
+            # 取得に失敗した（空の）場合は前回の構成銘柄を使い続ける
+            if symbols:
+                members[name] = symbols
+    index.set_members(members)
+    if members:
+        print(f"🗂️ 構成銘柄更新: {', '.join(f'{name} {len(symbols)}銘柄' for name, symbols in members.items())}")
+    return list(members)
+
+
+def run(
+    symbols: Optional[List[str]] = None,
+    database_url: Optional[str] = None,
+    time_budget: float = TIME_BUDGET_SECONDS,
+    unit_size: int = DEFAULT_UNIT_SIZE,
+    force_members: bool = False,
+    job_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    銘柄マスタ更新を時間予算内で進める（続きがあれば次の呼び出しで再開）
+
+    Args:
+        symbols: 対象銘柄（未指定時は全構成銘柄。実行の最初の呼び出しでのみ使う）
+        database_url: 銘柄マスタ・進捗の書き込み先（未指定時は SNAPSHOT_DATABASE_URL）
+        time_budget: この呼び出しで使える秒数
+        unit_size: 1作業単位あたりの銘柄数
+        force_members: 指数の構成銘柄を取り直す
+        job_name: 実行の名前（未指定時は 'update-symbols:<米国市場の日付>'）
+
+    Returns:
+        レスポンス用の辞書
+    """
+    job_name = job_name or f'update-symbols:{market_today()}'
+    refreshed: List[str] = []
+
+    def load_symbols() -> List[str]:
+        # 構成銘柄の更新と銘柄リストの取得は、実行の最初の呼び出しでのみ行う
+        if symbols is not None:
+            return symbols
+        refreshed.extend(refresh_members(force=force_members))
+        print("📥 銘柄リスト取得開始...")
+        return SymbolLists.get_all_symbols()
+
+    yf_wrapper = shared_state.yf_wrapper()
+    stocks = SnapshotStore(database_url)
+    jobs = BatchJobStore(database_url)
+
+    def update_stock(symbol: str):
+        stock_info = yf_wrapper.get_stock_info(symbol, raise_errors=True, fields=INFO_FIELDS)
+        if not stock_info:
+            raise LookupError('銘柄情報を取得できませんでした')
+        stocks.write_stocks({symbol: stock_info})
+        print(f"✅ {symbol}: {stock_info['name']}")
+
+    try:
+        summary = run_batch(
+            jobs, job_name, load_symbols, update_stock, time_budget,
+            unit_size=unit_size, job_type='update_symbols'
+        )
+        recent_errors = jobs.errors(job_name, limit=10) if summary['invocation']['failed'] else []
+    finally:
+        jobs.close()
+        stocks.close()
+
+    progress = summary['progress']
+    return {
+        'success': True,
+        **summary,
+        'members_refreshed': refreshed,
+        'recent_errors': recent_errors,
+        'message': (
+            f"銘柄マスタ更新{'完了' if summary['status'] == 'completed' else '中'}: "
+            f"{progress['processed']}/{progress['total_symbols']} 処理済み（エラー {progress['failed']}）"
+        ),
+    }
 
 
 class handler(BaseHTTPRequestHandler):
@@ -31,46 +155,15 @@ class handler(BaseHTTPRequestHandler):
             #     self.send_error(401, 'Unauthorized')
             #     return
 
-            # 銘柄リスト取得
-            print("📥 銘柄リスト取得開始...")
-            symbols = SymbolLists.get_all_symbols()
-
-            # 銘柄情報取得
-            print(f"\n📊 {len(symbols)}銘柄の情報取得開始...")
-            yf_wrapper = YFinanceWrapper()
-            updated_count = 0
-            error_count = 0
-
-            # TODO: Postgresへの保存実装
-            # 現時点ではログ出力のみ
-            for i, symbol in enumerate(symbols):
-                if i >= 10:  # テスト用: 最初の10銘柄のみ
-                    break
-
-                try:
-                    stock_info = yf_wrapper.get_stock_info(symbol)
-                    if stock_info:
-                        print(f"✅ {symbol}: {stock_info['name']}")
-                        updated_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    print(f"❌ {symbol}: {e}")
-                    error_count += 1
-
-            # レスポンス
-            response = {
-                'success': True,
-                'total_symbols': len(symbols),
-                'updated': updated_count,
-                'errors': error_count,
-                'message': f'銘柄マスタ更新完了: {updated_count}/{len(symbols)} 成功'
-            }
-
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            # ?budget=秒（TIME_BUDGET_SECONDS より短く打ち切る場合）・?refresh_members=1
+            query = parse_qs(urlparse(self.path).query)
+            try:
+                time_budget = parse_time_budget(query.get('budget', [TIME_BUDGET_SECONDS])[0], TIME_BUDGET_SECONDS)
+            except ValueError as e:
+                self._send_json(400, {'success': False, 'error': str(e)})
+                return
+            response = run(time_budget=time_budget, force_members=query.get('refresh_members') == ['1'])
+            self._send_json(200, response)
 
         except Exception as e:
             self.send_error(500, str(e))
@@ -78,3 +171,24 @@ class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         """GETリクエスト処理（手動トリガー用）"""
         self.do_POST()
+
+    def _send_json(self, code: int, body: Dict[str, Any]):
+        """JSONレスポンス送信"""
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='銘柄マスタを更新（時間予算内で進め、次回は続きから再開）')
+    parser.add_argument('--symbols', nargs='*', help='対象銘柄（未指定時は全構成銘柄）')
+    parser.add_argument('--db', help='書き込み先（例: sqlite:////tmp/stock-snapshot.sqlite, postgresql://...）')
+    parser.add_argument('--budget', type=float, default=TIME_BUDGET_SECONDS, help='1回の実行で使う秒数')
+    parser.add_argument('--unit-size', type=int, default=DEFAULT_UNIT_SIZE)
+    parser.add_argument('--refresh-members', action='store_true', help='指数の構成銘柄を取り直す')
+    parser.add_argument('--job-name', help='実行の名前（既定は update-symbols:<米国市場の日付>）')
+    args = parser.parse_args()
+
+    result = run(args.symbols, args.db, args.budget, args.unit_size, args.refresh_members, args.job_name)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -4,13 +4,62 @@ import json
 import sys
 import os
 
+import numpy as np
+import pandas as pd
+
 # apiディレクトリをパスに追加
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from utils.yfinance_wrapper import YFinanceWrapper
-from utils.technical_indicators import TechnicalIndicators
+from utils.technical_indicators import TechnicalIndicators, INDICATOR_COLUMNS
+from utils.response_encoding import series_columns, columns_to_rows, dumps, negotiate_encoding, compress
+from utils.timeframes import TIMEFRAMES, TRADING_DAYS_PER_BAR, resample_frame
+from utils import shared_state
+
+# 銘柄基本情報のキャッシュ（ページ表示ごとの ticker.info 呼び出しを避ける）
+FUNDAMENTALS_CACHE = shared_state.fundamentals_cache()
+
+# 時系列の既定の本数と上限（?window= で指定）
+DEFAULT_WINDOW = 90
+MAX_WINDOW = 2000
+
+# 時系列に含める列（?indicators= で INDICATOR_COLUMNS・perfect_order_bullish を追加できる）
+SERIES_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'ma_10', 'ma_20', 'ma_50', 'ma_200')
+
+# 取得期間 → おおよその営業日数（window 行すべてで ma_200 を計算できる最短の期間を選ぶ。
+# 週足・月足は1本あたりの営業日数を掛けて見積もり、足りない場合は最長の期間で計算できる範囲だけ返す）
+HISTORY_PERIODS = ((252, '1y'), (504, '2y'), (1260, '5y'), (2520, '10y'))
+MA_WARMUP_BARS = 199
+
+# 最新値として返す指標（レスポンスのキー → 列名）
+LATEST_INDICATORS = {
+    'ma_10': 'ma_10',
+    'ma_20': 'ma_20',
+    'ma_50': 'ma_50',
+    'ma_150': 'ma_150',
+    'ma_200': 'ma_200',
+    'rsi_14': 'rsi_14',
+    'adr_20': 'adr_20',
+    'vwap': 'vwap',
+    'bollinger_upper': 'bb_upper',
+    'bollinger_lower': 'bb_lower',
+}
+
 
 class handler(BaseHTTPRequestHandler):
+    """
+    銘柄の基本情報・最新のテクニカル指標・直近の時系列
+
+    クエリパラメータ:
+        symbol: ティッカーシンボル（必須）
+        window: 時系列の本数（既定 90、上限 MAX_WINDOW）
+        indicators: 時系列に追加する指標（カンマ区切り。例: rsi_14,bb_upper）
+        layout: 'columns'（既定。{'dates': [...], 'close': [...], ...}）または 'rows'（1日1オブジェクトの配列）
+        timeframe: 'daily'（既定）/ 'weekly' / 'monthly'。時系列・テクニカル指標・スコアの時間軸
+                   （週足・月足は日足から作る。current_price・previous_close・volume は日足の値）
+
+    Accept-Encoding に応じて br（brotli がある場合）・gzip で圧縮して返す。
+    """
+
     def do_GET(self):
         # クエリパラメータを解析
         parsed_url = urlparse(self.path)
@@ -19,96 +68,113 @@ class handler(BaseHTTPRequestHandler):
         symbol = query_params.get('symbol', [None])[0]
 
         if not symbol:
-            self.send_response(400)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
-                'error': 'ティッカーシンボルを指定してください'
-            }).encode())
+            self._send_json(400, {'error': 'ティッカーシンボルを指定してください'})
             return
 
         try:
-            # Yahoo Financeからデータ取得
-            yf_wrapper = YFinanceWrapper()
+            window = int(query_params.get('window', [DEFAULT_WINDOW])[0])
+        except ValueError:
+            window = -1
+        if not 1 <= window <= MAX_WINDOW:
+            self._send_json(400, {'error': f'window は1〜{MAX_WINDOW}の整数で指定してください'})
+            return
+
+        layout = query_params.get('layout', ['columns'])[0]
+        if layout not in ('columns', 'rows'):
+            self._send_json(400, {'error': "layout は 'columns' または 'rows' で指定してください"})
+            return
+
+        timeframe = query_params.get('timeframe', ['daily'])[0]
+        if timeframe not in TIMEFRAMES:
+            self._send_json(400, {'error': f"timeframe は {' / '.join(TIMEFRAMES)} のいずれかで指定してください"})
+            return
+
+        extra = [name for name in query_params.get('indicators', [''])[0].split(',') if name]
+        unknown = sorted(set(extra) - set(INDICATOR_COLUMNS) - {'perfect_order_bullish'})
+        if unknown:
+            self._send_json(400, {'error': f'不明な指標です: {", ".join(unknown)}'})
+            return
+        series = list(dict.fromkeys([*SERIES_COLUMNS, *extra]))
+
+        try:
+            # Yahoo Financeからデータ取得（レート制限・キャッシュはプロセス内で共有）
+            yf_wrapper = shared_state.yf_wrapper()
 
             # 基本情報取得
-            stock_info = yf_wrapper.get_stock_info(symbol)
+            stock_info = yf_wrapper.get_stock_info(symbol) or {}
 
-            # 過去200日分のデータ取得（MA200計算のため）
-            historical_data = yf_wrapper.get_historical_data(
-                symbol,
-                period='1y'  # 1年分のデータ
-            )
+            # window 行すべてで200本線を計算できる期間の日足を取得
+            days = (window + MA_WARMUP_BARS) * TRADING_DAYS_PER_BAR[timeframe]
+            period = next((p for bars, p in HISTORY_PERIODS if bars >= days), HISTORY_PERIODS[-1][1])
+            historical_data = yf_wrapper.get_historical_data(symbol, period=period)
 
-            if historical_data.empty:
-                raise ValueError(f'銘柄 {symbol} のデータが見つかりません')
+            if historical_data is None or historical_data.empty:
+                self._send_json(404, {'error': f'銘柄 {symbol} のデータが見つかりません'})
+                return
 
-            # テクニカル指標を計算
-            df_with_indicators = TechnicalIndicators.calculate_all_indicators(historical_data)
+            # 週足・月足は取得した日足から作り、テクニカル指標を計算
+            df_with_indicators = TechnicalIndicators.calculate_all_indicators(
+                resample_frame(historical_data, timeframe), timeframe=timeframe
+            )
 
-            # 最新のデータ行を取得
+            # 最新のデータ行を取得（価格・出来高は日足の値）
             latest = df_with_indicators.iloc[-1]
+            daily_latest = historical_data.iloc[-1]
+            close = historical_data['close'].to_numpy(dtype=np.float64)
+
+            # 時系列（列ごとに NaN → null をまとめて変換）
+            history = series_columns(df_with_indicators, series, window=window)
 
             # レスポンスデータを構築
             stock_data = {
                 'symbol': symbol.upper(),
-                'name': stock_info.get('shortName', stock_info.get('longName', symbol)),
-                'sector': stock_info.get('sector', None),
-                'current_price': float(latest['Close']),
-                'previous_close': float(stock_info.get('previousClose', latest['Close'])),
-                'market_cap': stock_info.get('marketCap', None),
-                'volume': int(latest['Volume']),
+                'timeframe': timeframe,
+                'name': stock_info.get('name') or symbol.upper(),
+                'sector': stock_info.get('sector') or None,
+                'current_price': float(close[-1]),
+                'previous_close': float(close[-2]) if len(close) > 1 else float(close[-1]),
+                'market_cap': stock_info.get('market_cap') or None,
+                'volume': int(daily_latest['volume']) if not pd.isna(daily_latest['volume']) else None,
                 'technical_indicators': {
-                    'ma_10': float(latest['ma_10']) if 'ma_10' in latest and not pd.isna(latest['ma_10']) else None,
-                    'ma_20': float(latest['ma_20']) if 'ma_20' in latest and not pd.isna(latest['ma_20']) else None,
-                    'ma_50': float(latest['ma_50']) if 'ma_50' in latest and not pd.isna(latest['ma_50']) else None,
-                    'ma_150': float(latest['ma_150']) if 'ma_150' in latest and not pd.isna(latest['ma_150']) else None,
-                    'ma_200': float(latest['ma_200']) if 'ma_200' in latest and not pd.isna(latest['ma_200']) else None,
-                    'rsi_14': float(latest['rsi_14']) if 'rsi_14' in latest and not pd.isna(latest['rsi_14']) else None,
-                    'adr_20': float(latest['adr_20']) if 'adr_20' in latest and not pd.isna(latest['adr_20']) else None,
-                    'vwap': float(latest['vwap']) if 'vwap' in latest and not pd.isna(latest['vwap']) else None,
-                    'bollinger_upper': float(latest['bb_upper']) if 'bb_upper' in latest and not pd.isna(latest['bb_upper']) else None,
-                    'bollinger_lower': float(latest['bb_lower']) if 'bb_lower' in latest and not pd.isna(latest['bb_lower']) else None,
+                    **{key: _optional_float(latest, column) for key, column in LATEST_INDICATORS.items()},
                     'perfect_order_bullish': bool(check_perfect_order(latest, 'bullish')),
                     'perfect_order_bearish': bool(check_perfect_order(latest, 'bearish')),
                 },
-                'historical_data': [
-                    {
-                        'date': str(row.Index.date()),
-                        'open': float(row['Open']),
-                        'high': float(row['High']),
-                        'low': float(row['Low']),
-                        'close': float(row['Close']),
-                        'volume': int(row['Volume']),
-                        'ma_10': float(row['ma_10']) if 'ma_10' in row and not pd.isna(row['ma_10']) else None,
-                        'ma_20': float(row['ma_20']) if 'ma_20' in row and not pd.isna(row['ma_20']) else None,
-                        'ma_50': float(row['ma_50']) if 'ma_50' in row and not pd.isna(row['ma_50']) else None,
-                        'ma_200': float(row['ma_200']) if 'ma_200' in row and not pd.isna(row['ma_200']) else None,
-                    }
-                    for row in df_with_indicators.iloc[-90:].itertuples()  # 直近90日分
-                ],
+                'historical_data': history if layout == 'columns' else columns_to_rows(history),
                 'score': calculate_score(latest, stock_info)
             }
 
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(stock_data).encode())
+            self._send_json(200, stock_data)
 
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self._send_json(500, {
                 'error': '銘柄データの取得に失敗しました',
                 'details': str(e)
-            }).encode())
+            })
+
+    def _send_json(self, status: int, payload: dict):
+        """JSON を Accept-Encoding に応じて圧縮して返す"""
+        body, encoding = compress(dumps(payload), negotiate_encoding(self.headers.get('Accept-Encoding')))
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _optional_float(row, column):
+    """行の値を float で返す（列がない・欠損の場合は None）"""
+    if column not in row or pd.isna(row[column]):
+        return None
+    return float(row[column])
+
 
 def check_perfect_order(row, order_type='bullish'):
     """パーフェクトオーダーをチェック"""
-    import pandas as pd
-
     mas = ['ma_10', 'ma_20', 'ma_50', 'ma_150', 'ma_200']
     values = []
 
@@ -125,15 +191,14 @@ def check_perfect_order(row, order_type='bullish'):
         # 短期 < 中期 < 長期
         return all(values[i] < values[i+1] for i in range(len(values)-1))
 
+
 def calculate_score(latest, stock_info):
     """すなっちゃん手法に基づくスコアリング（0-100点）"""
-    import pandas as pd
-
     score = 0
 
     # 1. 200MA以上（20点）
     if 'ma_200' in latest and not pd.isna(latest['ma_200']):
-        if latest['Close'] > latest['ma_200']:
+        if latest['close'] > latest['ma_200']:
             score += 20
 
     # 2. パーフェクトオーダー（強気）（30点）
@@ -156,11 +221,9 @@ def calculate_score(latest, stock_info):
         elif 20 <= rsi < 30 or 70 < rsi <= 80:
             score += 8  # 部分点
 
-    # 5. 出来高が十分（平均以上）（15点）
-    avg_volume = stock_info.get('averageVolume', 0)
-    if avg_volume > 0 and latest['Volume'] >= avg_volume:
+    # 5. 出来高が十分（平均以上）（15点）（銘柄情報に平均出来高がなければ20日平均）
+    avg_volume = stock_info.get('averageVolume') or latest.get('volume_avg_20', 0)
+    if not pd.isna(avg_volume) and avg_volume > 0 and latest['volume'] >= avg_volume:
         score += 15
 
     return score
-
-import pandas as pd
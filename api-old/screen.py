@@ -6,15 +6,70 @@ Vercel Serverless Functionとして動作
 """
 from http.server import BaseHTTPRequestHandler
 import json
+import os
+import queue
 import sys
+import threading
+import time
 from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 # パス解決
 api_dir = Path(__file__).parent
 sys.path.insert(0, str(api_dir))
 
-from utils.yfinance_wrapper import YFinanceWrapper
 from utils.technical_indicators import TechnicalIndicators
+from utils.fetch_scheduler import FetchScheduler
+from utils.screen_planner import ScreenPlan
+from utils.sharded_compute import ShardedEvaluator
+from utils.ranking import TopKRanking
+from utils.bar_store import IndicatorRecord
+from utils.filter_compiler import compile_filters
+from utils.diagnostics import Diagnostics, classify_bottleneck, profile_request
+from utils.snapshot_store import SnapshotStore, load_snapshot_file, row_to_result
+from utils.backtest import run_backtest, DEFAULT_TOP_K, DEFAULT_HORIZONS
+from utils.ohlcv_cache import market_today
+from utils.result_cache import result_key
+from utils.symbol_index import SymbolIndex
+from utils import shared_state
+
+# プロセス内で共有するレート制限（2,000 calls/hour の予算をリクエスト間・他のルートと共有）
+RATE_LIMITER = shared_state.rate_limiter()
+
+# 日足のローカルキャッシュ（前日以前の足はディスクから読み、差分のみ取得）
+OHLCV_CACHE = shared_state.ohlcv_cache()
+
+# 銘柄基本情報のキャッシュ（プロセス再起動後もSQLiteから再利用）
+FUNDAMENTALS_CACHE = shared_state.fundamentals_cache()
+
+# スクリーニング結果のキャッシュ（同じ条件・銘柄・データ日付の live モードの結果を再利用、同時リクエストは1回に集約）
+RESULT_CACHE = shared_state.result_cache()
+
+# 同時フェッチ数
+FETCH_WORKERS = 8
+
+# 過去データ一括取得の1回の yf.download で取得する銘柄数
+HISTORY_CHUNK_SIZE = 100
+
+# 指標計算のプロセス数（2以上でプロセスプールに分割）と1タスクあたりの銘柄数
+COMPUTE_WORKERS = int(os.environ.get('SCREEN_COMPUTE_WORKERS', '1'))
+SHARD_SIZE = int(os.environ.get('SCREEN_SHARD_SIZE', '50'))
+
+# リクエストの workers・shard_size の上限（workers は CPU 数でも切り詰める）
+MAX_COMPUTE_WORKERS = int(os.environ.get('SCREEN_MAX_COMPUTE_WORKERS', str(os.cpu_count() or 1)))
+MAX_SHARD_SIZE = int(os.environ.get('SCREEN_MAX_SHARD_SIZE', '1000'))
+
+# ストリーミング応答で進捗レコードを送る間隔（秒）
+STREAM_PROGRESS_SECONDS = 2.0
+
+# リクエストの profile 指定でプロファイルを保存するか（SCREEN_PROFILE_DIR に書き出すため既定は無効）
+PROFILING_ENABLED = os.environ.get('SCREEN_PROFILING', '0') == '1'
+
+# バックテストの年数 → 取得期間（52週高値・200日線のため1年分多く取得する）
+BACKTEST_PERIODS = ((1, '2y'), (4, '5y'), (9, '10y'))
+
+# 夜間バッチ（cron/update-snapshot.py）が書き出すスナップショット（未設定時は SNAPSHOT_DATABASE_URL から読む）
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')
 
 
 class handler(BaseHTTPRequestHandler):
@@ -24,6 +79,7 @@ class handler(BaseHTTPRequestHandler):
 
     def do_POST(self):
         """POSTリクエスト処理"""
+        started = time.perf_counter()
         try:
             # リクエストボディ読み取り
             content_length = int(self.headers['Content-Length'])
@@ -33,27 +89,127 @@ class handler(BaseHTTPRequestHandler):
             # フィルター条件取得
             filters = request_data.get('filters', {})
             symbols = request_data.get('symbols', None)
-
-            # デフォルトシンボル（テスト用）
-            if symbols is None:
+            mode = request_data.get('mode', 'live')
+
+            # ページング（limit 未指定時は全件）
+            limit = request_data.get('limit')
+            offset = request_data.get('offset', 0)
+            if (limit is not None and (not isinstance(limit, int) or limit < 0)) or \
+                    not isinstance(offset, int) or offset < 0:
+                self._send_error(400, 'limit と offset は0以上の整数で指定してください')
+                return
+
+            # バックテストの条件（年数・上位件数・先読み日数）
+            backtest = request_data.get('backtest') or {}
+            if mode == 'backtest':
+                years = backtest.get('years', 5)
+                top_k = backtest.get('top_k', DEFAULT_TOP_K)
+                horizons = backtest.get('horizons', list(DEFAULT_HORIZONS))
+                if not isinstance(years, int) or not 1 <= years <= BACKTEST_PERIODS[-1][0] or \
+                        not isinstance(top_k, int) or top_k < 1 or not horizons or \
+                        not all(isinstance(h, int) and h > 0 for h in horizons):
+                    self._send_error(
+                        400, f'backtest は years（1〜{BACKTEST_PERIODS[-1][0]}）・top_k・horizons を正の整数で指定してください'
+                    )
+                    return
+
+            # 週足・月足の条件は日足から計算するライブのスクリーニングのみ（スナップショット・バックテストは日足の指標だけ）
+            if mode in ('snapshot', 'backtest') and ScreenPlan(filters).timeframes:
+                self._send_error(400, '週足・月足（weekly_ / monthly_）の条件は live モードでのみ指定できます')
+                return
+
+            # ユニバース指定（symbols 未指定時、銘柄インデックスから取得）
+            universe = request_data.get('universe')
+            if symbols is None and universe is not None:
+                try:
+                    symbols = self._universe_symbols(universe)
+                except (TypeError, ValueError) as e:
+                    self._send_error(400, f'universe が不正です: {e}')
+                    return
+
+            # デフォルトシンボル（テスト用、snapshot モードは全銘柄）
+            if symbols is None and mode != 'snapshot':
                 symbols = self._get_default_symbols()
 
-            # スクリーニング実行
-            results = self._screen_stocks(symbols, filters)
+            # 指標計算のプロセス数・1タスクあたりの銘柄数（上限を超える指定は上限に切り詰める）
+            workers = request_data.get('workers', COMPUTE_WORKERS)
+            shard_size = request_data.get('shard_size', SHARD_SIZE)
+            if not isinstance(workers, int) or not isinstance(shard_size, int) or shard_size < 1:
+                self._send_error(400, 'workers は整数、shard_size は1以上の整数で指定してください')
+                return
+            workers = max(1, min(workers, MAX_COMPUTE_WORKERS, os.cpu_count() or 1))
+            shard_size = min(shard_size, MAX_SHARD_SIZE)
+
+            # ステージ別の計測（diagnostics: true の場合のみ記録・返却）
+            self.diagnostics = Diagnostics(enabled=bool(request_data.get('diagnostics')))
+            self.resource_stats = self._resource_stats()
+            profile_mode = request_data.get('profile') if PROFILING_ENABLED else None
+            if profile_mode is True:
+                profile_mode = 'cprofile'
+            self.profile_info: dict = {}
+            self.cache_info: Optional[dict] = None
+
+            # 結果キャッシュ（計測・プロファイルのリクエストと cache: false の場合は毎回計算する）
+            use_cache = request_data.get('cache', True) is not False and \
+                not self.diagnostics.enabled and not profile_mode
+
+            # NDJSON のストリーミング応答（オプトイン）
+            wants_stream = request_data.get('stream') or 'application/x-ndjson' in (self.headers.get('Accept') or '')
+            if wants_stream and mode != 'backtest':
+                with profile_request(profile_mode, self.profile_info):
+                    self._stream_screen(mode, symbols, filters, workers, shard_size, limit, offset, started)
+                return
+
+            with profile_request(profile_mode, self.profile_info):
+                if mode == 'snapshot':
+                    # 夜間バッチで計算済みの指標から応答（symbols 未指定時は全銘柄）
+                    results = self._screen_snapshot(symbols, filters, limit=limit, offset=offset)
+                elif mode == 'backtest':
+                    # 過去の全営業日でスクリーニングを再現（results は日付ごとの集計）
+                    results = self._screen_backtest(
+                        symbols, filters, years, top_k, horizons, limit=limit, offset=offset
+                    )
+                elif use_cache:
+                    # 結果キャッシュ経由でスクリーニング実行
+                    results = self._screen_stocks_cached(
+                        symbols, filters, workers=workers, shard_size=shard_size, limit=limit, offset=offset
+                    )
+                else:
+                    # スクリーニング実行
+                    results = self._screen_stocks(
+                        symbols, filters, workers=workers, shard_size=shard_size, limit=limit, offset=offset
+                    )
 
             # レスポンス作成
             response = {
                 'results': results,
-                'total_count': len(results),
-                'execution_time_ms': 0,  # TODO: 実測
+                'total_count': self.total_count,
+                'offset': offset,
+                'limit': limit,
+                'execution_time_ms': self._elapsed_ms(started),
+                'plan': self.plan_stats,
             }
+            if mode == 'snapshot':
+                response['snapshot'] = self.snapshot_info
+            elif mode == 'backtest':
+                response['backtest'] = self.backtest_info
+            if self.cache_info is not None:
+                response['cache'] = self.cache_info
+
+            with self.diagnostics.stage('serialize'):
+                body = json.dumps(response, ensure_ascii=False)
+            self.diagnostics.count('serialize', items_in=len(results), items_out=len(results))
+
+            # 計測結果はシリアライズ時間を含めるため、本体の後に連結する
+            if self.diagnostics.enabled or self.profile_info:
+                body = body[:-1] + ', "diagnostics": ' + json.dumps(self._diagnostics_block(), ensure_ascii=False) + '}'
 
             # JSONレスポンス返却
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            self.wfile.write(body.encode('utf-8'))
 
         except Exception as e:
             self._send_error(500, str(e))
@@ -76,63 +232,563 @@ class handler(BaseHTTPRequestHandler):
             'HD', 'DIS', 'BAC', 'ADBE', 'CRM'
         ]
 
-    def _screen_stocks(self, symbols: list, filters: dict) -> list:
+    def _universe_symbols(self, universe: Any) -> list:
+        """
+        ユニバース指定からシンボル一覧を取得（ネットワークは使わない）
+
+        Args:
+            universe: 指数名（'sp500' / 'nasdaq100' / 'all'）、または
+                {'index': 指数名, 'exchanges': ['NASDAQ', ...], 'include_derivatives': False}
+                （index 未指定時は all-symbols.json の全銘柄）
+
+        Returns:
+            シンボルのリスト（ワラント・ライツ・ユニットは include_derivatives: true の場合のみ含む）
+
+        Raises:
+            ValueError: 不明な指数名・項目の場合
+            TypeError: 型が不正な場合
+        """
+        if isinstance(universe, str):
+            universe = {'index': universe}
+        if not isinstance(universe, dict):
+            raise TypeError('指数名またはオブジェクトで指定してください')
+        unknown = set(universe) - {'index', 'exchanges', 'include_derivatives'}
+        if unknown:
+            raise ValueError(f'不明な項目です: {", ".join(sorted(unknown))}')
+        exchanges = universe.get('exchanges')
+        if exchanges is not None and (not isinstance(exchanges, list) or
+                                      not all(isinstance(e, str) for e in exchanges)):
+            raise TypeError('exchanges は文字列のリストで指定してください')
+        return SymbolIndex.default().universe(
+            exchanges=exchanges,
+            index=universe.get('index'),
+            include_derivatives=bool(universe.get('include_derivatives', False)),
+        )
+
+    def _screen_stocks(
+        self,
+        symbols: list,
+        filters: dict,
+        workers: int = 1,
+        shard_size: int = SHARD_SIZE,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> list:
         """
         スクリーニング実行
 
+        通過銘柄はスコア上位 offset + limit 件だけを保持し、件数は self.total_count に記録する。
+
         Args:
             symbols: ティッカーシンボルのリスト
             filters: フィルター条件
+            workers: 指標計算のプロセス数（1の場合はこのプロセスで計算）
+            shard_size: プロセス分割時の1タスクあたりの銘柄数
+            limit: 返す件数（None の場合は全件）
+            offset: スコア順で読み飛ばす件数
 
         Returns:
-            スクリーニング結果のリスト
+            スクリーニング結果のリスト（スコア順の offset 件目から limit 件）
         """
-        yf_wrapper = YFinanceWrapper()
-        results = []
+        ranking = TopKRanking(None if limit is None else offset + limit)
 
-        for symbol in symbols:
-            try:
-                # 過去データ取得
-                hist_data = yf_wrapper.get_historical_data(symbol, period='1y')
-                if hist_data is None or hist_data.empty:
-                    continue
+        # 上位 offset + limit 件だけ保持（件数は全件数える、指標は __slots__ のレコードで保持）
+        for symbol, latest_indicators, stock_info, score in self._iter_matches(symbols, filters, workers, shard_size):
+            ranking.push(score, (symbol, IndicatorRecord.from_dict(latest_indicators), stock_info, score))
 
-                # テクニカル指標計算
-                hist_data = TechnicalIndicators.calculate_all_indicators(hist_data)
-                latest_indicators = TechnicalIndicators.get_latest_indicators(hist_data)
+        # 返却するページの行だけ結果を組み立てる
+        results = [
+            self._build_result(symbol, record.to_dict(), stock_info, score)
+            for symbol, record, stock_info, score in ranking.page(offset, limit)
+        ]
 
-                # フィルター適用
-                if not self._apply_filters(latest_indicators, filters):
-                    continue
+        self.total_count = ranking.total
+        print(f"📋 ステージ別除外件数: {self.plan_stats}")
+
+        return results
+
+    def _screen_stocks_cached(
+        self,
+        symbols: list,
+        filters: dict,
+        workers: int = 1,
+        shard_size: int = SHARD_SIZE,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> list:
+        """
+        結果キャッシュ経由のスクリーニング
+
+        キーは正規化した filters・銘柄集合・データの日付（market_today）。スコア順の先頭 offset + limit 件を
+        キャッシュし、同じ条件の同時リクエストは1回だけ _screen_stocks を実行する。
+        self.cache_info にキャッシュの利用状況（hit / miss / coalesced）を記録する。
+
+        Args:
+            symbols: ティッカーシンボルのリスト
+            filters: フィルター条件
+            workers: 指標計算のプロセス数（1の場合はこのプロセスで計算）
+            shard_size: プロセス分割時の1タスクあたりの銘柄数
+            limit: 返す件数（None の場合は全件）
+            offset: スコア順で読み飛ばす件数
 
-                # 銘柄情報取得
-                stock_info = yf_wrapper.get_stock_info(symbol)
-                if stock_info is None:
+        Returns:
+            スクリーニング結果のリスト（スコア順の offset 件目から limit 件）
+        """
+        as_of = market_today()
+        key = result_key(filters, symbols, as_of)
+        depth = None if limit is None else offset + limit
+
+        def compute():
+            rows = self._screen_stocks(symbols, filters, workers=workers, shard_size=shard_size, limit=depth)
+            return rows, self.total_count, self.plan_stats
+
+        entry, status = RESULT_CACHE.get_or_compute(key, symbols, depth, compute)
+        self.total_count = entry.total_count
+        self.plan_stats = entry.plan_stats
+        self.cache_info = {
+            'status': status,
+            'key': key[:16],
+            'as_of': as_of,
+            'age_seconds': round(RESULT_CACHE.clock() - entry.stored_at, 3),
+        }
+        print(f"🗃️ 結果キャッシュ: {status}（{key[:16]}）")
+        return entry.rows[offset:None if limit is None else offset + limit]
+
+    def _iter_matches(
+        self,
+        symbols: list,
+        filters: dict,
+        workers: int = 1,
+        shard_size: int = SHARD_SIZE,
+        progress: Optional[Dict[str, int]] = None
+    ) -> Iterator[Tuple[str, dict, dict, int]]:
+        """
+        条件を満たした銘柄をスコア計算した順に返す
+
+        終了時に self.plan_stats にステージ別の件数を記録する。
+
+        Args:
+            symbols: ティッカーシンボルのリスト
+            filters: フィルター条件
+            workers: 指標計算のプロセス数（1の場合はこのプロセスで計算）
+            shard_size: プロセス分割時の1タスクあたりの銘柄数
+            progress: 進捗を書き込む辞書（取得済みチャンク数・判定済み銘柄数）
+
+        Yields:
+            (シンボル, 最新指標, 銘柄情報, スコア)
+        """
+        if progress is None:
+            progress = {}
+        yf_wrapper = shared_state.yf_wrapper()
+        scheduler = FetchScheduler(max_workers=FETCH_WORKERS)
+        diagnostics = self.diagnostics
+        passed = {}
+
+        # フィルター条件をコスト順のステージに分解し、キャッシュ済みの銘柄情報で先に絞り込む
+        plan = ScreenPlan(filters)
+        with diagnostics.stage('prefilter'):
+            prefiltered = plan.prefilter(symbols, FUNDAMENTALS_CACHE)
+        diagnostics.count('prefilter', items_in=len(symbols), items_out=len(prefiltered))
+        symbols = prefiltered
+
+        # 過去データをチャンク単位で一括取得し、届いた順に指標計算・フィルター適用
+        # （yf.download は全スレッドで1回ずつ。キャッシュの読み込み・個別の再取得は並列）
+        # （取得期間は条件の指標を計算できる最短の期間。週足・月足は取得した日足から作る）
+        chunks = [
+            symbols[i:i + HISTORY_CHUNK_SIZE]
+            for i in range(0, len(symbols), HISTORY_CHUNK_SIZE)
+        ]
+        progress.update(history_chunks=len(chunks), fetched_chunks=0, evaluated=0, matched=0)
+
+        def fetch_history(i: int) -> dict:
+            with diagnostics.stage('fetch_history'):
+                frames = yf_wrapper.get_historical_data_bulk(
+                    chunks[i], period=plan.history_period, chunk_size=HISTORY_CHUNK_SIZE, raise_errors=True
+                )
+            diagnostics.count('fetch_history', items_in=len(chunks[i]), items_out=len(frames))
+            return frames
+
+        def fetch_info(symbol: str) -> Optional[dict]:
+            with diagnostics.stage('fetch_info'):
+                stock_info = yf_wrapper.get_stock_info(
+                    symbol, raise_errors=True, fields={'name', 'sector', 'market_cap'} | plan.info_fields
+                )
+            diagnostics.count('fetch_info', items_in=1, items_out=int(stock_info is not None))
+            return stock_info
+
+        history_stream = scheduler.stream(range(len(chunks)), fetch_history)
+
+        def history_frames():
+            for chunk_index, frames, error, _ in history_stream:
+                if error is not None:
+                    print(f"Error fetching history chunk {chunk_index}: {error}")
                     continue
+                progress['fetched_chunks'] += 1
+                yield frames
+
+        def evaluated():
+            if workers > 1:
+                # OHLCVを共有メモリに載せ、銘柄を分割してプロセスプールで判定・計算
+                with ShardedEvaluator(
+                    plan, filters, workers=workers, shard_size=shard_size, diagnostics=diagnostics
+                ) as evaluator:
+                    yield from evaluator.evaluate(history_frames())
+                return
+
+            for frames in history_frames():
+                for symbol, hist_data in frames.items():
+                    try:
+                        # short_window → long_window の順に判定し、通過銘柄のみ全指標を計算
+                        latest_indicators = plan.evaluate_history(hist_data, diagnostics)
+                        if latest_indicators is not None:
+                            yield symbol, latest_indicators
+
+                    except Exception as e:
+                        print(f"Error processing {symbol}: {e}")
+                        continue
+
+        def passed_symbols():
+            # 銘柄情報の取得待ちの銘柄だけ指標を保持する
+            for symbol, latest_indicators in evaluated():
+                passed[symbol] = latest_indicators
+                yield symbol
+
+        # テクニカル条件を通過した銘柄から順に銘柄情報を並列取得
+        info_stream = scheduler.stream(passed_symbols(), fetch_info)
+        for symbol, stock_info, error, _ in info_stream:
+            latest_indicators = passed.pop(symbol)
+            progress['evaluated'] += 1
+            if error is not None:
+                print(f"Error fetching info for {symbol}: {error}")
+                continue
+            if stock_info is None:
+                continue
+
+            # キャッシュになかった銘柄の銘柄情報条件と、指標・銘柄情報の両方を参照する条件
+            with diagnostics.stage('filter'):
+                passed_fundamentals = plan.check('fundamentals', plan.fundamental_values(latest_indicators, stock_info))
+            diagnostics.count('filter', items_in=1, items_out=int(passed_fundamentals))
+            if not passed_fundamentals:
+                continue
 
+            try:
                 # スコア計算
-                score = self._calculate_score(latest_indicators, stock_info)
-
-                # 結果追加
-                results.append({
-                    'symbol': symbol,
-                    'name': stock_info['name'],
-                    'sector': stock_info['sector'],
-                    'price': latest_indicators['price'],
-                    'market_cap': stock_info['market_cap'],
-                    'technical_indicators': latest_indicators,
-                    'score': score,
-                })
+                with diagnostics.stage('score'):
+                    score = self._calculate_score(latest_indicators, stock_info)
+                diagnostics.count('score', items_in=1, items_out=1)
 
             except Exception as e:
                 print(f"Error processing {symbol}: {e}")
                 continue
 
-        # スコア順にソート
-        results.sort(key=lambda x: x['score'], reverse=True)
+            progress['matched'] += 1
+            yield symbol, latest_indicators, stock_info, score
+
+        self.plan_stats = plan.stats()
+
+    def _build_result(self, symbol: str, latest_indicators: dict, stock_info: dict, score: int) -> dict:
+        """結果1件を組み立て"""
+        return {
+            'symbol': symbol,
+            'name': stock_info['name'],
+            'sector': stock_info['sector'],
+            'price': latest_indicators['price'],
+            'market_cap': stock_info['market_cap'],
+            'technical_indicators': latest_indicators,
+            'score': score,
+        }
+
+    def _stream_screen(
+        self,
+        mode: str,
+        symbols: Optional[list],
+        filters: dict,
+        workers: int,
+        shard_size: int,
+        limit: Optional[int],
+        offset: int,
+        started: float
+    ):
+        """
+        スクリーニング結果を NDJSON（1行1レコード）のチャンク転送で返す
+
+        レコードの種類:
+            {"type": "row", ...}       スコア計算が済んだ銘柄（live モードは完了順・limit/offset なし）
+            {"type": "progress", ...}  STREAM_PROGRESS_SECONDS ごとの進捗（ハートビートを兼ねる）
+            {"type": "summary", ...}   最後に total_count・execution_time_ms・plan を送る
+            {"type": "error", ...}     途中で失敗した場合（summary は送らない）
+
+        Args:
+            mode: 'live' または 'snapshot'
+            symbols: ティッカーシンボルのリスト
+            filters: フィルター条件
+            workers: 指標計算のプロセス数
+            shard_size: プロセス分割時の1タスクあたりの銘柄数
+            limit: snapshot モードで返す件数
+            offset: snapshot モードでスコア順に読み飛ばす件数
+            started: リクエスト受信時刻（time.perf_counter）
+        """
+        events: 'queue.Queue[Tuple[str, Any]]' = queue.Queue()
+        cancelled = threading.Event()
+        progress: Dict[str, int] = {'history_chunks': 0, 'fetched_chunks': 0, 'evaluated': 0, 'matched': 0}
+
+        def produce():
+            # 計算は別スレッドで行い、待ち時間中も進捗レコードを送れるようにする
+            try:
+                if mode == 'snapshot':
+                    rows = self._screen_snapshot(symbols, filters, limit=limit, offset=offset)
+                else:
+                    rows = (
+                        self._build_result(*match)
+                        for match in self._iter_matches(symbols, filters, workers, shard_size, progress)
+                    )
+                for row in rows:
+                    if cancelled.is_set():
+                        return
+                    events.put(('row', row))
+                events.put(('done', None))
+            except Exception as e:
+                events.put(('error', str(e)))
+
+        # チャンク転送は HTTP/1.1 が必要（応答後に接続は閉じる）
+        self.protocol_version = 'HTTP/1.1'
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
 
+        row_count = 0
+        last_progress = time.monotonic()
+        try:
+            while True:
+                try:
+                    kind, payload = events.get(timeout=STREAM_PROGRESS_SECONDS)
+                except queue.Empty:
+                    kind, payload = 'progress', None
+
+                if kind == 'row':
+                    row_count += 1
+                    with self.diagnostics.stage('serialize'):
+                        self._write_chunk({'type': 'row', **payload})
+                elif kind == 'error':
+                    self._write_chunk({'type': 'error', 'error': payload})
+                    break
+                elif kind == 'done':
+                    self._write_chunk({
+                        'type': 'summary',
+                        'total_count': self.total_count if mode == 'snapshot' else row_count,
+                        'execution_time_ms': self._elapsed_ms(started),
+                        'plan': self.plan_stats,
+                        **({'snapshot': self.snapshot_info} if mode == 'snapshot' else {}),
+                        **({'diagnostics': self._diagnostics_block()} if self.diagnostics.enabled else {}),
+                    })
+                    break
+
+                if kind == 'progress' or time.monotonic() - last_progress >= STREAM_PROGRESS_SECONDS:
+                    self._write_chunk({
+                        'type': 'progress',
+                        'rows': row_count,
+                        'elapsed_ms': self._elapsed_ms(started),
+                        **progress,
+                    })
+                    last_progress = time.monotonic()
+
+            # 終端チャンク
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            print("⚠️ クライアントが切断したためストリーミングを中止")
+        finally:
+            cancelled.set()
+
+    def _write_chunk(self, record: dict):
+        """1レコードを NDJSON の1行としてチャンク送信"""
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    @staticmethod
+    def _resource_stats() -> dict:
+        """レート制限・キャッシュの累計値（プロセス内で共有しているため、同時実行中の他リクエスト分も含む）"""
+        return {
+            'rate_limiter': RATE_LIMITER.stats(),
+            'fundamentals_cache': FUNDAMENTALS_CACHE.stats(),
+            'ohlcv_cache': OHLCV_CACHE.stats(),
+            'result_cache': RESULT_CACHE.stats(),
+            'history_flights': shared_state.yf_wrapper().history_flights.stats(),
+        }
+
+    def _diagnostics_block(self) -> dict:
+        """
+        レスポンスの diagnostics（ステージ別計測・レート制限の待機・キャッシュヒット率・ボトルネック判定）
+        """
+        block = self.diagnostics.to_dict()
+        before, after = self.resource_stats, self._resource_stats()
+
+        def delta(section: str, key: str):
+            return after[section][key] - before[section][key]
+
+        wait_ms = round(delta('rate_limiter', 'total_wait_seconds') * 1000, 3)
+        fundamentals = {key: delta('fundamentals_cache', key) for key in ('hits', 'misses', 'evictions', 'expirations')}
+        fundamentals_total = fundamentals['hits'] + fundamentals['misses']
+        ohlcv = {key: delta('ohlcv_cache', key) for key in ('fresh', 'delta', 'full')}
+        ohlcv_total = sum(ohlcv.values())
+
+        block['rate_limiter'] = {'acquired': delta('rate_limiter', 'acquired'), 'wait_ms': wait_ms}
+        block['caches'] = {
+            'fundamentals': {
+                **fundamentals,
+                'hit_ratio': round(fundamentals['hits'] / fundamentals_total, 4) if fundamentals_total else 0.0,
+            },
+            'ohlcv': {**ohlcv, 'hit_ratio': round(ohlcv['fresh'] / ohlcv_total, 4) if ohlcv_total else 0.0},
+        }
+        block['bottleneck'] = classify_bottleneck(
+            block['process']['wall_ms'], block['process']['cpu_ms'], wait_ms
+        )
+        if self.profile_info:
+            block['profile'] = self.profile_info
+        return block
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> int:
+        """リクエスト受信からの経過ミリ秒"""
+        return int((time.perf_counter() - started) * 1000)
+
+    def _screen_snapshot(
+        self,
+        symbols: list,
+        filters: dict,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> list:
+        """
+        スナップショットからスクリーニング
+
+        フィルターは compile_filters で全銘柄まとめてブールマスクとして評価する。
+
+        Args:
+            symbols: ティッカーシンボルのリスト（Noneの場合はスナップショットの全銘柄）
+            filters: フィルター条件
+            limit: 返す件数（None の場合は全件）
+            offset: スコア順で読み飛ばす件数
+
+        Returns:
+            スクリーニング結果のリスト（_screen_stocks と同じ形式）
+        """
+        diagnostics = self.diagnostics
+        with diagnostics.stage('load_snapshot'):
+            if SNAPSHOT_PATH and os.path.exists(SNAPSHOT_PATH):
+                table, as_of = load_snapshot_file(SNAPSHOT_PATH)
+            else:
+                store = SnapshotStore()
+                try:
+                    table, as_of = store.load_latest()
+                finally:
+                    store.close()
+
+        if symbols is not None:
+            table = table[table.index.isin(symbols)]
+
+        with diagnostics.stage('filter'):
+            matched = compile_filters(filters).apply(table)
+        diagnostics.count('filter', items_in=len(table), items_out=len(matched))
+        self.total_count = len(matched)
+        matched = matched.iloc[offset:None if limit is None else offset + limit]
+
+        results = [
+            row_to_result(symbol, row)
+            for symbol, row in zip(matched.index, matched.to_dict(orient='records'))
+        ]
+
+        self.plan_stats = None
+        self.snapshot_info = {'as_of': as_of, 'rows': len(table)}
         return results
 
+    def _screen_backtest(
+        self,
+        symbols: list,
+        filters: dict,
+        years: int,
+        top_k: int,
+        horizons: list,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> list:
+        """
+        過去 years 年の全営業日についてスクリーニングを再現
+
+        日足は OHLCV キャッシュ経由で取得する（キャッシュ済みなら差分のみ）。
+        件数は self.total_count、全期間の集計は self.backtest_info に記録する。
+
+        Args:
+            symbols: ティッカーシンボルのリスト
+            filters: フィルター条件
+            years: 再現する年数
+            top_k: 上位として扱う銘柄数
+            horizons: 先読みリターンの営業日数
+            limit: 返す日数（None の場合は全日）
+            offset: 読み飛ばす日数
+
+        Returns:
+            日付ごとの通過銘柄数・上位銘柄・先読みリターンのリスト
+        """
+        diagnostics = self.diagnostics
+        yf_wrapper = shared_state.yf_wrapper()
+        scheduler = FetchScheduler(max_workers=FETCH_WORKERS)
+        plan = ScreenPlan(filters)
+        period = next(p for max_years, p in BACKTEST_PERIODS if years <= max_years)
+
+        chunks = [symbols[i:i + HISTORY_CHUNK_SIZE] for i in range(0, len(symbols), HISTORY_CHUNK_SIZE)]
+        frames = {}
+        with diagnostics.stage('fetch_history'):
+            for chunk_index, chunk_frames, error, _ in scheduler.stream(
+                range(len(chunks)),
+                lambda i: yf_wrapper.get_historical_data_bulk(
+                    chunks[i], period=period, chunk_size=HISTORY_CHUNK_SIZE, raise_errors=True
+                )
+            ):
+                if error is not None:
+                    print(f"Error fetching history chunk {chunk_index}: {error}")
+                    continue
+                frames.update(chunk_frames)
+        diagnostics.count('fetch_history', items_in=len(symbols), items_out=len(frames))
+
+        # 銘柄情報の条件と時価総額の配点に使う（現在の値）
+        infos = {}
+        with diagnostics.stage('fetch_info'):
+            for symbol, stock_info, error, _ in scheduler.stream(
+                frames,
+                lambda s: yf_wrapper.get_stock_info(
+                    s, raise_errors=True, fields={'name', 'sector', 'market_cap'} | plan.info_fields
+                )
+            ):
+                if error is not None:
+                    print(f"Error fetching info for {symbol}: {error}")
+                elif stock_info is not None:
+                    infos[symbol] = stock_info
+        diagnostics.count('fetch_info', items_in=len(frames), items_out=len(infos))
+
+        with diagnostics.stage('backtest'):
+            result = run_backtest(frames, filters, infos, top_k=top_k, horizons=horizons, years=years)
+        records = result.to_records()
+        diagnostics.count('backtest', items_in=len(frames), items_out=len(records))
+
+        self.total_count = len(records)
+        self.plan_stats = None
+        self.backtest_info = {
+            **result.summary(),
+            'symbols': len(frames),
+            'top_k': top_k,
+            'horizons': list(horizons),
+        }
+        return records[offset:None if limit is None else offset + limit]
+
     def _apply_filters(self, indicators: dict, filters: dict) -> bool:
         """
         フィルター条件を適用
@@ -144,52 +800,14 @@ class handler(BaseHTTPRequestHandler):
         Returns:
             条件を満たす場合True
         """
-        technical = filters.get('technical', {})
-
-        # 移動平均線フィルター
-        price_above_ma = technical.get('price_above_ma', {})
-        if price_above_ma.get('ma_200'):
-            if indicators.get('ma_200') is None or indicators['price'] < indicators['ma_200']:
-                return False
-
-        if price_above_ma.get('ma_50'):
-            if indicators.get('ma_50') is None or indicators['price'] < indicators['ma_50']:
-                return False
-
-        # ADRフィルター
-        adr_filter = technical.get('adr_20', {})
-        if 'min' in adr_filter or 'max' in adr_filter:
-            adr = indicators.get('adr_20')
-            if adr is None:
-                return False
-            if 'min' in adr_filter and adr < adr_filter['min']:
-                return False
-            if 'max' in adr_filter and adr > adr_filter['max']:
-                return False
-
-        # RSIフィルター
-        rsi_filter = technical.get('rsi_14', {})
-        if 'min' in rsi_filter or 'max' in rsi_filter:
-            rsi = indicators.get('rsi_14')
-            if rsi is None:
-                return False
-            if 'min' in rsi_filter and rsi < rsi_filter['min']:
-                return False
-            if 'max' in rsi_filter and rsi > rsi_filter['max']:
-                return False
-
-        # パーフェクトオーダー
-        ma_alignment = technical.get('ma_alignment', {})
-        if ma_alignment.get('enabled') and ma_alignment.get('order') == 'bullish':
-            if not indicators.get('perfect_order_bullish', False):
-                return False
-
-        return True
+        return ScreenPlan(filters).matches(indicators)
 
     def _calculate_score(self, indicators: dict, stock_info: dict) -> int:
         """
         銘柄スコア計算（0-100点）
 
+        filter_compiler.score_table と同じ配点。値がない（None・NaN・数値でない）項目は加点しない。
+
         Args:
             indicators: テクニカル指標
             stock_info: 銘柄情報
@@ -197,18 +815,26 @@ class handler(BaseHTTPRequestHandler):
         Returns:
             スコア
         """
+        def number(values: dict, key: str) -> float:
+            # score_table の pd.to_numeric(errors='coerce') と同じく、数値にできない値は NaN
+            try:
+                return float(values.get(key))
+            except (TypeError, ValueError):
+                return float('nan')
+
         score = 0
 
         # 移動平均線の並び（20点）
-        if indicators.get('perfect_order_bullish', False):
+        if number(indicators, 'perfect_order_bullish') == 1:
             score += 20
 
         # 200MA以上（15点）
-        if indicators.get('ma_200') and indicators['price'] > indicators['ma_200']:
+        ma_200 = number(indicators, 'ma_200')
+        if ma_200 != 0 and number(indicators, 'price') > ma_200:
             score += 15
 
         # ADRが6%以上（15点）
-        adr = indicators.get('adr_20', 0)
+        adr = number(indicators, 'adr_20')
         if adr >= 6:
             score += 15
         elif adr >= 4:
@@ -222,12 +848,12 @@ class handler(BaseHTTPRequestHandler):
         #     score += 10
 
         # RSI（10点）
-        rsi = indicators.get('rsi_14', 0)
+        rsi = number(indicators, 'rsi_14')
         if 50 <= rsi <= 70:
             score += 10
 
         # 時価総額（5点）
-        market_cap = stock_info.get('market_cap', 0)
+        market_cap = number(stock_info, 'market_cap')
         if market_cap >= 10_000_000_000:  # 100億ドル以上
             score += 5
 
@@ -0,0 +1,338 @@
+"""
+常駐型のスクリーニングサービス（FastAPI）
+Vercel の Serverless Function（BaseHTTPRequestHandler）と同じルートを1プロセスで提供する。
+
+各ルートの handler をそのままスレッドで実行するため、応答の内容は Serverless Function と同じ。
+1プロセスに常駐するので、次のものがリクエスト間で引き継がれる。
+    - utils/shared_state.py のレート制限・日足キャッシュ・銘柄情報キャッシュ・スクリーニング結果キャッシュ（全ルート共通）
+    - 銘柄インデックス・スナップショット（SNAPSHOT_PATH）の読み込み結果
+    - 読み込み済みのモジュール（pandas・yfinance の import は最初の1回だけ）
+
+ルート:
+    POST     /api/screen
+    GET      /api/python/get-stock-data?symbol=AAPL
+    GET|POST /api/cron/update-symbols
+    GET|POST /api/cron/update-snapshot
+    GET      /api/service/stats   モジュールの読み込み時間・ルートごとの初回/直近の応答時間・キャッシュの統計
+                                  （結果キャッシュのヒット率・同時リクエストの集約回数を含む）
+
+起動時（SERVICE_PRELOAD=1、既定）にルートのモジュール・銘柄インデックス・スナップショットを読み込み、
+最初のリクエストで読み込み時間がかからないようにする。
+
+実行方法:
+    uvicorn service:app --app-dir api-old --host 0.0.0.0 --port 8000
+    python api-old/service.py --port 8000
+"""
+import importlib.util
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from http.client import HTTPMessage
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# このモジュールの読み込み時間の計測開始（FastAPI・Starlette の import を含む）
+_IMPORT_STARTED = time.perf_counter()
+_STARTED = time.time()
+
+# パス解決
+api_dir = Path(__file__).parent
+sys.path.insert(0, str(api_dir))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+# ルート → handler を定義しているファイル（api-old からの相対パス）
+ROUTES = {
+    '/api/screen': 'screen.py',
+    '/api/python/get-stock-data': 'python/get-stock-data.py',
+    '/api/cron/update-symbols': 'cron/update-symbols.py',
+    '/api/cron/update-snapshot': 'cron/update-snapshot.py',
+}
+
+# 起動時にルートのモジュールとデータを読み込む
+PRELOAD = os.environ.get('SERVICE_PRELOAD', '1') == '1'
+
+
+class RouteStats:
+    """ルートごとの応答時間（初回・直近・合計・最大）"""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def record(self, route: str, status: int, elapsed_ms: float):
+        with self.lock:
+            entry = self.routes.get(route)
+            if entry is None:
+                entry = self.routes[route] = {
+                    'calls': 0, 'errors': 0, 'first_ms': round(elapsed_ms, 3),
+                    'last_ms': 0.0, 'total_ms': 0.0, 'max_ms': 0.0,
+                }
+            entry['calls'] += 1
+            entry['errors'] += status >= 500
+            entry['last_ms'] = round(elapsed_ms, 3)
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = round(max(entry['max_ms'], elapsed_ms), 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                route: {
+                    **{key: value for key, value in entry.items() if key != 'total_ms'},
+                    'mean_ms': round(entry['total_ms'] / entry['calls'], 3),
+                }
+                for route, entry in self.routes.items()
+            }
+
+
+ROUTE_STATS = RouteStats()
+
+# ルート → 読み込み済みのモジュール・読み込み時間（ミリ秒）
+_modules: Dict[str, Any] = {}
+IMPORT_TIMES_MS: Dict[str, float] = {}
+_modules_lock = threading.Lock()
+
+
+def load_route(route: str) -> Any:
+    """
+    ルートの handler を定義したモジュールを読み込む（2回目以降は読み込み済みのものを返す）
+
+    ファイル名に「-」を含むため、ファイルのパスから読み込む（モジュール名は「-」を「_」にしたもの。screen.py は screen）。
+    """
+    module = _modules.get(route)
+    if module is not None:
+        return module
+    with _modules_lock:
+        module = _modules.get(route)
+        if module is None:
+            path = api_dir / ROUTES[route]
+            started = time.perf_counter()
+            name = path.stem.replace('-', '_')
+            module = sys.modules.get(name)
+            if module is None or getattr(module, '__file__', None) != str(path):
+                spec = importlib.util.spec_from_file_location(name, path)
+                module = importlib.util.module_from_spec(spec)
+                # プロセスプール（SCREEN_COMPUTE_WORKERS）に渡す関数をモジュール名で解決できるよう登録する
+                sys.modules[name] = module
+                spec.loader.exec_module(module)
+            IMPORT_TIMES_MS[route] = round((time.perf_counter() - started) * 1000, 3)
+            _modules[route] = module
+    return module
+
+
+class HandlerResponse:
+    """
+    BaseHTTPRequestHandler の send_response / send_header / wfile.write を受け取り、
+    本文をキュー経由で StreamingResponse に流す（NDJSON のストリーミング応答もそのまま届く）
+    """
+
+    _END = object()
+
+    def __init__(self):
+        self.status = 200
+        self.headers: List[Tuple[str, str]] = []
+        self.headers_sent = threading.Event()
+        self.chunks: queue.Queue = queue.Queue()
+
+    def send_response(self, code: int, message: Optional[str] = None):
+        self.status = code
+
+    def send_header(self, keyword: str, value: str):
+        self.headers.append((keyword, str(value)))
+
+    def end_headers(self):
+        self.headers_sent.set()
+
+    def send_error(self, code: int, message: Optional[str] = None, explain: Optional[str] = None):
+        """BaseHTTPRequestHandler.send_error の代わり（HTMLではなくJSONで返す）"""
+        self.status = code
+        self.headers = [('Content-Type', 'application/json')]
+        self.end_headers()
+        self.write(json.dumps({'error': message or explain or str(code)}, ensure_ascii=False).encode('utf-8'))
+
+    def write(self, data: bytes) -> int:
+        self.chunks.put(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        self.headers_sent.set()
+        self.chunks.put(self._END)
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.chunks.get()
+            if chunk is self._END:
+                return
+            yield chunk
+
+
+def _build_handler(module: Any, request: Request, body: bytes, response: HandlerResponse) -> Any:
+    """ソケットを持たない handler（リクエスト・応答をメモリ上で受け渡す）"""
+    handler_cls = module.handler
+    h = handler_cls.__new__(handler_cls)
+    headers = HTTPMessage()
+    for key, value in request.headers.items():
+        if key.lower() != 'content-length':
+            headers[key] = value
+    headers['Content-Length'] = str(len(body))
+
+    h.headers = headers
+    h.rfile = io.BytesIO(body)
+    h.wfile = response
+    h.command = request.method
+    h.path = request.url.path + (f'?{request.url.query}' if request.url.query else '')
+    h.request_version = 'HTTP/1.1'
+    h.requestline = f'{request.method} {h.path} HTTP/1.1'
+    h.client_address = (request.client.host, request.client.port) if request.client else ('', 0)
+    h.send_response = response.send_response
+    h.send_header = response.send_header
+    h.end_headers = response.end_headers
+    h.send_error = response.send_error
+    return h
+
+
+async def dispatch(route: str, request: Request):
+    """
+    ルートの handler を別スレッドで実行し、応答ヘッダーが揃った時点で本文のストリーミングを始める
+    """
+    started = time.perf_counter()
+    body = await request.body()
+    module = load_route(route) if route in _modules else await run_in_threadpool(load_route, route)
+    response = HandlerResponse()
+    h = _build_handler(module, request, body, response)
+    method = getattr(h, f'do_{request.method}', None)
+    if method is None:
+        return JSONResponse({'error': f'{request.method} は使えません'}, status_code=405)
+
+    def run():
+        try:
+            method()
+        except Exception as e:
+            if not response.headers_sent.is_set():
+                response.send_error(500, str(e))
+        finally:
+            response.finish()
+            ROUTE_STATS.record(route, response.status, (time.perf_counter() - started) * 1000)
+
+    threading.Thread(target=run, name=f'handler{route}', daemon=True).start()
+    await run_in_threadpool(response.headers_sent.wait)
+    headers = {key: value for key, value in response.headers if key.lower() != 'content-length'}
+    return StreamingResponse(response.iter_chunks(), status_code=response.status, headers=headers)
+
+
+def preload() -> Dict[str, float]:
+    """
+    ルートのモジュール・銘柄インデックス・スナップショットを読み込む
+
+    Returns:
+        項目ごとの所要時間（ミリ秒）
+    """
+    timings = {}
+    for route in ROUTES:
+        try:
+            load_route(route)
+        except Exception as e:
+            print(f"⚠️ {route} の読み込みに失敗: {e}")
+    timings.update({f'import:{route}': ms for route, ms in IMPORT_TIMES_MS.items()})
+
+    from utils.symbol_index import SymbolIndex
+    started = time.perf_counter()
+    try:
+        SymbolIndex.default().universe()
+        timings['symbol_index'] = round((time.perf_counter() - started) * 1000, 3)
+    except Exception as e:
+        print(f"⚠️ 銘柄インデックスの読み込みに失敗: {e}")
+
+    snapshot_path = os.environ.get('SNAPSHOT_PATH')
+    if snapshot_path and os.path.exists(snapshot_path):
+        from utils.snapshot_store import load_snapshot_file
+        started = time.perf_counter()
+        table, as_of = load_snapshot_file(snapshot_path)
+        timings['snapshot'] = round((time.perf_counter() - started) * 1000, 3)
+        print(f"📦 スナップショット読み込み: {len(table)}銘柄（{as_of}）")
+    return timings
+
+
+PRELOAD_TIMES_MS: Dict[str, float] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD:
+        started = time.perf_counter()
+        PRELOAD_TIMES_MS.update(await run_in_threadpool(preload))
+        PRELOAD_TIMES_MS['total'] = round((time.perf_counter() - started) * 1000, 3)
+        print(f"🔥 プリロード完了: {PRELOAD_TIMES_MS['total']:.0f}ms")
+    yield
+
+
+app = FastAPI(title='Stock Screener API', lifespan=lifespan)
+
+
+@app.post('/api/screen')
+async def screen_route(request: Request):
+    return await dispatch('/api/screen', request)
+
+
+@app.options('/api/screen')
+async def screen_options(request: Request):
+    return await dispatch('/api/screen', request)
+
+
+@app.get('/api/python/get-stock-data')
+async def stock_data_route(request: Request):
+    return await dispatch('/api/python/get-stock-data', request)
+
+
+@app.api_route('/api/cron/update-symbols', methods=['GET', 'POST'])
+async def update_symbols_route(request: Request):
+    return await dispatch('/api/cron/update-symbols', request)
+
+
+@app.api_route('/api/cron/update-snapshot', methods=['GET', 'POST'])
+async def update_snapshot_route(request: Request):
+    return await dispatch('/api/cron/update-snapshot', request)
+
+
+@app.get('/api/service/stats')
+async def service_stats():
+    """起動時間・読み込み時間・ルートごとの応答時間・共有キャッシュの統計"""
+    from utils import shared_state
+
+    return {
+        'uptime_seconds': round(time.time() - _STARTED, 1),
+        'service_import_ms': SERVICE_IMPORT_MS,
+        'preload_ms': PRELOAD_TIMES_MS,
+        'route_import_ms': dict(IMPORT_TIMES_MS),
+        'routes': ROUTE_STATS.to_dict(),
+        'rate_limiter': shared_state.rate_limiter().stats(),
+        'fundamentals_cache': shared_state.fundamentals_cache().stats(),
+        'ohlcv_cache': shared_state.ohlcv_cache().stats(),
+        'result_cache': shared_state.result_cache().stats(),
+        'history_flights': shared_state.yf_wrapper().history_flights.stats(),
+    }
+
+
+SERVICE_IMPORT_MS = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 3)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='常駐型のスクリーニングサービス')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
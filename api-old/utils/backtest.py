@@ -0,0 +1,252 @@
+"""
+スクリーニングのバックテスト
+過去の全営業日について、その日の指標で filters を適用・スコア順に並べた場合の
+通過銘柄数・上位K銘柄と、その後 5/20/60 営業日のリターンを集計する
+
+日付ごとにループせず、(日付 × 銘柄) の指標パネルを「1行 = 1日 × 1銘柄」のテーブルに並べ替えて
+compile_filters / score_table で全日付をまとめて判定する（_apply_filters・_calculate_score と同じ条件・配点）。
+メモリを抑えるため、指標の計算と判定は銘柄を symbol_chunk 件ずつに分けて行う。
+
+注意:
+    - 銘柄情報（時価総額・セクター等）は現在の値を全期間に使う（過去時点の値ではない）
+    - 同点の銘柄は frames に渡した順で上位とする
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.technical_indicators import TechnicalIndicators
+from utils.filter_compiler import compile_filters, FUNDAMENTAL_COLUMNS
+from utils.ohlcv_cache import OHLCVCache
+
+# 先読みリターンの営業日数
+DEFAULT_HORIZONS = (5, 20, 60)
+
+# 上位として扱う銘柄数
+DEFAULT_TOP_K = 20
+
+# 1回に指標を計算する銘柄数（メモリ使用量 ≒ 銘柄数 × 日数 × 指標数 × 8バイト × 2）
+BACKTEST_SYMBOL_CHUNK = 250
+
+
+class BacktestResult:
+    """
+    バックテストの結果
+
+    Attributes:
+        daily: 日付ごとの集計（hits, top_k, top_symbols, {hits,top_k,universe}_fwd_{h}d）
+        membership: (日付 × 銘柄) の上位K入りフラグ
+        hits: (日付 × 銘柄) のフィルター通過フラグ
+    """
+
+    def __init__(self, daily: pd.DataFrame, membership: pd.DataFrame, hits: pd.DataFrame, horizons: Sequence[int]):
+        self.daily = daily
+        self.membership = membership
+        self.hits = hits
+        self.horizons = tuple(horizons)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        全期間の集計
+
+        Returns:
+            日数・平均通過数と、期間ごとの平均リターン（上位K・通過銘柄・全銘柄）と
+            上位Kが全銘柄平均を上回った日の割合
+        """
+        daily = self.daily
+        result: Dict[str, Any] = {
+            'dates': len(daily),
+            'start': str(daily.index[0].date()) if len(daily) else None,
+            'end': str(daily.index[-1].date()) if len(daily) else None,
+            'avg_hits': round(float(daily['hits'].mean()), 2) if len(daily) else 0.0,
+            'forward_returns': {},
+        }
+        for h in self.horizons:
+            top_k, universe = daily[f'top_k_fwd_{h}d'], daily[f'universe_fwd_{h}d']
+            compared = top_k.notna() & universe.notna()
+
+            def mean(series: pd.Series) -> Optional[float]:
+                value = series.mean()
+                return None if pd.isna(value) else round(float(value), 6)
+
+            result['forward_returns'][f'{h}d'] = {
+                'top_k': mean(top_k),
+                'hits': mean(daily[f'hits_fwd_{h}d']),
+                'universe': mean(universe),
+                'top_k_win_rate': round(float((top_k[compared] > universe[compared]).mean()), 4)
+                if compared.any() else None,
+            }
+        return result
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """日付ごとの集計をJSONに変換できる形で返す（NaN は None）"""
+        daily = self.daily.astype(object).where(self.daily.notna(), None)
+        return [
+            {'date': str(date.date()), **row}
+            for date, row in zip(daily.index, daily.to_dict(orient='records'))
+        ]
+
+
+def _date_index(frames: Dict[str, pd.DataFrame]) -> pd.DatetimeIndex:
+    """全銘柄の日付の和集合（build_panel と同じ日付の取り方）"""
+    indexes = []
+    for df in frames.values():
+        date_col = next((c for c in ('date', 'Date', 'datetime', 'Datetime') if c in df.columns), None)
+        indexes.append(pd.Index(df[date_col]) if date_col else df.index)
+    union = indexes[0]
+    for index in indexes[1:]:
+        union = union.union(index)
+    return pd.DatetimeIndex(union).sort_values()
+
+
+def _forward_returns(close: np.ndarray, horizon: int) -> np.ndarray:
+    """horizon 営業日後の終値までのリターン（末尾の horizon 行はNaN）"""
+    result = np.full(close.shape, np.nan)
+    if horizon < len(close):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[:-horizon] = close[horizon:] / close[:-horizon] - 1
+    return result
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """行ごとに mask の位置の値の平均（NaN と対象なしはNaN）"""
+    selected = mask & ~np.isnan(values)
+    counts = selected.sum(axis=1)
+    totals = np.where(selected, values, 0.0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def run_backtest(
+    frames: Dict[str, pd.DataFrame],
+    filters: dict,
+    infos: Optional[Dict[str, Dict[str, Any]]] = None,
+    top_k: int = DEFAULT_TOP_K,
+    horizons: Sequence[int] = DEFAULT_HORIZONS,
+    start: Optional[str] = None,
+    years: Optional[int] = None,
+    symbol_chunk: int = BACKTEST_SYMBOL_CHUNK
+) -> BacktestResult:
+    """
+    過去の全営業日についてスクリーニングを再現
+
+    Args:
+        frames: シンボルをキーとした get_historical_data 形式のDataFrame
+        filters: スクリーニングと同じフィルター条件
+        infos: シンボルをキーとした銘柄情報（銘柄情報の条件・時価総額の配点に使う）
+        top_k: 上位として扱う銘柄数
+        horizons: 先読みリターンの営業日数
+        start: 集計を始める日付（未指定時は全期間。指標の計算には start より前のデータも使う）
+        years: start 未指定時、最終日から years 年前を集計の開始日にする
+        symbol_chunk: 1回に指標を計算する銘柄数
+
+    Returns:
+        BacktestResult
+
+    Raises:
+        ValueError: 比較条件が不正な場合・データのある銘柄がない場合
+    """
+    compiled = compile_filters(filters)
+    frames = {s: df for s, df in frames.items() if df is not None and not df.empty}
+    symbols = list(frames)
+    infos = infos or {}
+    if not symbols:
+        raise ValueError('バックテストする銘柄のデータがありません')
+
+    dates = _date_index(frames)
+    first = 0
+    if start is None and years is not None:
+        start = dates[-1] - pd.DateOffset(years=years)
+    if start is not None:
+        start_ts = pd.Timestamp(start)
+        if dates.tz is not None and start_ts.tz is None:
+            start_ts = start_ts.tz_localize(dates.tz)
+        first = int(dates.searchsorted(start_ts))
+    evaluated = dates[first:]
+    n_dates, n_symbols = len(evaluated), len(symbols)
+
+    hits = np.zeros((n_dates, n_symbols), dtype=bool)
+    listed = np.zeros((n_dates, n_symbols), dtype=bool)
+    scores = np.full((n_dates, n_symbols), -1, dtype=np.int16)
+    forward = {h: np.full((n_dates, n_symbols), np.nan, dtype=np.float32) for h in horizons}
+
+    for offset in range(0, n_symbols, symbol_chunk):
+        chunk = symbols[offset:offset + symbol_chunk]
+        columns = slice(offset, offset + len(chunk))
+
+        panel = TechnicalIndicators.build_panel({s: frames[s] for s in chunk})
+        panel = {field: frame.reindex(index=dates, columns=chunk) for field, frame in panel.items()}
+        indicators = TechnicalIndicators.calculate_all_indicators_panel(panel)
+        close = indicators['close'].to_numpy(dtype=float)
+
+        # 1行 = 1日 × 1銘柄のテーブル（日付順、日付内は銘柄順）
+        table = {
+            ('price' if name == 'close' else name): frame.to_numpy()[first:].ravel()
+            for name, frame in indicators.items()
+        }
+        for field in FUNDAMENTAL_COLUMNS:
+            values = [infos.get(s, {}).get(field) for s in chunk]
+            if any(v is not None for v in values):
+                table[field] = np.tile(np.array(values, dtype=object), n_dates)
+        table = pd.DataFrame(table, copy=False)
+
+        mask, chunk_scores = compiled.evaluate(table)
+        chunk_listed = ~np.isnan(close[first:])
+        listed[:, columns] = chunk_listed
+        hits[:, columns] = mask.reshape(n_dates, len(chunk)) & chunk_listed
+        scores[:, columns] = chunk_scores.reshape(n_dates, len(chunk))
+        for h in horizons:
+            forward[h][:, columns] = _forward_returns(close, h)[first:]
+        del panel, indicators, table
+
+    # 日付ごとの上位K（通過しなかった銘柄はスコア -1 として後ろに並ぶ）
+    ranked = np.where(hits, scores, -1)
+    order = np.argsort(-ranked, axis=1, kind='stable')[:, :top_k]
+    in_top = np.take_along_axis(hits, order, axis=1)
+    membership = np.zeros_like(hits)
+    np.put_along_axis(membership, order, in_top, axis=1)
+
+    symbol_array = np.array(symbols, dtype=object)
+    daily = pd.DataFrame({
+        'hits': hits.sum(axis=1),
+        'top_k': in_top.sum(axis=1),
+        'top_symbols': [list(symbol_array[row[keep]]) for row, keep in zip(order, in_top)],
+    }, index=evaluated)
+    for h in horizons:
+        values = forward[h].astype(float)
+        daily[f'top_k_fwd_{h}d'] = _masked_mean(values, membership)
+        daily[f'hits_fwd_{h}d'] = _masked_mean(values, hits)
+        daily[f'universe_fwd_{h}d'] = _masked_mean(values, listed)
+
+    return BacktestResult(
+        daily,
+        pd.DataFrame(membership, index=evaluated, columns=symbols),
+        pd.DataFrame(hits, index=evaluated, columns=symbols),
+        horizons,
+    )
+
+
+def load_cached_frames(
+    symbols: Iterable[str],
+    period: str = '5y',
+    cache: Optional[OHLCVCache] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    ローカルのOHLCVキャッシュから日足を読み込み（ネットワークは使わない）
+
+    Args:
+        symbols: ティッカーシンボル
+        period: 読み込む期間
+        cache: OHLCVCache（未指定時は既定の保存先）
+
+    Returns:
+        シンボルをキーとしたDataFrame（未キャッシュの銘柄は含まない）
+    """
+    cache = cache or OHLCVCache()
+    frames = {}
+    for symbol in symbols:
+        df = cache.load(symbol, period)
+        if df is not None:
+            frames[symbol] = df
+    return frames
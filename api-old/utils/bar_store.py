@@ -0,0 +1,229 @@
+"""
+コンパクトなメモリ内OHLCVストアと最新指標レコード
+全銘柄の日足を1プロセスに常駐させるための省メモリ表現
+
+get_historical_data の DataFrame は1本あたり
+    日付(datetime64) + open/high/low/close/volume + dividends/stock splits（未使用）
+をすべて8バイトで持つ（約56バイト/本、インデックス・calculate_all_indicators の追加列は別）。
+BarStore は使うカラムだけを
+    日付: int32（1970-01-01 からの日数）
+    価格: float32 の (4, 本数) 連続配列（行 = open, high, low, close）
+    出来高: uint32（収まらない銘柄のみ int64）
+で持ち、約24バイト/本になる。6,000銘柄 × 5年（1,260本）で約180MB。
+
+float32 への丸めによる誤差（DataFrame からの計算結果との差の上限）は FLOAT32_TOLERANCES のとおり。
+最新指標は float64 に戻してから計算するため、誤差は価格の丸め（相対 6e-8）に由来するものだけになる。
+ma_10 > ma_20 > ... の比較は差が丸め誤差以下の場合に限り perfect_order_bullish が反転しうる。
+"""
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.technical_indicators import TechnicalIndicators, LATEST_INDICATOR_KEYS, EXTRA_INDICATOR_KEYS
+
+# 価格の行（Bars.prices の行の並び）
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+# DataFrame から計算した最新指標との許容誤差（相対誤差・絶対誤差のどちらかを満たせばよい）
+FLOAT32_TOLERANCES = {
+    'rel': 1e-6,      # 価格・移動平均・VWAP・52週高値安値・ボリンジャーバンド
+    'abs': 1e-3,      # RSI・ADR・乖離率（%・ポイント単位）
+}
+
+# 出来高の整数型（NaN は 0 として格納する）
+_UINT32_MAX = np.iinfo(np.uint32).max
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def _day_numbers(df: pd.DataFrame) -> np.ndarray:
+    """Date列（または日付インデックス）を 1970-01-01 からの日数に変換（タイムゾーンは現地日付のまま）"""
+    date_col = next((c for c in ('Date', 'date', 'Datetime', 'datetime') if c in df.columns), None)
+    dates = pd.DatetimeIndex(df[date_col] if date_col is not None else df.index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return (dates.values.astype('datetime64[D]') - _EPOCH).astype(np.int32)
+
+
+class Bars:
+    """
+    1銘柄分の日足（読み取り専用として扱う）
+
+    Attributes:
+        day: 1970-01-01 からの日数（int32）
+        prices: (4, 本数) の float32 配列（行 = open, high, low, close）
+        volume: 出来高（uint32 または int64）
+    """
+
+    __slots__ = ('day', 'prices', 'volume')
+
+    def __init__(self, day: np.ndarray, prices: np.ndarray, volume: np.ndarray):
+        self.day = day
+        self.prices = prices
+        self.volume = volume
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'Bars':
+        """
+        get_historical_data 形式のDataFrameから作成（使わないカラムは捨てる）
+
+        Args:
+            df: Date列（または日付インデックス）+ 小文字の open/high/low/close/volume
+        """
+        prices = np.empty((len(PRICE_FIELDS), len(df)), dtype=np.float32)
+        for row, field in enumerate(PRICE_FIELDS):
+            prices[row] = df[field].to_numpy(dtype=np.float64)
+
+        volume = np.nan_to_num(df['volume'].to_numpy(dtype=np.float64), nan=0.0)
+        dtype = np.uint32 if len(volume) == 0 or (volume.min() >= 0 and volume.max() <= _UINT32_MAX) else np.int64
+        return cls(_day_numbers(df), prices, volume.astype(dtype))
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @property
+    def nbytes(self) -> int:
+        return self.day.nbytes + self.prices.nbytes + self.volume.nbytes
+
+    def column(self, name: str) -> np.ndarray:
+        """open/high/low/close/volume を float64 の配列で返す（コピー、date は datetime64[ns] の日付）"""
+        if name == 'date':
+            return (_EPOCH + self.day.astype('timedelta64[D]')).astype('datetime64[ns]')
+        if name == 'volume':
+            return self.volume.astype(np.float64)
+        return self.prices[PRICE_FIELDS.index(name)].astype(np.float64)
+
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(_EPOCH + self.day.astype('timedelta64[D]'), name='Date')
+
+    def to_frame(self) -> pd.DataFrame:
+        """get_historical_data と同じ形式（Date列 + 小文字カラム、float64）のDataFrameに戻す"""
+        data = {'Date': self.dates()}
+        for field in PRICE_FIELDS + ('volume',):
+            data[field] = self.column(field)
+        return pd.DataFrame(data)
+
+
+class IndicatorRecord:
+    """
+    1銘柄分の最新指標（calculate_latest_indicators の辞書の省メモリ版）
+
+    値の読み出しは辞書と同じく record['ma_50'] / record.get('ma_50') / 'ma_50' in record で行える。
+    計算していない指標は存在しないキーとして扱う。
+    """
+
+    __slots__ = ('price',) + LATEST_INDICATOR_KEYS + EXTRA_INDICATOR_KEYS
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> 'IndicatorRecord':
+        """
+        calculate_latest_indicators の辞書から作成
+
+        Raises:
+            KeyError: 最新指標以外のキーが含まれる場合
+        """
+        record = cls()
+        for key, value in values.items():
+            if key not in cls.__slots__:
+                raise KeyError(f'IndicatorRecord に {key} はありません')
+            setattr(record, key, value)
+        return record
+
+    def keys(self) -> Iterator[str]:
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((key, getattr(self, key)) for key in self.keys())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """calculate_latest_indicators と同じ順序の辞書に戻す"""
+        return dict(self.items())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__ and hasattr(self, key)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, IndicatorRecord):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'IndicatorRecord({self.to_dict()!r})'
+
+
+class BarStore:
+    """
+    複数銘柄の Bars を保持するストア
+
+    使い方:
+        store = BarStore()
+        store.put_frames(yf_wrapper.get_historical_data_bulk(symbols, period='5y'))
+        record = store.latest('AAPL')
+        df = store.frame('AAPL')  # 既存の DataFrame 前提の処理に渡す場合
+    """
+
+    def __init__(self):
+        self.bars: Dict[str, Bars] = {}
+
+    def put(self, symbol: str, df: Optional[pd.DataFrame]):
+        """1銘柄を格納（None・空の場合は何もしない）"""
+        if df is None or df.empty:
+            return
+        self.bars[symbol] = Bars.from_frame(df)
+
+    def put_frames(self, frames: Dict[str, pd.DataFrame]):
+        """get_historical_data_bulk の戻り値をまとめて格納"""
+        for symbol, df in frames.items():
+            self.put(symbol, df)
+
+    def get(self, symbol: str) -> Optional[Bars]:
+        return self.bars.get(symbol)
+
+    def frame(self, symbol: str) -> Optional[pd.DataFrame]:
+        bars = self.bars.get(symbol)
+        return None if bars is None else bars.to_frame()
+
+    def latest(self, symbol: str, fields: Optional[Iterable[str]] = None) -> Optional[IndicatorRecord]:
+        """
+        最新指標を計算
+
+        Args:
+            symbol: ティッカーシンボル
+            fields: 計算する指標（calculate_latest_indicators と同じ）
+
+        Returns:
+            最新指標（未格納の銘柄は None）
+        """
+        bars = self.bars.get(symbol)
+        if bars is None or len(bars) == 0:
+            return None
+        return IndicatorRecord.from_dict(TechnicalIndicators.calculate_latest_from_columns(bars.column, fields))
+
+    def latest_all(self, fields: Optional[Iterable[str]] = None) -> Dict[str, IndicatorRecord]:
+        """全銘柄の最新指標"""
+        fields = None if fields is None else tuple(fields)
+        return {symbol: self.latest(symbol, fields) for symbol in self.bars if len(self.bars[symbol])}
+
+    @property
+    def nbytes(self) -> int:
+        """配列の合計バイト数"""
+        return sum(bars.nbytes for bars in self.bars.values())
+
+    def __len__(self) -> int:
+        return len(self.bars)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.bars
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.bars)
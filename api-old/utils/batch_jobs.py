@@ -0,0 +1,416 @@
+"""
+再開可能なバッチ処理（batch_jobs / error_logs に進捗を記録）
+全銘柄の処理を作業単位（batch_jobs の1行 = unit_size 銘柄）に分け、1回の呼び出しは時間予算内で打ち切る。
+次の呼び出しは前回止まった銘柄の次から再開し、処理済みの銘柄はやり直さない。
+
+- 1回の実行（job_name）の対象銘柄は最初の呼び出しで作業単位の metadata に固定する
+- 作業単位の processed_count が「先頭から何銘柄目まで処理したか」のカーソル
+  （process は1銘柄ごと、process_unit は作業単位の残りをまとめて処理した後に更新）
+- 銘柄ごとのエラーは error_logs に記録し、その銘柄は処理済みとして先に進む
+- 同時に起動した呼び出しが同じ作業単位を処理しないよう、status = 'running' で確保する
+  （LEASE_SECONDS 以上更新のない running は中断されたものとみなして再確保できる）
+
+接続先は SnapshotStore と同じ（postgresql://... は prisma/migrations の 003 を適用済みのテーブル、
+sqlite:///... はスキーマを自動作成）。
+"""
+import json
+import math
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from utils.snapshot_store import DEFAULT_DATABASE_URL
+
+# 1作業単位あたりの銘柄数
+DEFAULT_UNIT_SIZE = 100
+
+# running のまま更新がない作業単位を再確保するまでの秒数
+LEASE_SECONDS = 15 * 60
+
+# 打ち切りの判定で1回の処理（1銘柄、process_unit の場合は1作業単位）の時間に掛ける余裕
+BUDGET_SAFETY_FACTOR = 2.0
+
+# SQLite 用のスキーマ（Postgres は prisma/migrations/003_unified_schema.sql と prisma/fix_batch_jobs.sql）
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_jobs (
+  id TEXT PRIMARY KEY,
+  job_name TEXT NOT NULL,
+  job_type TEXT DEFAULT 'daily_batch',
+  batch_number INTEGER NOT NULL,
+  start_index INTEGER NOT NULL,
+  end_index INTEGER NOT NULL,
+  status TEXT NOT NULL DEFAULT 'pending',
+  processed_count INTEGER DEFAULT 0,
+  success_count INTEGER DEFAULT 0,
+  error_count INTEGER DEFAULT 0,
+  started_at TEXT,
+  completed_at TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_job_name ON batch_jobs(job_name);
+CREATE TABLE IF NOT EXISTS error_logs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  symbol TEXT NOT NULL,
+  error_message TEXT NOT NULL,
+  error_type TEXT,
+  batch_job_id TEXT REFERENCES batch_jobs(id) ON DELETE CASCADE,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_error_logs_batch_job ON error_logs(batch_job_id);
+"""
+
+_UNIT_COLUMNS = (
+    'id', 'batch_number', 'start_index', 'end_index', 'status',
+    'processed_count', 'success_count', 'error_count', 'updated_at', 'metadata',
+)
+
+
+def _now() -> str:
+    """UTCの現在時刻（SQLite・Postgres の TIMESTAMP のどちらにも入る形式）"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class BatchJobStore:
+    """
+    batch_jobs / error_logs の読み書き
+
+    使い方:
+        store = BatchJobStore('sqlite:////tmp/stock-snapshot.sqlite')
+        units = store.units('update-symbols:2024-01-02') or store.create_units(job_name, symbols)
+        if store.claim(units[0]):
+            store.checkpoint(units[0], processed=1, succeeded=1, errors=[])
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        """
+        Args:
+            url: 接続先（未指定時は環境変数 SNAPSHOT_DATABASE_URL、なければ /tmp の SQLite）
+        """
+        self.url = url or os.environ.get('SNAPSHOT_DATABASE_URL', DEFAULT_DATABASE_URL)
+        self.is_postgres = self.url.startswith(('postgres://', 'postgresql://'))
+
+        if self.is_postgres:
+            try:
+                import psycopg2
+            except ImportError as e:
+                raise ImportError('Postgres に接続するには psycopg2 が必要です') from e
+            self.db = psycopg2.connect(self.url)
+        else:
+            path = self.url[len('sqlite:///'):] if self.url.startswith('sqlite:///') else self.url
+            self.db = sqlite3.connect(path)
+            self.db.executescript(SQLITE_SCHEMA)
+
+    def _execute(self, statements: Sequence[tuple]) -> List[int]:
+        """
+        (SQL, パラメータ) を1トランザクションで実行
+
+        Returns:
+            文ごとの更新行数
+        """
+        cursor = self.db.cursor()
+        try:
+            counts = []
+            for sql, params in statements:
+                cursor.execute(sql.replace('?', '%s') if self.is_postgres else sql, params)
+                counts.append(cursor.rowcount)
+            self.db.commit()
+            return counts
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _fetch(self, sql: str, params: tuple) -> List[tuple]:
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(sql.replace('?', '%s') if self.is_postgres else sql, params)
+            rows = cursor.fetchall()
+            self.db.commit()
+            return rows
+        finally:
+            cursor.close()
+
+    def units(self, job_name: str) -> List[Dict[str, Any]]:
+        """
+        実行（job_name）の作業単位を batch_number 順に取得
+
+        Returns:
+            作業単位の辞書（metadata の symbols を含む）のリスト（未作成の場合は空）
+        """
+        rows = self._fetch(
+            f"SELECT {', '.join(_UNIT_COLUMNS)} FROM batch_jobs WHERE job_name = ? ORDER BY batch_number",
+            (job_name,)
+        )
+        units = []
+        for row in rows:
+            unit = dict(zip(_UNIT_COLUMNS, row))
+            unit['id'] = str(unit['id'])
+            unit['symbols'] = json.loads(unit.pop('metadata') or '{}').get('symbols', [])
+            units.append(unit)
+        return units
+
+    def create_units(
+        self,
+        job_name: str,
+        symbols: Sequence[str],
+        unit_size: int = DEFAULT_UNIT_SIZE,
+        job_type: str = 'daily_batch'
+    ) -> List[Dict[str, Any]]:
+        """
+        対象銘柄を unit_size 件ずつの作業単位に分けて登録
+
+        Returns:
+            登録した作業単位（units と同じ形式）
+        """
+        statements = []
+        for number, start in enumerate(range(0, len(symbols), unit_size)):
+            chunk = list(symbols[start:start + unit_size])
+            statements.append((
+                'INSERT INTO batch_jobs (id, job_name, job_type, batch_number, start_index, end_index, '
+                "status, metadata) VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)",
+                (str(uuid.uuid4()), job_name, job_type, number, start, start + len(chunk),
+                 json.dumps({'symbols': chunk}))
+            ))
+        self._execute(statements)
+        return self.units(job_name)
+
+    def claim(self, unit: Dict[str, Any], lease_seconds: float = LEASE_SECONDS) -> bool:
+        """
+        作業単位を running にして確保（他の呼び出しが処理中の場合は False）
+
+        pending のもの、または lease_seconds 以上更新のない running のものだけ確保できる。
+        """
+        stale = (datetime.now(timezone.utc) - timedelta(seconds=lease_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+        now = _now()
+        (count,) = self._execute([(
+            "UPDATE batch_jobs SET status = 'running', started_at = COALESCE(started_at, ?), updated_at = ? "
+            "WHERE id = ? AND (status = 'pending' OR (status = 'running' AND updated_at < ?))",
+            (now, now, unit['id'], stale)
+        )])
+        if count == 1:
+            unit['status'] = 'running'
+        return count == 1
+
+    def checkpoint(
+        self,
+        unit: Dict[str, Any],
+        processed: int,
+        succeeded: int,
+        errors: Sequence[tuple],
+        completed: bool = False,
+        release: bool = False
+    ):
+        """
+        処理済みの件数とエラーを1トランザクションで記録
+
+        Args:
+            unit: claim した作業単位（processed_count などをこの値で更新する）
+            processed: 作業単位の先頭から処理済みの銘柄数（次回はこの位置から再開）
+            succeeded: 成功した銘柄数（作業単位の累計）
+            errors: 前回の checkpoint 以降のエラー（symbol, message, error_type）
+            completed: 作業単位をすべて処理した
+            release: 途中で打ち切った（pending に戻し、次の呼び出しがすぐ確保できるようにする）
+        """
+        status = 'completed' if completed else 'pending' if release else 'running'
+        error_count = unit['error_count'] + len(errors)
+        now = _now()
+        statements = [(
+            'INSERT INTO error_logs (symbol, error_message, error_type, batch_job_id) VALUES (?, ?, ?, ?)',
+            (symbol, message[:2000], error_type, unit['id'])
+        ) for symbol, message, error_type in errors]
+        statements.append((
+            'UPDATE batch_jobs SET processed_count = ?, success_count = ?, error_count = ?, status = ?, '
+            'updated_at = ?, completed_at = ? WHERE id = ?',
+            (processed, succeeded, error_count, status, now, now if completed else None, unit['id'])
+        ))
+        self._execute(statements)
+        unit.update({
+            'processed_count': processed, 'success_count': succeeded,
+            'error_count': error_count, 'status': status,
+        })
+
+    def errors(self, job_name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """実行（job_name）のエラーを新しい順に取得"""
+        rows = self._fetch(
+            'SELECT e.symbol, e.error_type, e.error_message FROM error_logs e '
+            'JOIN batch_jobs b ON b.id = e.batch_job_id WHERE b.job_name = ? ORDER BY e.id DESC LIMIT ?',
+            (job_name, limit)
+        )
+        return [{'symbol': s, 'error_type': t, 'message': m} for s, t, m in rows]
+
+    def close(self):
+        self.db.close()
+
+
+def parse_time_budget(value: Any, maximum: float) -> float:
+    """
+    リクエストで指定された時間予算（秒）を検証し、maximum 以下に切り詰める
+
+    Args:
+        value: 指定値（クエリ文字列など）
+        maximum: 上限（呼び出しの制限時間に合わせた既定の予算）
+
+    Returns:
+        0 より大きく maximum 以下の秒数
+
+    Raises:
+        ValueError: 数値でない・有限でない・0以下の場合
+    """
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'時間予算は秒数で指定してください: {value!r}')
+    if not math.isfinite(budget) or budget <= 0:
+        raise ValueError(f'時間予算は0より大きい秒数で指定してください: {value!r}')
+    return min(budget, maximum)
+
+
+def _process_batch(
+    batch: List[str],
+    process: Optional[Callable[[str], Any]],
+    process_unit: Optional[Callable[[List[str]], Dict[str, Exception]]]
+) -> Dict[str, Exception]:
+    """
+    1回分（1銘柄、または作業単位の残り）を処理
+
+    Returns:
+        失敗した銘柄をキーとした例外の辞書（process_unit 自体が例外を送出した場合は全銘柄）
+    """
+    try:
+        if process_unit is not None:
+            return process_unit(batch)
+        process(batch[0])
+        return {}
+    except Exception as e:
+        return {symbol: e for symbol in batch}
+
+
+def run_batch(
+    store: BatchJobStore,
+    job_name: str,
+    symbols: Callable[[], Sequence[str]],
+    process: Optional[Callable[[str], Any]],
+    time_budget: float,
+    unit_size: int = DEFAULT_UNIT_SIZE,
+    job_type: str = 'daily_batch',
+    clock: Callable[[], float] = time.perf_counter,
+    process_unit: Optional[Callable[[List[str]], Dict[str, Exception]]] = None
+) -> Dict[str, Any]:
+    """
+    作業単位を順に処理し、時間予算を使い切る前に打ち切る
+
+    Args:
+        store: 進捗の記録先
+        job_name: 実行の名前（同じ名前の呼び出しは続きから再開する。例: 'update-symbols:2024-01-02'）
+        symbols: 対象銘柄を返す関数（作業単位が未作成の場合のみ呼ぶ）
+        process: 1銘柄を処理する関数（例外を送出した銘柄は error_logs に記録）
+        time_budget: この呼び出しで使える秒数
+        unit_size: 1作業単位あたりの銘柄数
+        job_type: batch_jobs.job_type
+        clock: 経過時間の計測に使う関数
+        process_unit: process の代わりに作業単位の残りの銘柄をまとめて処理する関数
+                      （失敗した銘柄をキーとした例外の辞書を返す。例外を送出した場合は全銘柄を失敗とする）。
+                      作業単位の途中では打ち切らず、処理後に1回だけ checkpoint する
+
+    Returns:
+        この呼び出しの処理件数・スループットと、実行全体の進捗・残り時間の見込み
+
+    Raises:
+        ValueError: process と process_unit の両方、またはどちらも指定しなかった場合
+    """
+    if (process is None) == (process_unit is None):
+        raise ValueError('process と process_unit のどちらか一方を指定してください')
+
+    started = clock()
+    units = store.units(job_name)
+    if not units:
+        units = store.create_units(job_name, list(symbols()), unit_size, job_type)
+        print(f"🆕 {job_name}: {sum(len(u['symbols']) for u in units)}銘柄 / {len(units)}作業単位を登録")
+
+    processed = succeeded = failed = 0
+    slowest = 0.0
+    stopped = False
+    skipped_units = 0
+
+    for unit in units:
+        if unit['status'] == 'completed':
+            continue
+        if not store.claim(unit):
+            skipped_units += 1
+            continue
+
+        position = unit['processed_count']
+        unit_succeeded = unit['success_count']
+        unit_symbols = unit['symbols']
+        while position < len(unit_symbols):
+            # 次の1回分が予算内に終わらない見込みなら打ち切る
+            if clock() - started + slowest * BUDGET_SAFETY_FACTOR > time_budget:
+                stopped = True
+                break
+
+            batch = unit_symbols[position:] if process_unit is not None else unit_symbols[position:position + 1]
+            batch_started = clock()
+            failures = _process_batch(batch, process, process_unit)
+            errors = []
+            for symbol in batch:
+                if symbol in failures:
+                    e = failures[symbol]
+                    errors.append((symbol, str(e) or repr(e), type(e).__name__))
+                    print(f"❌ {symbol}: {e}")
+            slowest = max(slowest, clock() - batch_started)
+            position += len(batch)
+            processed += len(batch)
+            unit_succeeded += len(batch) - len(errors)
+            succeeded += len(batch) - len(errors)
+            failed += len(errors)
+            store.checkpoint(unit, position, unit_succeeded, errors, completed=position == len(unit_symbols))
+
+        if stopped:
+            store.checkpoint(unit, position, unit_succeeded, [], release=True)
+            break
+
+    elapsed = clock() - started
+    total = sum(len(u['symbols']) for u in units)
+    done = sum(u['processed_count'] for u in units)
+    remaining = total - done
+    throughput = processed / elapsed if elapsed > 0 else 0.0
+    completed_units = sum(u['status'] == 'completed' for u in units)
+    if remaining == 0:
+        eta = 0.0
+    elif throughput > 0:
+        eta = remaining / throughput
+    else:
+        eta = None
+
+    return {
+        'job_name': job_name,
+        'status': 'completed' if remaining == 0 else 'partial',
+        'invocation': {
+            'processed': processed,
+            'succeeded': succeeded,
+            'failed': failed,
+            'elapsed_seconds': round(elapsed, 2),
+            'throughput_per_second': round(throughput, 3),
+            'stopped_by_budget': stopped,
+            'units_in_progress_elsewhere': skipped_units,
+        },
+        'progress': {
+            'total_symbols': total,
+            'processed': done,
+            'remaining': remaining,
+            'succeeded': sum(u['success_count'] for u in units),
+            'failed': sum(u['error_count'] for u in units),
+            'units_completed': completed_units,
+            'units_total': len(units),
+            'percent': round(done / total * 100, 1) if total else 100.0,
+        },
+        # この呼び出しのスループットが続いた場合の残りの処理時間と呼び出し回数
+        'eta_seconds': None if eta is None else round(eta, 1),
+        'eta_invocations': None if eta is None else math.ceil(eta / time_budget) if time_budget > 0 else None,
+    }
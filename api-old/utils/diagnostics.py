@@ -0,0 +1,253 @@
+"""
+スクリーニングの計測・プロファイリング
+ステージごとの所要時間（実時間・CPU時間）のヒストグラムと入出力件数を集計し、
+遅い原因がネットワーク待ち・レート制限の待機・CPUのどれかを判断できるようにする
+
+- Diagnostics: ステージ計測（スレッドセーフ、別プロセスの計測結果も合算できる）
+- SamplingProfiler: 全スレッドのスタックを一定間隔で採取（folded stacks 形式で保存）
+- cProfile はリクエストを処理するスレッドのみ計測する
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# ヒストグラムの区切り（ミリ秒）
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# プロファイルの保存先
+PROFILE_DIR = os.environ.get('SCREEN_PROFILE_DIR', '/tmp/screen-profiles')
+
+
+def _bucket(ms: float) -> str:
+    for bound in HISTOGRAM_BOUNDS_MS:
+        if ms <= bound:
+            return f'<={bound}'
+    return f'>{HISTOGRAM_BOUNDS_MS[-1]}'
+
+
+class Diagnostics:
+    """
+    ステージ別の計測
+
+    使い方:
+        diagnostics = Diagnostics()
+        with diagnostics.stage('fetch_history'):
+            ...
+        diagnostics.count('fetch_history', items_in=100, items_out=98)
+        diagnostics.to_dict()
+
+    enabled=False の場合は何も記録しない（計測コードを分岐なしで書くため）。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.started_wall = time.perf_counter()
+        self.started_cpu = time.process_time()
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {
+                'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0, 'max_wall_ms': 0.0,
+                'in': 0, 'out': 0, 'histogram_ms': Counter(),
+            }
+        return entry
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        ブロックの実時間とCPU時間（実行スレッドのみ）を記録
+
+        Args:
+            name: ステージ名
+        """
+        if not self.enabled:
+            yield
+            return
+
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - wall) * 1000, (time.thread_time() - cpu) * 1000)
+
+    def record(self, name: str, wall_ms: float, cpu_ms: float):
+        """計測値を1件記録"""
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self._entry(name)
+            entry['calls'] += 1
+            entry['wall_ms'] += wall_ms
+            entry['cpu_ms'] += cpu_ms
+            entry['max_wall_ms'] = max(entry['max_wall_ms'], wall_ms)
+            entry['histogram_ms'][_bucket(wall_ms)] += 1
+
+    def count(self, name: str, items_in: int = 0, items_out: int = 0):
+        """ステージの入力件数・出力件数を加算"""
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self._entry(name)
+            entry['in'] += items_in
+            entry['out'] += items_out
+
+    def merge(self, stages: Dict[str, Dict[str, Any]]):
+        """別プロセスの to_dict()['stages'] を合算"""
+        if not self.enabled:
+            return
+        with self.lock:
+            for name, other in stages.items():
+                entry = self._entry(name)
+                for key in ('calls', 'wall_ms', 'cpu_ms', 'in', 'out'):
+                    entry[key] += other[key]
+                entry['max_wall_ms'] = max(entry['max_wall_ms'], other['max_wall_ms'])
+                entry['histogram_ms'].update(other['histogram_ms'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """計測結果（JSONに変換できる辞書）"""
+        with self.lock:
+            stages = {
+                name: {
+                    **{key: entry[key] for key in ('calls', 'in', 'out')},
+                    'wall_ms': round(entry['wall_ms'], 3),
+                    'cpu_ms': round(entry['cpu_ms'], 3),
+                    'max_wall_ms': round(entry['max_wall_ms'], 3),
+                    'histogram_ms': {
+                        bucket: entry['histogram_ms'][bucket]
+                        for bucket in [f'<={b}' for b in HISTOGRAM_BOUNDS_MS] + [f'>{HISTOGRAM_BOUNDS_MS[-1]}']
+                        if entry['histogram_ms'][bucket]
+                    },
+                }
+                for name, entry in self.stages.items()
+            }
+        return {
+            'stages': stages,
+            'process': {
+                'wall_ms': round((time.perf_counter() - self.started_wall) * 1000, 3),
+                'cpu_ms': round((time.process_time() - self.started_cpu) * 1000, 3),
+            },
+        }
+
+
+def classify_bottleneck(wall_ms: float, cpu_ms: float, limiter_wait_ms: float) -> str:
+    """
+    遅さの主因を判定
+
+    Args:
+        wall_ms: リクエスト全体の実時間
+        cpu_ms: プロセスのCPU時間
+        limiter_wait_ms: レート制限の待機時間（全スレッドの合計）
+
+    Returns:
+        'sleep'（レート制限待ち）/ 'cpu'（計算）/ 'network'（通信待ち）
+    """
+    if wall_ms <= 0:
+        return 'cpu'
+    if limiter_wait_ms >= wall_ms * 0.5:
+        return 'sleep'
+    if cpu_ms >= wall_ms * 0.7:
+        return 'cpu'
+    return 'network'
+
+
+class SamplingProfiler:
+    """
+    全スレッドのスタックを interval 秒ごとに採取するプロファイラ
+
+    cProfile と違いスレッドプールで実行される取得処理も計測できる。
+    結果は flamegraph.pl / speedscope で読める folded stacks 形式で保存する。
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+@contextmanager
+def profile_request(mode: Optional[str], result: Dict[str, Any]) -> Iterator[None]:
+    """
+    1リクエスト分のプロファイルを取得して PROFILE_DIR に保存
+
+    Args:
+        mode: 'cprofile' / 'sampling'（None の場合は何もしない）
+        result: 保存先パスと上位の関数を書き込む辞書
+    """
+    if mode not in ('cprofile', 'sampling'):
+        yield
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(PROFILE_DIR, f'screen-{stamp}-{os.getpid()}.prof')
+            profiler.dump_stats(path)
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+            lines = [line for line in summary.getvalue().splitlines() if line.strip()]
+            result.update({'mode': mode, 'path': path, 'top': lines[-16:]})
+            print(f"🔬 プロファイル保存: {path}")
+    else:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = os.path.join(PROFILE_DIR, f'screen-{stamp}-{os.getpid()}.folded')
+            profiler.dump(path)
+            # 最も深いフレーム（実行中の関数）ごとのサンプル数
+            leaves = Counter()
+            for stack, count in profiler.samples.items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            result.update({
+                'mode': mode,
+                'path': path,
+                'samples': sum(profiler.samples.values()),
+                'top': [f'{count} {leaf}' for leaf, count in leaves.most_common(15)],
+            })
+            print(f"🔬 プロファイル保存: {path}")
@@ -0,0 +1,307 @@
+"""
+並列フェッチスケジューラ
+トークンバケットによるレート制限とジッター付きリトライを実装
+
+- TokenBucket: 秒間・時間あたりの呼び出し上限を共有管理（スレッドセーフ）
+- FetchScheduler: スレッドプールで並列取得し、完了順に結果をストリーミング
+- SingleFlight: 同じキーの同時実行を1回にまとめ、待機中の呼び出し元に結果を共有
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+
+class RateLimitError(Exception):
+    """レート制限（HTTP 429）を示す例外"""
+    pass
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    リトライ対象のエラーか判定
+
+    レート制限・サーバーエラー・一時的な通信エラーをリトライ対象とする。
+    """
+    if isinstance(error, (RateLimitError, ConnectionError, TimeoutError)):
+        return True
+    # requests の例外は組み込みの ConnectionError を継承しないため名前で判定
+    if type(error).__name__ in ('ConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout'):
+        return True
+
+    # requests.HTTPError などはレスポンスのステータスコードで判定
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(status, int):
+        return status == 429 or 500 <= status < 600
+
+    message = str(error).lower()
+    return any(key in message for key in ('429', 'too many requests', 'rate limit', 'timed out'))
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限（秒間 + 時間あたりの2段階）
+
+    Yahoo Finance の推定上限 2,000 calls/hour に合わせ、
+    短期のバーストは calls_per_second、長期の総量は calls_per_hour で抑える。
+    """
+
+    def __init__(
+        self,
+        calls_per_second: float = 5.0,
+        calls_per_hour: float = 2000.0,
+        burst: Optional[float] = None
+    ):
+        """
+        Args:
+            calls_per_second: 秒間の平均呼び出し数
+            calls_per_hour: 1時間あたりの呼び出し上限
+            burst: 秒間バケットの容量（デフォルトは calls_per_second）
+        """
+        self.second_rate = calls_per_second
+        self.second_capacity = burst if burst is not None else max(calls_per_second, 1.0)
+        self.hour_rate = calls_per_hour / 3600.0
+        self.hour_capacity = calls_per_hour
+
+        self.second_tokens = self.second_capacity
+        self.hour_tokens = self.hour_capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+        # 統計
+        self.acquired = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.second_tokens = min(self.second_capacity, self.second_tokens + elapsed * self.second_rate)
+        self.hour_tokens = min(self.hour_capacity, self.hour_tokens + elapsed * self.hour_rate)
+
+    def acquire(self, count: int = 1) -> float:
+        """
+        トークンを count 個取得（不足時は補充されるまで待機）
+
+        1回で複数のリクエストを送る呼び出し（yf.download など）はリクエスト数を count に指定する。
+        容量を超える count でも待てるよう、1つずつ取得する。
+
+        Args:
+            count: 取得するトークン数
+
+        Returns:
+            待機した秒数
+        """
+        return sum(self._acquire_one() for _ in range(count))
+
+    def _acquire_one(self) -> float:
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.second_tokens >= 1 and self.hour_tokens >= 1:
+                    self.second_tokens -= 1
+                    self.hour_tokens -= 1
+                    self.acquired += 1
+                    self.total_wait += waited
+                    return waited
+
+                sleep_for = max(
+                    (1 - self.second_tokens) / self.second_rate if self.second_tokens < 1 else 0,
+                    (1 - self.hour_tokens) / self.hour_rate if self.hour_tokens < 1 else 0,
+                )
+
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+    def stats(self) -> dict:
+        """取得回数と累計待機時間"""
+        with self.lock:
+            return {
+                'acquired': self.acquired,
+                'total_wait_seconds': round(self.total_wait, 3),
+            }
+
+
+class FetchResult(NamedTuple):
+    """フェッチ結果（完了順に返される）"""
+    key: Any
+    value: Any
+    error: Optional[Exception]
+    attempts: int
+
+
+class FetchScheduler:
+    """
+    スレッドプールによる並列フェッチ
+
+    - 同時実行数は max_workers まで、投入は完了に合わせて逐次行う（メモリ一定）
+    - limiter を渡すと試行ごとにトークンを取得する
+      （YFinanceWrapper に limiter を持たせる場合は不要）
+    - リトライ対象のエラーはフルジッター付き指数バックオフで再試行
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0
+    ):
+        self.max_workers = max_workers
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt: int) -> float:
+        """フルジッター付き指数バックオフの待機秒数"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _run(self, fn: Callable[[Any], Any], key: Any) -> FetchResult:
+        attempt = 0
+        while True:
+            try:
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                return FetchResult(key, fn(key), None, attempt + 1)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    return FetchResult(key, None, e, attempt + 1)
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    def stream(self, keys: Iterable[Any], fn: Callable[[Any], Any]) -> Iterator[FetchResult]:
+        """
+        keys の各要素に fn を並列適用し、完了した順に結果を返す
+
+        Args:
+            keys: 取得対象（ティッカーシンボルなど）
+            fn: 1件を取得する関数
+
+        Yields:
+            FetchResult
+        """
+        keys = iter(keys)
+        max_in_flight = self.max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = set()
+
+            def fill():
+                for key in keys:
+                    in_flight.add(executor.submit(self._run, fn, key))
+                    if len(in_flight) >= max_in_flight:
+                        break
+
+            fill()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    yield future.result()
+                fill()
+
+
+class _Call:
+    """実行中の処理1件（完了すると結果または例外を待機中の呼び出し元に渡す）"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        """完了まで待機して結果を返す（実行側で例外が発生した場合は同じ例外を送出）"""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    同じキーの処理を同時に1回だけ実行する（スレッドセーフ）
+
+    実行中のキーを後から要求した呼び出し元は、新たに実行せず完了を待って同じ結果を受け取る。
+    完了後のキーは保持しない（結果のキャッシュは呼び出し側で行う）。
+
+    使い方:
+        flights = SingleFlight()
+        value, leader = flights.do(key, lambda: fetch(key))
+
+        # 複数キーをまとめて実行する場合
+        call, leader = flights.begin(key)
+        if leader:
+            flights.finish(key, call, result=value)  # 例外時は error=e
+        else:
+            value = call.wait()
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, _Call] = {}
+        self.lock = threading.Lock()
+
+        # 統計（leaders: 実行した回数 / coalesced: 実行中の処理の結果を共有した回数）
+        self.leaders = 0
+        self.coalesced = 0
+
+    def begin(self, key: Hashable) -> Tuple[_Call, bool]:
+        """
+        キーの実行を開始（実行中なら既存の処理を返す）
+
+        Returns:
+            (処理, 実行する側か)。実行する側は必ず finish を呼ぶこと
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self.calls[key] = _Call()
+            self.leaders += 1
+            return call, True
+
+    def finish(self, key: Hashable, call: _Call, result: Any = None, error: Optional[BaseException] = None):
+        """実行結果を待機中の呼び出し元に渡してキーを解放"""
+        with self.lock:
+            if self.calls.get(key) is call:
+                del self.calls[key]
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        fn を実行（同じキーが実行中ならその結果を待つ）
+
+        Returns:
+            (結果, 実行した側か)。共有された結果は同じオブジェクトのため、変更する場合は複製すること
+
+        Raises:
+            fn が送出した例外（待機していた呼び出し元にも同じ例外を送出）
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait(), False
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result, True
+
+    def stats(self) -> dict:
+        """実行回数・共有回数・実行中のキー数"""
+        with self.lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self.calls),
+            }
@@ -0,0 +1,347 @@
+"""
+フィルター条件のコンパイラ
+リクエストごとに filters を一度だけ解釈し、列指向の最新指標テーブル
+（1行 = 1銘柄、1列 = 1指標）に対するブールマスクとスコアを一括で計算する
+
+対応するフィルター:
+    technical.price_above_ma / adr_20 / rsi_14 / ma_alignment / perfect_order_bullish
+    fundamental.market_cap / price_range / sectors / exchange / country
+    ranges:      任意の列の min/max   例) {"distance_ma_10": {"min": -5, "max": 5}}
+    comparisons: 列同士・列と数値の比較 例) ["close > ema_21", "ma_50 > ma_150",
+                                          {"left": "rsi_14", "op": ">=", "right": 50}]
+
+条件の解釈は parse_filters の1か所で行い、ライブのスクリーニング（screen_planner）も同じ Condition を
+1銘柄ずつ判定する（ライブとスナップショット・バックテストで結果が変わらない）。
+
+週足・月足の指標は weekly_ / monthly_ を付けて指定する 例) ["weekly_close > weekly_ma_30"]
+（ライブのスクリーニングのみ。スナップショット・バックテストのテーブルは日足の指標だけを持つ）
+"""
+import operator
+import re
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.timeframes import prefixed, split_field
+
+# 比較演算子
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# 列名の別名（最新指標では終値を price として持つ）
+COLUMN_ALIASES = {'close': 'price'}
+
+# 銘柄情報（get_stock_info）由来の列
+FUNDAMENTAL_COLUMNS = ('name', 'sector', 'industry', 'market_cap', 'exchange', 'country')
+
+_COMPARISON_PATTERN = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(>=|<=|==|!=|>|<)\s*(\S+)\s*$')
+
+
+def resolve_column(name: str) -> str:
+    """別名を実際の列名に変換（weekly_close → weekly_price のように時間軸の接頭辞は残す）"""
+    timeframe, base = split_field(name)
+    return prefixed(timeframe, COLUMN_ALIASES.get(base, base))
+
+
+def parse_comparison(spec: Union[str, Dict[str, Any]]) -> Tuple[str, str, Union[str, float]]:
+    """
+    比較条件を (左辺の列, 演算子, 右辺の列または数値) に変換
+
+    Args:
+        spec: "close > ema_21" 形式の文字列、または left/op/right の辞書
+
+    Returns:
+        (left, op, right)
+
+    Raises:
+        ValueError: 形式・演算子が不正な場合
+    """
+    if isinstance(spec, str):
+        match = _COMPARISON_PATTERN.match(spec)
+        if not match:
+            raise ValueError(f'比較条件の形式が不正です: {spec}')
+        left, op, right = match.groups()
+        try:
+            right = float(right)
+        except ValueError:
+            pass
+    else:
+        left, op, right = spec.get('left'), spec.get('op'), spec.get('right')
+
+    if op not in OPERATORS:
+        raise ValueError(f'未対応の演算子です: {op}')
+    if not isinstance(left, str):
+        raise ValueError(f'比較条件の左辺は列名が必要です: {spec}')
+
+    left = resolve_column(left)
+    if isinstance(right, str):
+        right = resolve_column(right)
+    return left, op, right
+
+
+def score_table(table: pd.DataFrame) -> np.ndarray:
+    """
+    スコア（0-100点）を全行まとめて計算
+
+    screen.py の _calculate_score と同じ配点。値がない（NaN）項目は加点しない。
+
+    Args:
+        table: 最新指標テーブル
+
+    Returns:
+        int配列のスコア
+    """
+    n = len(table)
+
+    def column(name: str) -> np.ndarray:
+        if name not in table.columns:
+            return np.full(n, np.nan)
+        return pd.to_numeric(table[name], errors='coerce').to_numpy(dtype=float)
+
+    with np.errstate(invalid='ignore'):
+        price = column('price')
+        ma_200 = column('ma_200')
+        adr = column('adr_20')
+        rsi = column('rsi_14')
+        market_cap = column('market_cap')
+        perfect_order = column('perfect_order_bullish')
+
+        score = np.zeros(n, dtype=np.int64)
+        # 移動平均線の並び（20点）
+        score += np.where(perfect_order == 1, 20, 0)
+        # 200MA以上（15点）
+        score += np.where((ma_200 != 0) & (price > ma_200), 15, 0)
+        # ADR（15点 / 10点）
+        score += np.where(adr >= 6, 15, np.where(adr >= 4, 10, 0))
+        # RSI（10点）
+        score += np.where((rsi >= 50) & (rsi <= 70), 10, 0)
+        # 時価総額（5点）
+        score += np.where(market_cap >= 10_000_000_000, 5, 0)
+
+    return score
+
+
+class CompiledFilter:
+    """
+    コンパイル済みのフィルター
+
+    使い方:
+        compiled = compile_filters(filters)
+        mask, scores = compiled.evaluate(table)
+        matches = compiled.apply(table)   # 通過行をスコア順に並べたDataFrame
+    """
+
+    def __init__(self, conditions: List['Condition']):
+        self.conditions = conditions
+
+    def evaluate(self, table: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        全行のマスクとスコアを計算
+
+        Args:
+            table: 最新指標テーブル（1行 = 1銘柄）
+
+        Returns:
+            (通過マスク, スコア)
+        """
+        mask = np.ones(len(table), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for condition in self.conditions:
+                mask &= condition.mask(table)
+        return mask, score_table(table)
+
+    def apply(self, table: pd.DataFrame) -> pd.DataFrame:
+        """
+        通過した行をスコアの高い順に返す
+
+        Args:
+            table: 最新指標テーブル
+
+        Returns:
+            score 列を追加したDataFrame
+        """
+        mask, scores = self.evaluate(table)
+        matched = table[mask].assign(score=scores[mask])
+        return matched.sort_values('score', ascending=False, kind='stable')
+
+
+def _numeric(table: pd.DataFrame, name: str) -> np.ndarray:
+    """数値列（存在しない列・None はNaN）"""
+    if name not in table.columns:
+        return np.full(len(table), np.nan)
+    return pd.to_numeric(table[name], errors='coerce').to_numpy(dtype=float)
+
+
+def _number(values: Dict[str, Any], name: str) -> float:
+    """1銘柄の辞書の数値（_numeric と同じく、ない値・数値にできない値はNaN）"""
+    try:
+        return float(values.get(name))
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class Condition:
+    """
+    フィルター条件1つ分
+
+    同じ条件をテーブル全体（mask）と1銘柄の辞書（check）のどちらでも判定できる。
+    スナップショット・バックテストは mask、ライブのスクリーニング（screen_planner）は check を使うため、
+    条件の解釈と値がない場合の扱い（不通過）は parse_filters の1か所で決まる。
+    """
+
+    def __init__(self, name: str, kind: str, fields: List[str], **params):
+        """
+        Args:
+            name: 条件名（ログ用）
+            kind: 'range'（min/max）/ 'compare'（比較）/ 'member'（候補に含まれる）/ 'flag'（値が1）
+            fields: 参照する列（compare の右辺が列の場合は2列）
+            params: range は spec、compare は op と right、member は allowed
+        """
+        self.name = name
+        self.kind = kind
+        self.fields = fields
+        self.params = params
+
+    def mask(self, table: pd.DataFrame) -> np.ndarray:
+        """テーブルの全行を判定"""
+        field = self.fields[0]
+        if self.kind == 'member':
+            if field not in table.columns:
+                return np.zeros(len(table), dtype=bool)
+            return table[field].isin(self.params['allowed']).to_numpy()
+        if self.kind == 'compare':
+            right = self.params['right']
+            rhs = _numeric(table, right) if isinstance(right, str) else right
+            return self._compare(_numeric(table, field), rhs)
+        return self._numeric_check(_numeric(table, field))
+
+    def check(self, values: Dict[str, Any]) -> bool:
+        """1銘柄の辞書（指標・銘柄情報）を判定"""
+        field = self.fields[0]
+        if self.kind == 'member':
+            return values.get(field) in self.params['allowed']
+        if self.kind == 'compare':
+            right = self.params['right']
+            rhs = _number(values, right) if isinstance(right, str) else right
+            return bool(self._compare(_number(values, field), rhs))
+        return bool(self._numeric_check(_number(values, field)))
+
+    def _compare(self, lhs, rhs):
+        # NaN との比較は != でも不通過にする
+        return OPERATORS[self.params['op']](lhs, rhs) & ~np.isnan(lhs) & ~np.isnan(rhs)
+
+    def _numeric_check(self, values):
+        if self.kind == 'flag':
+            return values == 1
+        spec = self.params['spec']
+        mask = ~np.isnan(values)
+        if 'min' in spec:
+            mask &= values >= spec['min']
+        if 'max' in spec:
+            mask &= values <= spec['max']
+        return mask
+
+
+def parse_filters(filters: dict) -> List[Condition]:
+    """
+    filters 辞書を条件のリストに変換（compile_filters と screen_planner の共通の解釈）
+
+    Args:
+        filters: リクエストのフィルター条件
+
+    Returns:
+        Condition のリスト
+
+    Raises:
+        ValueError: 比較条件が不正な場合
+    """
+    conditions: List[Condition] = []
+    technical = filters.get('technical', {}) or {}
+    fundamental = filters.get('fundamental', {}) or {}
+
+    # 移動平均線フィルター（株価 >= MA）
+    price_above_ma = technical.get('price_above_ma', {}) or {}
+    for ma in ('ma_10', 'ma_20', 'ma_50', 'ma_150', 'ma_200'):
+        if price_above_ma.get(ma):
+            conditions.append(Condition(f'price_above_{ma}', 'compare', ['price', ma], op='>=', right=ma))
+
+    # ADR・RSIフィルター
+    for field in ('adr_20', 'rsi_14'):
+        spec = technical.get(field, {}) or {}
+        if 'min' in spec or 'max' in spec:
+            conditions.append(Condition(field, 'range', [field], spec=spec))
+
+    # パーフェクトオーダー
+    ma_alignment = technical.get('ma_alignment', {}) or {}
+    if (ma_alignment.get('enabled') and ma_alignment.get('order') == 'bullish') or technical.get('perfect_order_bullish'):
+        conditions.append(Condition('perfect_order_bullish', 'flag', ['perfect_order_bullish']))
+
+    # 株価帯・時価総額
+    for key, column in (('price_range', 'price'), ('market_cap', 'market_cap')):
+        spec = fundamental.get(key, {}) or {}
+        if 'min' in spec or 'max' in spec:
+            conditions.append(Condition(key, 'range', [column], spec=spec))
+
+    # セクター・取引所・国
+    for key, column in (('sectors', 'sector'), ('exchange', 'exchange'), ('country', 'country')):
+        allowed = fundamental.get(key) or []
+        if allowed:
+            conditions.append(Condition(key, 'member', [column], allowed=list(allowed)))
+
+    # 任意列の範囲
+    for name, spec in (filters.get('ranges', {}) or {}).items():
+        conditions.append(Condition(f'range_{name}', 'range', [resolve_column(name)], spec=spec or {}))
+
+    # 列同士の比較
+    for spec in filters.get('comparisons', []) or []:
+        left, op, right = parse_comparison(spec)
+        fields = [left, right] if isinstance(right, str) else [left]
+        conditions.append(Condition(f'{left} {op} {right}', 'compare', fields, op=op, right=right))
+
+    return conditions
+
+
+def compile_filters(filters: dict) -> CompiledFilter:
+    """
+    filters 辞書をベクトル化された判定に変換
+
+    Args:
+        filters: リクエストのフィルター条件
+
+    Returns:
+        CompiledFilter
+
+    Raises:
+        ValueError: 比較条件が不正な場合
+    """
+    return CompiledFilter(parse_filters(filters))
+
+
+def build_snapshot_table(
+    indicators: Dict[str, Dict[str, Any]],
+    infos: Dict[str, Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """
+    銘柄別の最新指標（と銘柄情報）を列指向のテーブルに変換
+
+    Args:
+        indicators: シンボルをキーとした最新指標の辞書
+        infos: シンボルをキーとした get_stock_info の辞書（任意）
+
+    Returns:
+        インデックスがシンボルのDataFrame（None はNaN）
+    """
+    table = pd.DataFrame.from_dict(indicators, orient='index')
+    if infos:
+        info_table = pd.DataFrame.from_dict(infos, orient='index')
+        info_columns = [c for c in FUNDAMENTAL_COLUMNS if c in info_table.columns]
+        table = table.join(info_table[info_columns], how='left')
+    table.index.name = 'symbol'
+    return table
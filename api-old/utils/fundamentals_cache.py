@@ -0,0 +1,166 @@
+"""
+銘柄基本情報（ticker.info）のTTL + LRUキャッシュ
+ticker.info は最も遅くレート制限の厳しいエンドポイントのため、結果を再利用する
+
+- 項目ごとのTTL: 銘柄名・セクター等は日単位、時価総額・株価は時間単位
+- 件数上限付きのLRU（スレッドセーフ）
+- 任意でSQLiteに書き込み、プロセス再起動後も再利用
+- ヒット・ミス・追い出し件数を集計
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable, Callable
+
+# 変化の少ない項目（銘柄名・セクターなど）
+STATIC_FIELDS = ('symbol', 'name', 'sector', 'industry', 'exchange', 'country')
+
+# 市場で変動する項目
+MARKET_FIELDS = ('market_cap', 'current_price')
+
+DEFAULT_STATIC_TTL = 3 * 24 * 3600  # 3日
+DEFAULT_MARKET_TTL = 6 * 3600       # 6時間
+
+
+class FundamentalsCache:
+    """
+    get_stock_info の結果を保持するキャッシュ
+
+    使い方:
+        cache = FundamentalsCache(max_size=10000, disk_path='/tmp/fundamentals.sqlite')
+        info = cache.get('AAPL', fields=('name', 'sector'))  # 指定項目がすべて有効期限内ならヒット
+        cache.put('AAPL', info)
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        static_ttl: float = DEFAULT_STATIC_TTL,
+        market_ttl: float = DEFAULT_MARKET_TTL,
+        disk_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            max_size: メモリ上に保持する最大銘柄数
+            static_ttl: 銘柄名・セクター等の有効期間（秒）
+            market_ttl: 時価総額・株価の有効期間（秒）
+            disk_path: SQLiteファイルのパス（未指定時はメモリのみ）
+            clock: 現在時刻を返す関数
+        """
+        self.max_size = max_size
+        self.static_ttl = static_ttl
+        self.market_ttl = market_ttl
+        self.clock = clock
+
+        self.entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.db = None
+        if disk_path:
+            self.db = sqlite3.connect(disk_path, check_same_thread=False)
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS fundamentals ('
+                'symbol TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)'
+            )
+            self.db.commit()
+
+    def _ttl(self, field: str) -> float:
+        return self.market_ttl if field in MARKET_FIELDS else self.static_ttl
+
+    def _is_fresh(self, entry: Dict[str, Any], fields: Iterable[str], now: float) -> bool:
+        age = now - entry['fetched_at']
+        return all(age < self._ttl(field) for field in fields)
+
+    def _load_from_disk(self, symbol: str) -> Optional[Dict[str, Any]]:
+        if self.db is None:
+            return None
+        row = self.db.execute(
+            'SELECT data, fetched_at FROM fundamentals WHERE symbol = ?', (symbol,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'data': json.loads(row[0]), 'fetched_at': row[1]}
+
+    def get(self, symbol: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュから銘柄情報を取得
+
+        Args:
+            symbol: ティッカーシンボル
+            fields: 必要な項目（未指定時は全項目）。すべて有効期限内の場合のみヒット
+
+        Returns:
+            銘柄情報の辞書、ミス時はNone
+        """
+        fields = tuple(fields) if fields is not None else STATIC_FIELDS + MARKET_FIELDS
+        now = self.clock()
+
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is None:
+                entry = self._load_from_disk(symbol)
+                if entry is not None:
+                    self._insert(symbol, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if not self._is_fresh(entry, fields, now):
+                # 長期項目まで期限切れなら保持する意味がないので削除
+                if not self._is_fresh(entry, STATIC_FIELDS, now):
+                    del self.entries[symbol]
+                    self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(symbol)
+            self.hits += 1
+            return dict(entry['data'])
+
+    def put(self, symbol: str, info: Dict[str, Any]):
+        """
+        銘柄情報を保存
+
+        Args:
+            symbol: ティッカーシンボル
+            info: get_stock_info の戻り値
+        """
+        entry = {'data': dict(info), 'fetched_at': self.clock()}
+        with self.lock:
+            self._insert(symbol, entry)
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO fundamentals (symbol, data, fetched_at) VALUES (?, ?, ?)',
+                    (symbol, json.dumps(entry['data'], ensure_ascii=False), entry['fetched_at'])
+                )
+                self.db.commit()
+
+    def _insert(self, symbol: str, entry: Dict[str, Any]):
+        """LRU順の末尾に追加し、上限を超えたら最古の銘柄を追い出す"""
+        self.entries[symbol] = entry
+        self.entries.move_to_end(symbol)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット・ミス・追い出し件数"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
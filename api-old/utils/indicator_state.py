@@ -0,0 +1,475 @@
+"""
+インクリメンタル（ストリーミング）指標状態
+新しい日足1本ごとに O(1) でテクニカル指標を更新する
+
+TechnicalIndicators.calculate_all_indicators と同じ式を逐次計算で再現し、
+状態は to_dict / from_dict でJSONとして保存・復元できる。
+"""
+import math
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+import pandas as pd
+
+
+def _is_nan(value: Optional[float]) -> bool:
+    return value is None or value != value
+
+
+def _encode(values) -> List[Optional[float]]:
+    """NaNをNoneに変換（JSON保存用）"""
+    return [None if _is_nan(v) else v for v in values]
+
+
+def _decode(values) -> List[float]:
+    """NoneをNaNに戻す"""
+    return [math.nan if v is None else v for v in values]
+
+
+class RollingWindow:
+    """
+    固定長リングバッファによる移動平均・分散
+
+    合計と平均・偏差平方和（Welford法）を追加・削除で更新する。
+    丸め誤差の蓄積を防ぐため、バッファが一周するたびに合計を再計算する
+    （償却 O(1)）。NaNを含む窓はpandasのrollingと同様にNaNを返す。
+    """
+
+    def __init__(self, period: int):
+        self.period = period
+        self.buffer: List[float] = []
+        self.pos = 0
+        self.nan_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.valid_count = 0
+
+    def push(self, value: float):
+        """値を1つ追加（窓が満杯なら最古の値を削除）"""
+        if len(self.buffer) < self.period:
+            self.buffer.append(value)
+            self._add(value)
+        else:
+            old = self.buffer[self.pos]
+            self.buffer[self.pos] = value
+            self.pos = (self.pos + 1) % self.period
+            self._remove(old)
+            self._add(value)
+            if self.pos == 0:
+                self._recompute()
+
+    def _add(self, value: float):
+        if _is_nan(value):
+            self.nan_count += 1
+            return
+        self.valid_count += 1
+        delta = value - self.mean
+        self.mean += delta / self.valid_count
+        self.m2 += delta * (value - self.mean)
+
+    def _remove(self, value: float):
+        if _is_nan(value):
+            self.nan_count -= 1
+            return
+        self.valid_count -= 1
+        if self.valid_count == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.valid_count
+        self.m2 -= delta * (value - self.mean)
+
+    def _recompute(self):
+        """バッファから平均・偏差平方和を再計算"""
+        values = [v for v in self.buffer if not _is_nan(v)]
+        self.valid_count = len(values)
+        self.nan_count = len(self.buffer) - len(values)
+        if not values:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        self.mean = math.fsum(values) / len(values)
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in values)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.buffer) == self.period and self.nan_count == 0
+
+    def get_mean(self) -> float:
+        return self.mean if self.ready else math.nan
+
+    def get_std(self) -> float:
+        """標本標準偏差（ddof=1、pandasのrolling.stdと同じ）"""
+        if not self.ready or self.period < 2:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.period - 1))
+
+    def to_dict(self) -> Dict[str, Any]:
+        # 論理順（古い順）に並べて保存すれば復元時に再計算だけで済む
+        ordered = self.buffer[self.pos:] + self.buffer[:self.pos]
+        return {'period': self.period, 'buffer': _encode(ordered)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RollingWindow':
+        window = cls(data['period'])
+        window.buffer = _decode(data['buffer'])
+        window._recompute()
+        return window
+
+
+class RollingExtreme:
+    """
+    単調デックによる移動最大値・最小値（償却 O(1)）
+    """
+
+    def __init__(self, period: int, mode: str = 'max'):
+        self.period = period
+        self.mode = mode
+        self.index = 0
+        self.candidates: deque = deque()  # (index, value)
+        self.nan_indices: deque = deque()
+
+    def push(self, value: float):
+        """値を1つ追加"""
+        i = self.index
+        self.index += 1
+
+        if _is_nan(value):
+            self.nan_indices.append(i)
+        else:
+            if self.mode == 'max':
+                while self.candidates and self.candidates[-1][1] <= value:
+                    self.candidates.pop()
+            else:
+                while self.candidates and self.candidates[-1][1] >= value:
+                    self.candidates.pop()
+            self.candidates.append((i, value))
+
+        # 窓から外れた要素を削除
+        start = self.index - self.period
+        while self.candidates and self.candidates[0][0] < start:
+            self.candidates.popleft()
+        while self.nan_indices and self.nan_indices[0] < start:
+            self.nan_indices.popleft()
+
+    def get(self) -> float:
+        if self.index < self.period or self.nan_indices or not self.candidates:
+            return math.nan
+        return self.candidates[0][1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'period': self.period,
+            'mode': self.mode,
+            'index': self.index,
+            'candidates': [[i, v] for i, v in self.candidates],
+            'nan_indices': list(self.nan_indices),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RollingExtreme':
+        extreme = cls(data['period'], data['mode'])
+        extreme.index = data['index']
+        extreme.candidates = deque((i, v) for i, v in data['candidates'])
+        extreme.nan_indices = deque(data['nan_indices'])
+        return extreme
+
+
+class IndicatorState:
+    """
+    銘柄ごとのインクリメンタル指標状態
+
+    使い方:
+        state = IndicatorState.from_history(df)       # 初回のみ全履歴から構築
+        state.update({'date': '2024-06-03', 'open': ..., 'high': ...,
+                      'low': ..., 'close': ..., 'volume': ...})
+        indicators = state.latest_indicators()        # get_latest_indicators と同じ形式
+        saved = json.dumps(state.to_dict())           # 保存
+    """
+
+    SMA_PERIODS = (10, 20, 50, 150, 200)
+    EMA_PERIODS = (10, 21)
+    RSI_PERIOD = 14
+    ADR_PERIOD = 20
+    BB_STD_DEV = 2.0
+    WEEK_52 = 252
+
+    def __init__(self, symbol: str = '', rsi_method: str = 'sma'):
+        """
+        Args:
+            symbol: ティッカーシンボル
+            rsi_method: 'sma'（calculate_rsi と同じ単純平均）または 'wilder'（ワイルダー平滑化）
+        """
+        if rsi_method not in ('sma', 'wilder'):
+            raise ValueError(f'未対応のRSI計算方式: {rsi_method}')
+
+        self.symbol = symbol
+        self.rsi_method = rsi_method
+        self.bar_count = 0
+        self.last_date: Optional[str] = None
+        self.last_bar: Dict[str, float] = {}
+
+        self.sma = {period: RollingWindow(period) for period in self.SMA_PERIODS}
+        self.ema: Dict[int, Optional[float]] = {period: None for period in self.EMA_PERIODS}
+        # 直前の EMA の重み（欠損の足ごとに (1 - alpha) 倍になる、pandas の ewm と同じ）
+        self.ema_weight: Dict[int, float] = {period: 1.0 for period in self.EMA_PERIODS}
+
+        self.gain = RollingWindow(self.RSI_PERIOD)
+        self.loss = RollingWindow(self.RSI_PERIOD)
+        self.wilder_gain: Optional[float] = None
+        self.wilder_loss: Optional[float] = None
+        self.prev_close: Optional[float] = None
+
+        self.adr = RollingWindow(self.ADR_PERIOD)
+        self.volume_avg = RollingWindow(20)
+
+        self.vwap_pv = 0.0
+        self.vwap_volume = 0.0
+
+        self.high_52 = RollingExtreme(self.WEEK_52, 'max')
+        self.low_52 = RollingExtreme(self.WEEK_52, 'min')
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, symbol: str = '', rsi_method: str = 'sma') -> 'IndicatorState':
+        """
+        過去データを順に流し込んで状態を構築
+
+        Args:
+            df: 株価データフレーム (date, open, high, low, close, volume)
+            symbol: ティッカーシンボル
+            rsi_method: RSI計算方式
+
+        Returns:
+            最終バーまで更新済みの状態
+        """
+        state = cls(symbol, rsi_method)
+        date_col = next((c for c in ('date', 'Date', 'datetime', 'Datetime') if c in df.columns), None)
+        dates = df[date_col] if date_col else df.index
+
+        for date, o, h, l, c, v in zip(
+            dates, df['open'], df['high'], df['low'], df['close'], df['volume']
+        ):
+            state.update({'date': date, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v})
+
+        return state
+
+    def update(self, bar: Dict[str, Any]):
+        """
+        日足1本で状態を更新（O(1)）
+
+        Args:
+            bar: open/high/low/close/volume（任意で date）を持つ辞書
+
+        Raises:
+            ValueError: 最終更新日以前のバーが渡された場合
+        """
+        date = bar.get('date')
+        if date is not None:
+            date = str(pd.Timestamp(date).date())
+            if self.last_date is not None and date <= self.last_date:
+                raise ValueError(f'{self.symbol}: {date} は最終更新日 {self.last_date} 以前のバーです')
+
+        high = float(bar['high'])
+        low = float(bar['low'])
+        close = float(bar['close'])
+        volume = float(bar['volume'])
+
+        # 移動平均線（ma_20 とボリンジャーバンドは同じ窓を共有）
+        for window in self.sma.values():
+            window.push(close)
+
+        # EMA（adjust=False の再帰式。欠損の足の分だけ直前の値の重みを減らす）
+        for period in self.EMA_PERIODS:
+            alpha = 2 / (period + 1)
+            previous = self.ema[period]
+            if previous is None:
+                if not _is_nan(close):
+                    self.ema[period] = close
+                continue
+            weight = self.ema_weight[period] * (1 - alpha)
+            if _is_nan(close):
+                self.ema_weight[period] = weight
+                continue
+            self.ema[period] = (weight * previous + alpha * close) / (weight + alpha)
+            self.ema_weight[period] = 1.0
+
+        # RSI（先頭バーのdiffはcalculate_rsiと同様に0扱い）
+        delta = math.nan if self.prev_close is None else close - self.prev_close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        self.gain.push(gain)
+        self.loss.push(loss)
+        self._update_wilder(gain, loss)
+        self.prev_close = close
+
+        # ADR
+        self.adr.push((high - low) / close * 100 if close else math.nan)
+
+        # 出来高平均
+        self.volume_avg.push(volume)
+
+        # VWAP（累積）
+        typical_price = (high + low + close) / 3
+        if not _is_nan(typical_price * volume):
+            self.vwap_pv += typical_price * volume
+        if not _is_nan(volume):
+            self.vwap_volume += volume
+
+        # 52週高値・安値
+        self.high_52.push(high)
+        self.low_52.push(low)
+
+        self.bar_count += 1
+        self.last_date = date if date is not None else self.last_date
+        self.last_bar = {
+            'open': float(bar['open']), 'high': high, 'low': low, 'close': close, 'volume': volume,
+        }
+
+    def _update_wilder(self, gain: float, loss: float):
+        """ワイルダー平滑化RSI用の平均値を更新"""
+        if self.bar_count < self.RSI_PERIOD - 1:
+            return
+        if self.wilder_gain is None:
+            # 最初のperiod本は単純平均で初期化
+            self.wilder_gain = self.gain.get_mean()
+            self.wilder_loss = self.loss.get_mean()
+            return
+        n = self.RSI_PERIOD
+        self.wilder_gain = (self.wilder_gain * (n - 1) + gain) / n
+        self.wilder_loss = (self.wilder_loss * (n - 1) + loss) / n
+
+    def _rsi(self) -> float:
+        if self.rsi_method == 'wilder':
+            gain, loss = self.wilder_gain, self.wilder_loss
+            if gain is None:
+                return math.nan
+        else:
+            gain, loss = self.gain.get_mean(), self.loss.get_mean()
+        if _is_nan(gain) or _is_nan(loss):
+            return math.nan
+        if loss == 0:
+            return 100.0 if gain > 0 else math.nan
+        return 100 - (100 / (1 + gain / loss))
+
+    def values(self) -> Dict[str, Any]:
+        """
+        最新バーの全指標（calculate_all_indicators の列名と同じキー）
+
+        Returns:
+            指標名をキーとした辞書（計算不能な値はNaN）
+        """
+        close = self.last_bar.get('close', math.nan)
+        result: Dict[str, Any] = dict(self.last_bar)
+
+        for period, window in self.sma.items():
+            result[f'ma_{period}'] = window.get_mean()
+        for period, value in self.ema.items():
+            result[f'ema_{period}'] = math.nan if value is None else value
+
+        result['rsi_14'] = self._rsi()
+        result['adr_20'] = self.adr.get_mean()
+        # 最新バーの典型価格 × 出来高が欠損の場合は一括計算（累積和がNaN）と同じくNaN
+        last_pv = (result.get('high', math.nan) + result.get('low', math.nan) + close) / 3 * \
+            result.get('volume', math.nan)
+        result['vwap'] = self.vwap_pv / self.vwap_volume if self.vwap_volume and not _is_nan(last_pv) else math.nan
+
+        middle = self.sma[20].get_mean()
+        std = self.sma[20].get_std()
+        result['bb_upper'] = middle + std * self.BB_STD_DEV
+        result['bb_middle'] = middle
+        result['bb_lower'] = middle - std * self.BB_STD_DEV
+
+        result['volume_avg_20'] = self.volume_avg.get_mean()
+        result['week_52_high'] = self.high_52.get()
+        result['week_52_low'] = self.low_52.get()
+
+        for period in (10, 20, 50, 200):
+            ma = result[f'ma_{period}']
+            result[f'distance_ma_{period}'] = (close - ma) / ma * 100 if ma else math.nan
+
+        mas = [result[f'ma_{period}'] for period in self.SMA_PERIODS]
+        result['perfect_order_bullish'] = all(mas[i] > mas[i + 1] for i in range(len(mas) - 1))
+
+        return result
+
+    def latest_indicators(self) -> Dict[str, Any]:
+        """
+        最新指標を get_latest_indicators と同じ形式で取得
+
+        Returns:
+            最新指標の辞書（バー未投入時は空辞書）
+        """
+        if self.bar_count == 0:
+            return {}
+
+        values = self.values()
+
+        def to_float(key: str) -> Optional[float]:
+            return None if _is_nan(values[key]) else float(values[key])
+
+        return {
+            'price': float(values['close']),
+            'ma_10': to_float('ma_10'),
+            'ma_20': to_float('ma_20'),
+            'ma_50': to_float('ma_50'),
+            'ma_150': to_float('ma_150'),
+            'ma_200': to_float('ma_200'),
+            'rsi_14': to_float('rsi_14'),
+            'adr_20': to_float('adr_20'),
+            'vwap': to_float('vwap'),
+            'volume_avg_20': None if _is_nan(values['volume_avg_20']) else int(values['volume_avg_20']),
+            'week_52_high': to_float('week_52_high'),
+            'week_52_low': to_float('week_52_low'),
+            'distance_ma_10': to_float('distance_ma_10'),
+            'distance_ma_200': to_float('distance_ma_200'),
+            'perfect_order_bullish': bool(values['perfect_order_bullish']),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """状態をJSON互換の辞書に変換"""
+        return {
+            'version': 1,
+            'symbol': self.symbol,
+            'rsi_method': self.rsi_method,
+            'bar_count': self.bar_count,
+            'last_date': self.last_date,
+            'last_bar': {k: None if _is_nan(v) else v for k, v in self.last_bar.items()},
+            'sma': {str(period): window.to_dict() for period, window in self.sma.items()},
+            'ema': {str(period): value for period, value in self.ema.items()},
+            'ema_weight': {str(period): value for period, value in self.ema_weight.items()},
+            'gain': self.gain.to_dict(),
+            'loss': self.loss.to_dict(),
+            'wilder_gain': self.wilder_gain,
+            'wilder_loss': self.wilder_loss,
+            'prev_close': None if _is_nan(self.prev_close) else self.prev_close,
+            'adr': self.adr.to_dict(),
+            'volume_avg': self.volume_avg.to_dict(),
+            'vwap_pv': self.vwap_pv,
+            'vwap_volume': self.vwap_volume,
+            'high_52': self.high_52.to_dict(),
+            'low_52': self.low_52.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IndicatorState':
+        """to_dict で保存した状態を復元"""
+        state = cls(data['symbol'], data['rsi_method'])
+        state.bar_count = data['bar_count']
+        state.last_date = data['last_date']
+        state.last_bar = {k: math.nan if v is None else v for k, v in data['last_bar'].items()}
+        state.sma = {int(period): RollingWindow.from_dict(w) for period, w in data['sma'].items()}
+        state.ema = {int(period): value for period, value in data['ema'].items()}
+        state.ema_weight.update({int(period): value for period, value in data.get('ema_weight', {}).items()})
+        state.gain = RollingWindow.from_dict(data['gain'])
+        state.loss = RollingWindow.from_dict(data['loss'])
+        state.wilder_gain = data['wilder_gain']
+        state.wilder_loss = data['wilder_loss']
+        state.prev_close = math.nan if data['prev_close'] is None and data['bar_count'] else data['prev_close']
+        state.adr = RollingWindow.from_dict(data['adr'])
+        state.volume_avg = RollingWindow.from_dict(data['volume_avg'])
+        state.vwap_pv = data['vwap_pv']
+        state.vwap_volume = data['vwap_volume']
+        state.high_52 = RollingExtreme.from_dict(data['high_52'])
+        state.low_52 = RollingExtreme.from_dict(data['low_52'])
+        return state
@@ -0,0 +1,408 @@
+"""
+日足OHLCVのローカル永続キャッシュ
+銘柄ごとに確定済みの足を保存し、不足している末尾だけを再取得する
+
+保存形式:
+    <cache_dir>/<symbol>.npy   構造化配列（np.load(mmap_mode='r') で読み込み）
+    <cache_dir>/<symbol>.json  メタデータ（取得期間・最終確定日・最終確認日など）
+    <cache_dir>/<symbol>.weekly.npy / <symbol>.monthly.npy  日足から作った週足・月足（同じ構造化配列）
+
+前日以前の日足は変化しないため、1銘柄につき1日1回だけ
+「最終確定日以降」の差分を取得して結合する。
+分割・配当で過去の調整後価格が変わった場合は、その銘柄の履歴を破棄して取り直す。
+週足・月足は日足を書き換えるたびに、変わった日を含む期間から先だけ集計し直す。
+"""
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.timeframes import HIGHER_TIMEFRAMES, period_keys, update_resampled
+
+# 保存するカラム（配当・分割列は調整判定にのみ使い、保存しない）
+BAR_DTYPE = np.dtype([
+    ('date', '<M8[ns]'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<i8'),
+])
+
+# 期間の長さ順（キャッシュが要求期間をカバーしているかの判定用）
+PERIOD_ORDER = ['1d', '5d', '1mo', '3mo', '6mo', 'ytd', '1y', '2y', '5y', '10y', 'max']
+
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+# 重なり足の終値一致判定の許容誤差
+ADJUSTMENT_RTOL = 1e-6
+
+CACHE_VERSION = 1
+
+
+def market_today() -> str:
+    """米国市場の現地日付（YYYY-MM-DD）"""
+    return str(pd.Timestamp.now(tz='America/New_York').date())
+
+
+class OHLCVCache:
+    """
+    銘柄別の日足OHLCVキャッシュ
+
+    使い方（YFinanceWrapper が内部で呼び出す）:
+        action, start = cache.plan(symbol, '1y')
+        # action == 'fresh' → そのまま load
+        # action == 'delta' → start 以降を取得して merge
+        # action == 'full'  → 全期間を取得して store
+        df = cache.load(symbol, '1y')
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir: 保存先ディレクトリ（未指定時は環境変数 OHLCV_CACHE_DIR、なければ /tmp/ohlcv-cache）
+        """
+        self.cache_dir = Path(cache_dir or os.environ.get('OHLCV_CACHE_DIR', '/tmp/ohlcv-cache'))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # plan の判定件数（fresh がキャッシュヒット）
+        self.counts = {'fresh': 0, 'delta': 0, 'full': 0}
+        self.lock = threading.Lock()
+
+        # このプロセスで足を書き換えた回数と、銘柄ごとの最後の書き換え時点（結果キャッシュの無効化判定用）
+        self.generation = 0
+        self.updated: Dict[str, int] = {}
+
+    def _paths(self, symbol: str) -> Tuple[Path, Path]:
+        safe = re.sub(r'[^A-Za-z0-9.\-]', '_', symbol)
+        return self.cache_dir / f'{safe}.npy', self.cache_dir / f'{safe}.json'
+
+    def _timeframe_path(self, symbol: str, timeframe: str) -> Path:
+        data_path, _ = self._paths(symbol)
+        return data_path.with_suffix(f'.{timeframe}.npy')
+
+    def get_meta(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """メタデータを取得（未キャッシュ・形式違いはNone）"""
+        _, meta_path = self._paths(symbol)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        return meta
+
+    def plan(self, symbol: str, period: str, today: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """
+        キャッシュの状態から必要な取得方法を判定
+
+        Args:
+            symbol: ティッカーシンボル
+            period: 要求期間
+            today: 市場日付（テスト用、未指定時は現在日付）
+
+        Returns:
+            ('fresh', None) / ('delta', 取得開始日) / ('full', None)
+        """
+        action, start = self._plan(symbol, period, today)
+        with self.lock:
+            self.counts[action] += 1
+        return action, start
+
+    def _plan(self, symbol: str, period: str, today: Optional[str]) -> Tuple[str, Optional[str]]:
+        meta = self.get_meta(symbol)
+        if meta is None:
+            return 'full', None
+
+        if PERIOD_ORDER.index(meta['period']) < PERIOD_ORDER.index(period) or meta['final_date'] is None:
+            return 'full', None
+
+        today = today or market_today()
+        if meta['checked_on'] >= today:
+            return 'fresh', None
+
+        return 'delta', meta['final_date']
+
+    def stats(self) -> Dict[str, Any]:
+        """plan の判定件数（fresh: 取得なし / delta: 差分取得 / full: 全期間取得）"""
+        with self.lock:
+            total = sum(self.counts.values())
+            return {
+                **self.counts,
+                'hit_ratio': round(self.counts['fresh'] / total, 4) if total else 0.0,
+            }
+
+    def changed_since(self, generation: int, symbols: Iterable[str]) -> bool:
+        """
+        generation の時点以降に symbols のいずれかの足が書き換わったか
+
+        Args:
+            generation: 比較する時点（self.generation の値）
+            symbols: 対象のシンボル
+
+        Returns:
+            新しい足の追加・履歴の取り直し・破棄があった場合True
+        """
+        if self.generation == generation:
+            return False
+        updated = self.updated
+        return any(updated.get(symbol, 0) > generation for symbol in symbols)
+
+    def _touch(self, symbol: str):
+        with self.lock:
+            self.generation += 1
+            self.updated[symbol] = self.generation
+
+    def load(
+        self,
+        symbol: str,
+        period: Optional[str] = None,
+        timeframe: str = 'daily'
+    ) -> Optional[pd.DataFrame]:
+        """
+        キャッシュ済みの日足（または日足から作った週足・月足）を読み込み
+
+        Args:
+            symbol: ティッカーシンボル
+            period: 切り出す期間（未指定時は全期間）
+            timeframe: 'daily' / 'weekly' / 'monthly'
+
+        Returns:
+            get_historical_data と同じ形式（Date列 + 小文字カラム）のDataFrame
+        """
+        data_path, _ = self._paths(symbol)
+        meta = self.get_meta(symbol)
+        if meta is None or not data_path.exists():
+            return None
+
+        bars = np.load(data_path, mmap_mode='r')
+        if len(bars) == 0:
+            return None
+        if timeframe != 'daily':
+            bars = self._timeframe_bars(symbol, timeframe, bars)
+
+        if period in PERIOD_OFFSETS or period == 'ytd':
+            last = pd.Timestamp(bars['date'][-1])
+            if period == 'ytd':
+                start = pd.Timestamp(year=last.year, month=1, day=1)
+            else:
+                start = last - PERIOD_OFFSETS[period]
+            bars = bars[np.searchsorted(bars['date'], np.datetime64(start, 'ns'), side='right'):]
+
+        dates = pd.DatetimeIndex(bars['date'])
+        if meta.get('tz'):
+            dates = dates.tz_localize(meta['tz'])
+
+        return pd.DataFrame({
+            'Date': dates,
+            'open': bars['open'],
+            'high': bars['high'],
+            'low': bars['low'],
+            'close': bars['close'],
+            'volume': bars['volume'],
+        })
+
+    def _timeframe_bars(self, symbol: str, timeframe: str, bars: np.ndarray) -> np.ndarray:
+        """
+        保存済みの週足・月足を読み込み
+
+        ファイルがない（この形式より前に保存した日足など）・最後の期間が日足と合わない場合は
+        日足から作り直して保存する。
+        """
+        if timeframe not in HIGHER_TIMEFRAMES:
+            raise ValueError(f'不明な時間軸です: {timeframe}')
+        path = self._timeframe_path(symbol, timeframe)
+        try:
+            resampled = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            resampled = None
+
+        if resampled is not None and len(resampled) and (
+            period_keys(resampled['date'][-1:], timeframe)[0] == period_keys(bars['date'][-1:], timeframe)[0]
+            and resampled['close'][-1] == bars['close'][-1]
+        ):
+            return resampled
+
+        resampled = update_resampled(
+            np.array(resampled) if resampled is not None else None, np.asarray(bars), timeframe
+        )
+        self._save_array(path, resampled)
+        return resampled
+
+    def store(self, symbol: str, df: pd.DataFrame, period: str, today: Optional[str] = None):
+        """
+        全期間の日足を保存（既存の履歴は置き換え）
+
+        Args:
+            symbol: ティッカーシンボル
+            df: get_historical_data 形式のDataFrame
+            period: 取得した期間
+            today: 市場日付（テスト用）
+        """
+        today = today or market_today()
+        dates, tz = self._normalize_dates(df)
+        bars = self._to_bars(df, dates)
+        self._write(symbol, bars, {
+            'version': CACHE_VERSION,
+            'symbol': symbol,
+            'period': period,
+            'tz': tz,
+            'final_date': self._final_date(bars, today),
+            'checked_on': today,
+        })
+
+    def merge(self, symbol: str, delta: Optional[pd.DataFrame], today: Optional[str] = None) -> bool:
+        """
+        差分の日足を結合
+
+        最終確定日の足を重ねて取得しておき、終値が変わっていれば
+        （または差分期間に配当・分割があれば）調整が入ったとみなして履歴を破棄する。
+        最終確定日の足は差分に含まれている場合だけ差分の足に置き換える。
+
+        Args:
+            symbol: ティッカーシンボル
+            delta: 最終確定日以降の日足（get_historical_data 形式、配当・分割列を含んでもよい）
+            today: 市場日付（テスト用）
+
+        Returns:
+            結合できた場合True、調整検出で履歴を破棄した場合False
+        """
+        today = today or market_today()
+        meta = self.get_meta(symbol)
+        data_path, _ = self._paths(symbol)
+        if meta is None or not data_path.exists():
+            return False
+
+        meta['checked_on'] = today
+
+        if delta is None or delta.empty:
+            # 休場日などで新しい足がない
+            self._write(symbol, None, meta)
+            return True
+
+        stored = np.load(data_path)
+        dates, _ = self._normalize_dates(delta)
+        final_date = np.datetime64(meta['final_date'], 'ns')
+
+        # 差分期間の配当・分割は過去の調整後価格を変える
+        after_final = dates.to_numpy() > final_date
+        for column in ('dividends', 'stock splits'):
+            if column in delta.columns and (delta[column].to_numpy()[after_final] != 0).any():
+                self.invalidate(symbol)
+                return False
+
+        # 重なり足の終値チェック
+        overlap = np.flatnonzero(dates.to_numpy() == final_date)
+        stored_pos = np.flatnonzero(stored['date'] == final_date)
+        if len(overlap) and len(stored_pos):
+            new_close = float(delta['close'].iloc[overlap[0]])
+            old_close = float(stored['close'][stored_pos[0]])
+            if not np.isclose(new_close, old_close, rtol=ADJUSTMENT_RTOL, atol=0):
+                self.invalidate(symbol)
+                return False
+
+        # 差分に最終確定日の足がない場合（休場日・一部だけの応答）は保存済みの足を残す
+        new_bars = self._to_bars(delta, dates)
+        if len(overlap):
+            kept = stored[stored['date'] < final_date]
+            new_bars = new_bars[new_bars['date'] >= final_date]
+        else:
+            kept = stored[stored['date'] <= final_date]
+            new_bars = new_bars[new_bars['date'] > final_date]
+        merged = np.concatenate([kept, new_bars])
+        meta['final_date'] = self._final_date(merged, today)
+        self._write(symbol, merged, meta, changed_from=final_date)
+        return True
+
+    def invalidate(self, symbol: str):
+        """銘柄の履歴を破棄"""
+        paths = [*self._paths(symbol), *(self._timeframe_path(symbol, tf) for tf in HIGHER_TIMEFRAMES)]
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        self._touch(symbol)
+
+    @staticmethod
+    def _normalize_dates(df: pd.DataFrame) -> Tuple[pd.DatetimeIndex, Optional[str]]:
+        """日付をタイムゾーンなしの日付（0時）に揃え、元のタイムゾーン名を返す"""
+        date_col = next((c for c in ('Date', 'date', 'Datetime', 'datetime') if c in df.columns), None)
+        dates = pd.DatetimeIndex(df[date_col] if date_col else df.index)
+        tz = str(dates.tz) if dates.tz is not None else None
+        if tz:
+            dates = dates.tz_localize(None)
+        return dates.normalize(), tz
+
+    @staticmethod
+    def _to_bars(df: pd.DataFrame, dates: pd.DatetimeIndex) -> np.ndarray:
+        bars = np.empty(len(df), dtype=BAR_DTYPE)
+        bars['date'] = dates.to_numpy()
+        for field in ('open', 'high', 'low', 'close'):
+            bars[field] = df[field].to_numpy(dtype=float)
+        bars['volume'] = df['volume'].fillna(0).to_numpy(dtype=np.int64)
+        return bars
+
+    @staticmethod
+    def _final_date(bars: np.ndarray, today: str) -> Optional[str]:
+        """当日の足（場中で未確定の可能性あり）を除いた最終日付"""
+        final = bars['date'][bars['date'] < np.datetime64(today, 'ns')]
+        if len(final) == 0:
+            return None
+        return str(pd.Timestamp(final[-1]).date())
+
+    @staticmethod
+    def _save_array(path: Path, array: np.ndarray):
+        tmp_path = path.with_suffix('.npy.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    def _write(
+        self,
+        symbol: str,
+        bars: Optional[np.ndarray],
+        meta: Dict[str, Any],
+        changed_from: Optional[np.datetime64] = None
+    ):
+        """
+        一時ファイル経由で原子的に書き込み（bars=None はメタデータのみ更新）
+
+        週足・月足は changed_from（日足が変わった最初の日付）を含む期間から先だけ集計し直す。
+        changed_from=None は全期間を集計する（全期間の保存）。
+        """
+        data_path, meta_path = self._paths(symbol)
+        tmp_meta = meta_path.with_suffix('.json.tmp')
+
+        if bars is not None:
+            self._save_array(data_path, bars)
+            for timeframe in HIGHER_TIMEFRAMES:
+                path = self._timeframe_path(symbol, timeframe)
+                previous = None
+                if changed_from is not None:
+                    try:
+                        previous = np.load(path)
+                    except (OSError, ValueError):
+                        previous = None
+                self._save_array(path, update_resampled(previous, bars, timeframe, changed_from))
+            self._touch(symbol)
+
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
@@ -0,0 +1,65 @@
+"""
+スコア上位K件のストリーミング集計
+全件を保持してソートする代わりに、要素数 K の最小ヒープで上位だけを残す
+
+同点は先に追加された方を上位とする（全件を list.sort(reverse=True) した場合と同じ順序）。
+"""
+import heapq
+import itertools
+from typing import Any, List, Optional
+
+
+class TopKRanking:
+    """
+    スコア上位K件を保持するランキング
+
+    使い方:
+        ranking = TopKRanking(offset + limit)
+        for ...:
+            ranking.push(score, row)
+        page = ranking.page(offset, limit)
+        total = ranking.total
+    """
+
+    def __init__(self, k: Optional[int] = None):
+        """
+        Args:
+            k: 保持する件数（None の場合は全件）
+        """
+        self.k = k
+        self.total = 0
+        self.heap: List[tuple] = []
+        self.sequence = itertools.count()
+
+    def push(self, score: float, item: Any):
+        """
+        要素を追加（上位K件に入らない場合は保持しない）
+
+        Args:
+            score: スコア
+            item: 保持する要素
+        """
+        self.total += 1
+        if self.k == 0:
+            return
+        # ヒープの先頭が「最も下位」になるよう、同点は後から来た方を小さくする
+        entry = (score, -next(self.sequence), item)
+        if self.k is None or len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> List[Any]:
+        """
+        スコアの高い順に offset 件目から limit 件を返す
+
+        Args:
+            offset: 先頭から読み飛ばす件数
+            limit: 返す件数（None の場合は残り全件）
+
+        Returns:
+            要素のリスト
+        """
+        ordered = sorted(self.heap, key=lambda entry: entry[:2], reverse=True)
+        end = None if limit is None else offset + limit
+        return [entry[2] for entry in ordered[offset:end]]
@@ -0,0 +1,187 @@
+"""
+APIレスポンスの組み立て・エンコード
+時系列を列ごとの配列（列指向）に変換し、JSON エンコードと Accept-Encoding に応じた圧縮を行う
+
+- series_columns: DataFrame の末尾 window 行を {'dates': [...], 'close': [...], ...} に変換
+  （NaN → null・丸めは列ごとに numpy でまとめて行う）
+- dumps: orjson があれば orjson、なければ標準の json でエンコード
+- negotiate_encoding / compress: br（brotli があれば）・gzip を q 値に従って選択し、圧縮
+
+orjson・brotli は任意（インストールされていなければ標準の json・gzip を使う）。
+"""
+import gzip
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# これより小さい本文は圧縮しない（ヘッダー分で逆に大きくなるため）
+MIN_COMPRESS_BYTES = 1024
+
+# 圧縮レベル（速度優先）
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+# 価格・指標の小数点以下の桁数（チャート表示用）
+DEFAULT_DECIMALS = 4
+
+
+def _date_strings(df: pd.DataFrame, start: int) -> List[str]:
+    """Date列（なければインデックス）の start 行目以降を YYYY-MM-DD の文字列のリストに変換"""
+    date_col = next((c for c in ('Date', 'date', 'Datetime', 'datetime') if c in df.columns), None)
+    dates = df[date_col] if date_col else df.index
+    if getattr(dates.dtype, 'tz', None) is not None:
+        # 取引所の現地日付
+        dates = pd.DatetimeIndex(dates).tz_localize(None)
+    values = np.asarray(dates, dtype='datetime64[ns]')[start:]
+    return np.datetime_as_string(values, unit='D').tolist()
+
+
+def column_values(values: np.ndarray, decimals: Optional[int] = DEFAULT_DECIMALS) -> List[Any]:
+    """
+    1列分の配列を JSON に渡せるリストに変換（NaN は None）
+
+    Args:
+        values: 数値・真偽値の配列
+        decimals: 丸める桁数（None は丸めない。整数・真偽値は丸めない）
+
+    Returns:
+        Python の float / int / bool / None のリスト
+    """
+    if values.dtype == bool or np.issubdtype(values.dtype, np.integer):
+        return values.tolist()
+    values = np.asarray(values, dtype=np.float64)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    missing = ~np.isfinite(values)
+    if not missing.any():
+        return values.tolist()
+    converted = values.astype(object)
+    converted[missing] = None
+    return converted.tolist()
+
+
+def series_columns(
+    df: pd.DataFrame,
+    columns: Iterable[str],
+    window: Optional[int] = None,
+    integer_columns: Iterable[str] = ('volume',),
+    decimals: Optional[int] = DEFAULT_DECIMALS
+) -> Dict[str, List[Any]]:
+    """
+    DataFrame の末尾 window 行を列指向の辞書に変換
+
+    Args:
+        df: Date列（またはインデックス）を持つ時系列
+        columns: 出力する列（df にない列は全件 null）
+        window: 末尾から出力する行数（None は全行）
+        integer_columns: 整数で出力する列（欠損は null）
+        decimals: 小数の丸め桁数
+
+    Returns:
+        {'dates': [...], 列名: [...], ...}
+    """
+    n = len(df)
+    start = 0 if window is None else max(n - max(window, 0), 0)
+    integer_columns = set(integer_columns)
+    result: Dict[str, List[Any]] = {'dates': _date_strings(df, start)}
+    for column in columns:
+        if column not in df.columns:
+            result[column] = [None] * (n - start)
+            continue
+        values = df[column].to_numpy()[start:]
+        if column in integer_columns and values.dtype.kind == 'f':
+            missing = np.isnan(values)
+            ints = np.where(missing, 0, values).astype(np.int64)
+            result[column] = ints.tolist() if not missing.any() else [
+                None if m else v for m, v in zip(missing.tolist(), ints.tolist())
+            ]
+        else:
+            result[column] = column_values(values, None if column in integer_columns else decimals)
+    return result
+
+
+def columns_to_rows(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """series_columns の結果を行ごとの辞書のリストに変換（dates は date に置き換え）"""
+    names = [name for name in columns if name != 'dates']
+    return [
+        {'date': date, **dict(zip(names, values))}
+        for date, *values in zip(columns['dates'], *(columns[name] for name in names))
+    ]
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    JSON エンコード（UTF-8 のバイト列）
+
+    orjson がある場合は orjson を使う（NaN・Infinity は null になる）。
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Accept-Encoding から使う圧縮方式を選ぶ
+
+    Args:
+        accept_encoding: リクエストの Accept-Encoding ヘッダー
+
+    Returns:
+        'br' / 'gzip'（q 値が高い方、同じなら br）。使えるものがなければNone
+    """
+    if not accept_encoding:
+        return None
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    candidates: List[Tuple[float, int, str]] = []
+    for rank, name in enumerate(available):
+        q = weights.get(name, weights.get('*', 0.0))
+        if q > 0:
+            candidates.append((q, -rank, name))
+    return max(candidates)[2] if candidates else None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    本文を圧縮
+
+    Args:
+        body: 本文
+        encoding: negotiate_encoding の結果
+
+    Returns:
+        (本文, Content-Encoding の値)。MIN_COMPRESS_BYTES 未満・encoding なしは圧縮せずNone
+    """
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    return body, None
@@ -0,0 +1,269 @@
+"""
+スクリーニング結果のキャッシュ
+同じ条件（正規化した filters・銘柄集合・データの日付）のスクリーニング結果を再利用する
+
+キー:
+    正規化した filters（None・空の条件を除き、数値は float、リストは順序を揃える）・
+    銘柄集合（重複・順序は区別しない）・データの日付（market_today）の SHA-256
+
+無効化:
+    - データの日付が変わるとキーが変わる（前日の結果は参照されずに LRU で追い出される）
+    - 日足キャッシュ（OHLCVCache）で結果に含まれる銘柄の足が書き換わった結果は破棄する
+    - 銘柄情報の更新に追従するため、ttl_seconds を過ぎた結果も破棄する
+
+同じキーの同時リクエストは1回だけ計算し、待機していたリクエストは同じ結果を受け取る（SingleFlight）。
+
+ページング:
+    結果はスコア順の先頭から depth 件（offset + limit、limit 未指定時は全件）を保持する。
+    保持している件数で足りるリクエストはキャッシュから返し、足りない場合は計算し直す。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.fetch_scheduler import SingleFlight
+from utils.ohlcv_cache import OHLCVCache
+
+# 結果を保持する秒数（銘柄情報の更新に追従するため）
+DEFAULT_TTL_SECONDS = float(os.environ.get('SCREEN_RESULT_CACHE_TTL', '900'))
+
+# 保持する結果の最大件数（0 で保存しない。同時リクエストの集約は行う）
+DEFAULT_MAX_ENTRIES = int(os.environ.get('SCREEN_RESULT_CACHE_SIZE', '64'))
+
+
+def normalize_filters(value: Any) -> Any:
+    """
+    filters を同じ意味なら同じ値になる形に正規化
+
+    - None の値と空の辞書・リストを除く
+    - 数値は float に揃える（30 と 30.0 を区別しない。bool はそのまま）
+    - リストの要素は順序を揃える（sectors・comparisons などはすべて AND・OR の集合として扱われる）
+
+    Args:
+        value: filters またはその一部
+
+    Returns:
+        正規化した値（除くべき値の場合は None）
+    """
+    if isinstance(value, dict):
+        normalized = {}
+        for key, item in value.items():
+            item = normalize_filters(item)
+            if item is not None:
+                normalized[str(key)] = item
+        return normalized or None
+    if isinstance(value, (list, tuple)):
+        items = [item for item in (normalize_filters(item) for item in value) if item is not None]
+        if not items:
+            return None
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return str(value)
+
+
+def result_key(filters: dict, symbols: Iterable[str], as_of: str, **params: Any) -> str:
+    """
+    キャッシュキー（正規化した filters・銘柄集合・データの日付のハッシュ）
+
+    Args:
+        filters: フィルター条件
+        symbols: ティッカーシンボル（順序・重複は区別しない）
+        as_of: データの日付（YYYY-MM-DD）
+        **params: 結果に影響するその他の条件
+
+    Returns:
+        16進数のハッシュ文字列
+    """
+    payload = {
+        'filters': normalize_filters(filters or {}) or {},
+        'symbols': sorted(set(symbols)),
+        'as_of': as_of,
+        'params': params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class CachedResult(NamedTuple):
+    """キャッシュした結果1件"""
+    rows: List[dict]                 # スコア順の先頭 depth 件
+    total_count: int                 # 条件を満たした全件数
+    plan_stats: Any                  # ステージ別の件数
+    depth: Optional[int]             # 計算時に保持した件数（None は全件）
+    symbols: Tuple[str, ...]         # 無効化判定に使う銘柄
+    generation: int                  # 計算完了時点の OHLCVCache.generation
+    stored_at: float                 # 保存時刻（time.monotonic）
+
+    def covers(self, depth: Optional[int]) -> bool:
+        """先頭 depth 件を返せるか"""
+        if self.depth is None or self.total_count <= self.depth:
+            return True
+        return depth is not None and depth <= self.depth
+
+
+class ScreenResultCache:
+    """
+    スクリーニング結果の LRU キャッシュ（スレッドセーフ）
+
+    使い方:
+        cache = ScreenResultCache(ohlcv_cache=OHLCV_CACHE)
+        key = result_key(filters, symbols, market_today())
+        entry, status = cache.get_or_compute(key, symbols, depth, compute)
+        # compute() は (スコア順の先頭 depth 件, 全件数, ステージ別の件数) を返す
+        # status は 'hit' / 'miss' / 'coalesced'
+    """
+
+    def __init__(
+        self,
+        ohlcv_cache: Optional[OHLCVCache] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            ohlcv_cache: 足の書き換えを監視する日足キャッシュ（未指定時はキーの日付と TTL のみで無効化）
+            ttl_seconds: 結果を保持する秒数
+            max_entries: 保持する結果の最大件数（0 で保存しない）
+            clock: 現在時刻（テスト用）
+        """
+        self.ohlcv_cache = ohlcv_cache
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries: 'OrderedDict[str, CachedResult]' = OrderedDict()
+        self.flights = SingleFlight()
+        self.lock = threading.Lock()
+
+        # 統計
+        self.counts = {'hits': 0, 'misses': 0, 'coalesced': 0, 'expirations': 0, 'invalidations': 0, 'evictions': 0}
+
+    def get(self, key: str, depth: Optional[int] = None) -> Optional[CachedResult]:
+        """
+        有効な結果を取得（期限切れ・足の書き換えがあった結果は破棄してNone）
+
+        Args:
+            key: result_key のキー
+            depth: 必要な件数（None は全件）
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self.clock() - entry.stored_at > self.ttl_seconds:
+                del self.entries[key]
+                self.counts['expirations'] += 1
+                return None
+        if self.ohlcv_cache is not None and self.ohlcv_cache.changed_since(entry.generation, entry.symbols):
+            with self.lock:
+                if self.entries.get(key) is entry:
+                    del self.entries[key]
+                    self.counts['invalidations'] += 1
+            return None
+        if not entry.covers(depth):
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return entry
+
+    def put(
+        self,
+        key: str,
+        symbols: Iterable[str],
+        depth: Optional[int],
+        rows: List[dict],
+        total_count: int,
+        plan_stats: Any
+    ) -> CachedResult:
+        """結果を保存（同じキーで保持件数の多い結果があれば、そちらを残す）"""
+        entry = CachedResult(
+            rows=rows,
+            total_count=total_count,
+            plan_stats=plan_stats,
+            depth=depth,
+            symbols=tuple(symbols),
+            generation=self.ohlcv_cache.generation if self.ohlcv_cache is not None else 0,
+            stored_at=self.clock(),
+        )
+        if self.max_entries <= 0:
+            return entry
+        with self.lock:
+            existing = self.entries.get(key)
+            if existing is not None and existing.covers(depth) and not entry.covers(existing.depth):
+                return entry
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts['evictions'] += 1
+        return entry
+
+    def get_or_compute(
+        self,
+        key: str,
+        symbols: Iterable[str],
+        depth: Optional[int],
+        compute: Callable[[], Tuple[List[dict], int, Any]]
+    ) -> Tuple[CachedResult, str]:
+        """
+        キャッシュから取得し、なければ計算して保存（同じキー・件数の同時呼び出しは1回だけ計算）
+
+        Args:
+            key: result_key のキー
+            symbols: 無効化判定に使う銘柄
+            depth: 必要な件数（None は全件）
+            compute: (スコア順の先頭 depth 件, 全件数, ステージ別の件数) を返す関数
+
+        Returns:
+            (結果, 'hit' / 'miss' / 'coalesced')
+
+        Raises:
+            compute が送出した例外（待機していた呼び出し元にも送出）
+        """
+        entry = self.get(key, depth)
+        if entry is not None:
+            self._count('hits')
+            return entry, 'hit'
+
+        def run() -> Tuple[CachedResult, str]:
+            # 待機中に別の計算が保存した結果があればそれを使う
+            cached = self.get(key, depth)
+            if cached is not None:
+                return cached, 'hit'
+            rows, total_count, plan_stats = compute()
+            return self.put(key, symbols, depth, rows, total_count, plan_stats), 'miss'
+
+        (entry, status), leader = self.flights.do((key, depth), run)
+        status = status if leader else 'coalesced'
+        self._count({'hit': 'hits', 'miss': 'misses', 'coalesced': 'coalesced'}[status])
+        return entry, status
+
+    def _count(self, name: str):
+        with self.lock:
+            self.counts[name] += 1
+
+    def clear(self):
+        """保持している結果をすべて破棄"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        件数・ヒット率（hits / 全リクエスト）・同時リクエストの集約回数（coalesced）
+        """
+        with self.lock:
+            requests = self.counts['hits'] + self.counts['misses'] + self.counts['coalesced']
+            return {
+                **self.counts,
+                'entries': len(self.entries),
+                'hit_ratio': round(self.counts['hits'] / requests, 4) if requests else 0.0,
+                'coalesced_ratio': round(self.counts['coalesced'] / requests, 4) if requests else 0.0,
+            }
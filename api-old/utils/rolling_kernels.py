@@ -0,0 +1,182 @@
+"""
+多銘柄向けのローリング計算カーネル（NumPy のみ）
+(日付 × 銘柄) の2次元配列をまとめて処理し、pandas の rolling / ewm を銘柄ごとに作り直すコストをなくす
+
+- rolling_max / rolling_min: van Herk/Gil-Werman 法（窓幅に依存しない O(n)）。pandas と完全一致
+- ema: 再帰式 y[t] = (1 - α) y[t-1] + α x[t] を日付方向に回し、銘柄方向はベクトル演算。
+       pandas の ewm(span, adjust=False).mean() と同じ式・同じ欠損の扱いで完全一致
+- rolling_mean / rolling_std: 累積和から計算。pandas との差は丸め誤差（平均は相対 1e-12、標準偏差は相対 1e-7 程度）
+
+1次元配列（1銘柄）も渡せる。欠損の扱いは pandas の既定（min_periods = 窓幅）と同じで、
+窓内に1つでもNaNがあれば結果はNaNになる。
+"""
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+# rolling_max / rolling_min はこの要素数以上で使う（1銘柄1年分でも pandas より速い）
+ROLLING_KERNEL_MIN_CELLS = 256
+
+# ema は日付ごとにPythonのループを回すため、銘柄数が少ない場合は pandas の方が速い
+EMA_KERNEL_MIN_COLUMNS = 512
+
+ArrayLike = Union[np.ndarray, pd.DataFrame, pd.Series]
+
+
+def use_kernel(values: ArrayLike, kind: str = 'rolling') -> bool:
+    """
+    pandas よりカーネルの方が速い入力か
+
+    rolling_mean / rolling_std は pandas と完全には一致しないため自動では選ばない。
+
+    Args:
+        values: (日付 × 銘柄) または1銘柄分の配列
+        kind: 'rolling'（rolling_max / rolling_min）または 'ema'
+    """
+    if kind == 'ema':
+        return np.ndim(values) == 2 and np.shape(values)[1] >= EMA_KERNEL_MIN_COLUMNS
+    return np.size(values) >= ROLLING_KERNEL_MIN_CELLS
+
+
+def _as_float_2d(values: ArrayLike) -> np.ndarray:
+    array = np.asarray(values, dtype=np.float64)
+    return array[:, np.newaxis] if array.ndim == 1 else array
+
+
+def _rewrap(result: np.ndarray, values: ArrayLike) -> ArrayLike:
+    """入力と同じ型（ndarray / DataFrame / Series）・形に戻す"""
+    if isinstance(values, pd.DataFrame):
+        return pd.DataFrame(result, index=values.index, columns=values.columns, copy=False)
+    if isinstance(values, pd.Series):
+        return pd.Series(result.ravel(), index=values.index, name=values.name, copy=False)
+    return result.reshape(np.shape(values))
+
+
+def _rolling_extreme(values: ArrayLike, window: int, accumulate: np.ufunc) -> ArrayLike:
+    """
+    van Herk/Gil-Werman 法のローリング最大・最小
+
+    窓幅ごとのブロックに分け、ブロック内の前方累積 g と後方累積 h を求めると
+    [i - window + 1, i] の極値は h[i - window + 1] と g[i] の極値になる。
+    """
+    data = _as_float_2d(values)
+    n, columns = data.shape
+    result = np.full((n, columns), np.nan)
+    if window > n:
+        return _rewrap(result, values)
+
+    blocks = -(-n // window)
+    padded = np.full((blocks * window, columns), np.nan)
+    padded[:n] = data
+    padded = padded.reshape(blocks, window, columns)
+
+    forward = accumulate.accumulate(padded, axis=1).reshape(-1, columns)
+    backward = accumulate.accumulate(padded[:, ::-1], axis=1)[:, ::-1].reshape(-1, columns)
+
+    # NaN は accumulate で後ろに伝播するため、窓内のNaNはそのまま結果のNaNになる
+    accumulate(backward[:n - window + 1], forward[window - 1:n], out=result[window - 1:])
+    return _rewrap(result, values)
+
+
+def rolling_max(values: ArrayLike, window: int) -> ArrayLike:
+    """日付方向（axis=0）のローリング最大（rolling(window).max() と同じ）"""
+    return _rolling_extreme(values, window, np.maximum)
+
+
+def rolling_min(values: ArrayLike, window: int) -> ArrayLike:
+    """日付方向（axis=0）のローリング最小（rolling(window).min() と同じ）"""
+    return _rolling_extreme(values, window, np.minimum)
+
+
+def _window_sums(data: np.ndarray, window: int) -> tuple:
+    """NaNを0とみなした窓内の合計と、窓内の有効な値の個数"""
+    valid = ~np.isnan(data)
+    filled = np.where(valid, data, 0.0)
+    zeros = np.zeros((1, data.shape[1]))
+    sums = np.concatenate((zeros, np.cumsum(filled, axis=0)))
+    counts = np.concatenate((zeros, np.cumsum(valid, axis=0, dtype=np.float64)))
+    return filled, sums[window:] - sums[:-window], counts[window:] - counts[:-window]
+
+
+def rolling_mean(values: ArrayLike, window: int) -> ArrayLike:
+    """日付方向のローリング平均（累積和の差分から計算）"""
+    data = _as_float_2d(values)
+    result = np.full(data.shape, np.nan)
+    if window <= len(data):
+        _, sums, counts = _window_sums(data, window)
+        result[window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return _rewrap(result, values)
+
+
+def rolling_std(values: ArrayLike, window: int, ddof: int = 1) -> ArrayLike:
+    """
+    日付方向のローリング標準偏差（累積和・二乗和の差分から計算）
+
+    桁落ちを抑えるため、銘柄ごとに最初の有効値を引いてから累積する。
+    """
+    data = _as_float_2d(values)
+    result = np.full(data.shape, np.nan)
+    if window <= len(data) and window > ddof:
+        shift = data[np.argmax(~np.isnan(data), axis=0), np.arange(data.shape[1])]
+        shifted = data - np.where(np.isnan(shift), 0.0, shift)
+        filled, sums, counts = _window_sums(shifted, window)
+        squares = np.concatenate((np.zeros((1, data.shape[1])), np.cumsum(filled * filled, axis=0)))
+        square_sums = squares[window:] - squares[:-window]
+        with np.errstate(invalid='ignore'):
+            variance = (square_sums - sums * sums / window) / (window - ddof)
+        result[window - 1:] = np.where(counts == window, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+    return _rewrap(result, values)
+
+
+def ema(values: ArrayLike, span: int) -> ArrayLike:
+    """
+    指数移動平均（ewm(span=span, adjust=False).mean() と同じ）
+
+    pandas と同じく、欠損日は直前の値を保ち、欠損日数だけ過去の値の重みを減らす。
+    """
+    data = _as_float_2d(values)
+    n, columns = data.shape
+    result = np.empty((n, columns))
+    if n == 0:
+        return _rewrap(result, values)
+
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    result[0] = data[0]
+    blended = np.empty(columns)
+    scaled = np.empty(columns)
+    changed = np.empty(columns, dtype=bool)
+
+    if not np.isnan(data).any():
+        # 欠損なし: 過去の値の重みは常に (1 - α)
+        denominator = decay + alpha
+        for i in range(1, n):
+            previous, current = result[i - 1], data[i]
+            np.multiply(previous, decay, out=blended)
+            np.multiply(current, alpha, out=scaled)
+            blended += scaled
+            blended /= denominator
+            np.not_equal(previous, current, out=changed)
+            result[i] = previous
+            np.copyto(result[i], blended, where=changed)
+        return _rewrap(result, values)
+
+    old_weight = np.ones(columns)
+    for i in range(1, n):
+        previous, current = result[i - 1], data[i]
+        observed = ~np.isnan(current)
+        started = ~np.isnan(previous)
+        np.multiply(old_weight, decay, out=old_weight, where=started)
+        with np.errstate(invalid='ignore'):
+            np.multiply(old_weight, previous, out=blended)
+            np.multiply(current, alpha, out=scaled)
+            blended += scaled
+            blended /= old_weight + alpha
+            np.not_equal(previous, current, out=changed)
+        result[i] = previous
+        np.copyto(result[i], blended, where=started & observed & changed)
+        np.copyto(result[i], current, where=~started & observed)
+        old_weight[started & observed] = 1.0
+
+    return _rewrap(result, values)
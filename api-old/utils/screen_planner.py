@@ -0,0 +1,277 @@
+"""
+スクリーニングのクエリプランナー
+filters の各条件が必要とするデータを調べ、コストの安いステージから順に評価する
+
+ステージ（コスト順）:
+    1. fundamentals_cached: キャッシュ済みの銘柄情報（時価総額・セクター等）。過去データ取得前に判定
+    2. short_window: 20本程度で計算できる指標（ADR・RSI・短期MA・株価帯）
+    3. long_window: 200本以上が必要な指標（ma_50〜ma_200・パーフェクトオーダー）
+    4. fundamentals: 銘柄情報の取得後に判定（キャッシュになかった銘柄と、指標と銘柄情報の両方を参照する条件）
+
+各ステージでは、そのステージの条件が参照する指標だけを計算する。
+週足・月足の指標（weekly_ma_30 など）は日足から作って計算するため、追加の取得は発生しない。
+必要な本数は上位足の本数 × 1本あたりの営業日数で見積もり、取得期間（history_period）に反映する。
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from utils.technical_indicators import TechnicalIndicators, indicator_lookback
+from utils.timeframes import split_field
+from utils.diagnostics import Diagnostics
+from utils.filter_compiler import FUNDAMENTAL_COLUMNS, parse_filters
+
+# short_window ステージに入れる指標の最大本数
+SHORT_WINDOW_BARS = 20
+
+# 過去データの取得期間（おおよその営業日数 → 期間）。既定は 1y
+HISTORY_PERIODS = ((252, '1y'), (504, '2y'), (1260, '5y'), (2520, '10y'))
+
+STAGES = ('fundamentals_cached', 'short_window', 'long_window', 'fundamentals')
+
+# 計測しない場合の Diagnostics
+_NO_DIAGNOSTICS = Diagnostics(enabled=False)
+
+
+class Predicate:
+    """フィルター条件1つ分（参照する項目と判定関数）"""
+
+    def __init__(self, name: str, fields: Iterable[str], check: Callable[[Dict[str, Any]], bool], source: str):
+        """
+        Args:
+            name: 条件名（ログ用）
+            fields: 参照する項目
+            check: 判定関数（True で通過）
+            source: 'indicators'（テクニカル指標）/ 'fundamentals'（銘柄情報）/ 'mixed'（両方）
+        """
+        self.name = name
+        self.fields = tuple(fields)
+        self.check = check
+        self.source = source
+
+    @property
+    def lookback(self) -> int:
+        """判定に必要な本数（不明な指標は全期間扱い）"""
+        return max(self._lookbacks(10 ** 6))
+
+    def _lookbacks(self, unknown: int) -> List[int]:
+        lookbacks = [indicator_lookback(field) for field in self.fields]
+        return [unknown if bars is None else bars for bars in lookbacks]
+
+
+def _source(fields: Iterable[str]) -> str:
+    """
+    条件が参照するデータの種類
+
+    Returns:
+        'fundamentals'（すべて銘柄情報）/ 'indicators'（すべて指標）/
+        'mixed'（両方。例: market_cap > ma_50。銘柄情報の取得後に指標と合わせて判定）
+    """
+    fundamental = [f in FUNDAMENTAL_COLUMNS for f in fields]
+    if all(fundamental):
+        return 'fundamentals'
+    return 'mixed' if any(fundamental) else 'indicators'
+
+
+def build_predicates(filters: dict) -> List[Predicate]:
+    """
+    filters 辞書を条件のリストに変換
+
+    条件の解釈は filter_compiler.parse_filters（スナップショット・バックテストの compile_filters と共通）。
+
+    Args:
+        filters: リクエストのフィルター条件（technical / fundamental）
+
+    Returns:
+        Predicate のリスト
+
+    Raises:
+        ValueError: 比較条件が不正な場合
+    """
+    return [
+        Predicate(condition.name, condition.fields, condition.check, _source(condition.fields))
+        for condition in parse_filters(filters)
+    ]
+
+
+class ScreenPlan:
+    """
+    フィルター条件をステージに振り分けた実行計画
+
+    使い方:
+        plan = ScreenPlan(filters)
+        symbols = plan.prefilter(symbols, info_cache)
+        values = TechnicalIndicators.calculate_latest_indicators(df, fields=plan.short_fields)
+        if plan.check('short_window', values): ...
+    """
+
+    def __init__(self, filters: dict):
+        self.predicates = build_predicates(filters)
+
+        technical = [p for p in self.predicates if p.source == 'indicators']
+        self.stage_predicates: Dict[str, List[Predicate]] = {
+            'fundamentals_cached': [p for p in self.predicates if p.source == 'fundamentals'],
+            'short_window': [p for p in technical if p.lookback <= SHORT_WINDOW_BARS],
+            'long_window': [p for p in technical if p.lookback > SHORT_WINDOW_BARS],
+            'fundamentals': [p for p in self.predicates if p.source in ('fundamentals', 'mixed')],
+        }
+        # 指標と銘柄情報の両方を参照する条件の指標（通過銘柄の最新指標に含める）
+        self.mixed_fields: Set[str] = {
+            field for p in self.predicates if p.source == 'mixed'
+            for field in p.fields if field not in FUNDAMENTAL_COLUMNS
+        }
+        self.counts = {stage: {'in': 0, 'pruned': 0} for stage in STAGES}
+
+    def _fields(self, stage: str) -> Set[str]:
+        fields: Set[str] = set()
+        for predicate in self.stage_predicates[stage]:
+            fields.update(predicate.fields)
+        fields.discard('price')
+        return fields
+
+    @property
+    def short_fields(self) -> Set[str]:
+        """short_window ステージで計算する指標"""
+        return self._fields('short_window')
+
+    @property
+    def long_fields(self) -> Set[str]:
+        """long_window ステージで計算する指標"""
+        return self._fields('long_window')
+
+    @property
+    def history_period(self) -> str:
+        """
+        過去データの取得期間（条件が参照する指標を計算できる最短の期間、既定は 1y）
+
+        EMA など本数を見積もれない指標は 1y の範囲で計算する。
+        """
+        bars = max(
+            (n for p in self.predicates if p.source != 'fundamentals' for n in p._lookbacks(0)), default=0
+        )
+        return next((period for days, period in HISTORY_PERIODS if days >= bars), HISTORY_PERIODS[-1][1])
+
+    @property
+    def timeframes(self) -> Set[str]:
+        """条件が参照する上位足の時間軸（'weekly' / 'monthly'）"""
+        return {
+            timeframe for predicate in self.predicates for timeframe, _ in map(split_field, predicate.fields)
+        } - {'daily'}
+
+    @property
+    def info_fields(self) -> Set[str]:
+        """fundamentals ステージで参照する銘柄情報の項目"""
+        return self._fields('fundamentals') & set(FUNDAMENTAL_COLUMNS)
+
+    def check(self, stage: str, values: Dict[str, Any]) -> bool:
+        """
+        ステージの条件をすべて満たすか判定（通過・除外件数を記録）
+
+        Args:
+            stage: ステージ名
+            values: 指標または銘柄情報の辞書（fundamentals は fundamental_values で合わせた辞書）
+
+        Returns:
+            通過する場合True
+        """
+        self.counts[stage]['in'] += 1
+        for predicate in self.stage_predicates[stage]:
+            if not predicate.check(values):
+                self.counts[stage]['pruned'] += 1
+                return False
+        return True
+
+    def evaluate_history(self, df: pd.DataFrame, diagnostics: Optional[Diagnostics] = None) -> Optional[Dict[str, Any]]:
+        """
+        1銘柄の過去データに short_window → long_window の順で条件を適用
+
+        各ステージでは条件が参照する指標だけを計算し、両方を通過した銘柄のみ
+        全指標（スコア・レスポンス用）を末尾の窓から計算する。
+
+        Args:
+            df: 株価データフレーム
+            diagnostics: 指標計算（indicators）と条件判定（filter）の時間を記録する Diagnostics
+
+        Returns:
+            通過した場合は最新指標の辞書、除外・データなしの場合None
+        """
+        if df is None or df.empty:
+            return None
+        diagnostics = diagnostics or _NO_DIAGNOSTICS
+
+        # 短期指標（20本程度）の条件から判定し、必要な指標だけ計算
+        with diagnostics.stage('indicators'):
+            values = TechnicalIndicators.calculate_latest_indicators(df, fields=self.short_fields)
+        with diagnostics.stage('filter'):
+            passed = self.check('short_window', values)
+        if not passed:
+            diagnostics.count('indicators', items_in=1)
+            return None
+
+        # 長期指標（200本以上）の条件
+        with diagnostics.stage('indicators'):
+            values.update(TechnicalIndicators.calculate_latest_indicators(df, fields=self.long_fields))
+        with diagnostics.stage('filter'):
+            passed = self.check('long_window', values)
+        if not passed:
+            diagnostics.count('indicators', items_in=1)
+            return None
+
+        with diagnostics.stage('indicators'):
+            latest = TechnicalIndicators.calculate_latest_indicators(df)
+            missing = self.mixed_fields.difference(latest)
+            if missing:
+                latest.update(TechnicalIndicators.calculate_latest_indicators(df, fields=missing))
+        diagnostics.count('indicators', items_in=1, items_out=1)
+        return latest
+
+    @staticmethod
+    def fundamental_values(indicators: Dict[str, Any], stock_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        fundamentals ステージで判定する辞書（最新指標 + 銘柄情報の列）
+
+        スナップショットのテーブル（build_snapshot_table）と同じく、銘柄情報は FUNDAMENTAL_COLUMNS だけを使う。
+        """
+        return {**indicators, **{field: stock_info.get(field) for field in FUNDAMENTAL_COLUMNS}}
+
+    def merge_counts(self, counts: Dict[str, Dict[str, int]]):
+        """別プロセスで評価した通過・除外件数を合算"""
+        for stage, count in counts.items():
+            for key, value in count.items():
+                self.counts[stage][key] += value
+
+    def matches(self, indicators: Dict[str, Any]) -> bool:
+        """テクニカル条件をすべて満たすか判定（件数は記録しない）"""
+        return all(
+            predicate.check(indicators)
+            for stage in ('short_window', 'long_window')
+            for predicate in self.stage_predicates[stage]
+        )
+
+    def prefilter(self, symbols: List[str], info_cache: Optional[Any]) -> List[str]:
+        """
+        キャッシュ済みの銘柄情報で、過去データを取得する前に銘柄を絞り込む
+
+        キャッシュにない銘柄は判定を fundamentals ステージに持ち越す。
+
+        Args:
+            symbols: ティッカーシンボルのリスト
+            info_cache: FundamentalsCache（未設定ならそのまま返す）
+
+        Returns:
+            残った銘柄のリスト
+        """
+        if info_cache is None or not self.stage_predicates['fundamentals_cached']:
+            return list(symbols)
+
+        fields = self.info_fields
+        survivors = []
+        for symbol in symbols:
+            info = info_cache.get(symbol, fields=fields)
+            if info is None or self.check('fundamentals_cached', info):
+                survivors.append(symbol)
+        return survivors
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """ステージごとの入力件数と除外件数"""
+        return {stage: dict(count) for stage, count in self.counts.items()}
@@ -0,0 +1,236 @@
+"""
+指標計算のプロセス並列化（シャーディング）
+銘柄リストを分割してプロセスプールで計算し、CPUコア数に比例して処理を速くする
+
+OHLCVは DataFrame を pickle で送らず、共有メモリ（multiprocessing.shared_memory）に
+全銘柄分を1ブロックとして書き込み、ワーカーは銘柄ごとのオフセットからビューを作って読む。
+ワーカーに送るのはシンボル・オフセット・フィルター条件だけになる。
+
+共有メモリのレイアウト:
+    float64 配列 (6, 全銘柄の合計本数)  行 = open, high, low, close, volume, 日付（1970-01-01 からの日数）
+    offsets[i]:offsets[i + 1] が i 番目の銘柄の列範囲
+
+日付の行は週足・月足の条件がある場合だけワーカーが Date 列として読む。
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.technical_indicators import PANEL_FIELDS
+from utils.timeframes import frame_dates
+from utils.diagnostics import Diagnostics
+from utils.screen_planner import ScreenPlan
+
+# 1タスクあたりの銘柄数
+DEFAULT_SHARD_SIZE = 50
+
+# 共有メモリの行（OHLCV + 日付）
+BLOCK_ROWS = len(PANEL_FIELDS) + 1
+DATE_ROW = len(PANEL_FIELDS)
+
+
+class SharedOHLCV:
+    """
+    複数銘柄のOHLCVを格納した共有メモリブロック（作成側）
+
+    使い方:
+        block = SharedOHLCV(frames)
+        ... ワーカーに block.name, block.symbols, block.offsets を渡す ...
+        block.release()
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        """
+        Args:
+            frames: シンボルをキーとした get_historical_data 形式のDataFrame
+        """
+        self.symbols = [s for s, df in frames.items() if df is not None and not df.empty]
+        lengths = [len(frames[s]) for s in self.symbols]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).tolist()
+        total = self.offsets[-1]
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(total, 1) * BLOCK_ROWS * 8)
+        self.name = self.shm.name
+        data = np.ndarray((BLOCK_ROWS, total), dtype=np.float64, buffer=self.shm.buf)
+        for i, symbol in enumerate(self.symbols):
+            df = frames[symbol]
+            start, end = self.offsets[i], self.offsets[i + 1]
+            for row, field in enumerate(PANEL_FIELDS):
+                data[row, start:end] = df[field].to_numpy()
+            data[DATE_ROW, start:end] = frame_dates(df).astype('datetime64[D]').astype(np.int64)
+        del data
+
+    def release(self):
+        """共有メモリを解放"""
+        self.shm.close()
+        self.shm.unlink()
+
+
+# ワーカープロセスごとのフィルター（filters の JSON 文字列 → ScreenPlan）
+_WORKER_PLANS: Dict[str, ScreenPlan] = {}
+
+
+def _evaluate_shard(
+    name: str,
+    total: int,
+    symbols: List[str],
+    offsets: List[Tuple[int, int]],
+    filters_key: str,
+    filters: dict,
+    with_diagnostics: bool = False
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, Dict[str, int]], Dict[str, Any]]:
+    """
+    ワーカー: 共有メモリ上の銘柄に short_window / long_window の条件を適用
+
+    Returns:
+        ([(通過銘柄, 最新指標)], ステージ別の通過・除外件数, 計測結果)
+    """
+    diagnostics = Diagnostics(enabled=with_diagnostics)
+    plan = _WORKER_PLANS.get(filters_key)
+    if plan is None:
+        plan = _WORKER_PLANS[filters_key] = ScreenPlan(filters)
+    before = plan.stats()
+
+    # プールのワーカーは作成側と同じリソーストラッカーを使うため、接続しても二重解放にはならない
+    shm = shared_memory.SharedMemory(name=name)
+    passed = []
+    with_dates = bool(plan.timeframes)
+    try:
+        data = np.ndarray((BLOCK_ROWS, total), dtype=np.float64, buffer=shm.buf)
+        for symbol, (start, end) in zip(symbols, offsets):
+            # 共有メモリのビューをそのまま列にする（コピーなし）
+            df = pd.DataFrame(data[:DATE_ROW, start:end].T, columns=list(PANEL_FIELDS), copy=False)
+            if with_dates:
+                # 週足・月足の条件がある場合のみ日付を付ける
+                days = data[DATE_ROW, start:end].astype(np.int64).astype('datetime64[D]')
+                df['Date'] = days.astype('datetime64[ns]')
+            try:
+                values = plan.evaluate_history(df, diagnostics)
+            except Exception as e:
+                print(f"Error processing {symbol}: {e}")
+                values = None
+            if values is not None:
+                passed.append((symbol, values))
+            del df
+        del data
+    finally:
+        shm.close()
+
+    after = plan.stats()
+    counts = {
+        stage: {key: after[stage][key] - before[stage][key] for key in after[stage]}
+        for stage in ('short_window', 'long_window')
+    }
+    return passed, counts, diagnostics.to_dict()['stages']
+
+
+class ShardedEvaluator:
+    """
+    プロセスプールで銘柄ごとのフィルター判定と最新指標計算を並列実行
+
+    使い方:
+        with ShardedEvaluator(plan, filters, workers=16) as evaluator:
+            for symbol, indicators in evaluator.evaluate(frames_stream):
+                ...
+        # 件数は plan.stats() に合算される
+    """
+
+    def __init__(
+        self,
+        plan: ScreenPlan,
+        filters: dict,
+        workers: Optional[int] = None,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        diagnostics: Optional[Diagnostics] = None
+    ):
+        """
+        Args:
+            plan: 件数を合算する ScreenPlan
+            filters: ワーカーで ScreenPlan を組み立て直すためのフィルター条件
+            workers: プロセス数（未指定時はCPUコア数）
+            shard_size: 1タスクあたりの銘柄数
+            diagnostics: ワーカーの計測結果を合算する Diagnostics
+        """
+        self.diagnostics = diagnostics or Diagnostics(enabled=False)
+        self.plan = plan
+        self.filters = filters
+        self.filters_key = json.dumps(filters, sort_keys=True, default=str)
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = max(1, shard_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def _submit(self, block: SharedOHLCV) -> list:
+        futures = []
+        total = block.offsets[-1]
+        for i in range(0, len(block.symbols), self.shard_size):
+            symbols = block.symbols[i:i + self.shard_size]
+            offsets = [(block.offsets[j], block.offsets[j + 1]) for j in range(i, i + len(symbols))]
+            futures.append(self.executor.submit(
+                _evaluate_shard, block.name, total, symbols, offsets, self.filters_key, self.filters,
+                self.diagnostics.enabled
+            ))
+        return futures
+
+    def evaluate(self, frames_stream: Iterable[Dict[str, pd.DataFrame]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        届いた過去データのチャンクを順に共有メモリへ載せて並列評価し、完了順に通過銘柄を返す
+
+        Args:
+            frames_stream: シンボルをキーとしたDataFrameの辞書を順に返すイテラブル
+
+        Yields:
+            (シンボル, 最新指標)
+        """
+        pending: Dict[Any, SharedOHLCV] = {}
+        remaining: Dict[str, int] = {}
+        blocks: Dict[str, SharedOHLCV] = {}
+
+        def collect(futures) -> Iterator[Tuple[str, Dict[str, Any]]]:
+            for future in futures:
+                block = pending.pop(future)
+                passed, counts, stages = future.result()
+                self.plan.merge_counts(counts)
+                self.diagnostics.merge(stages)
+                remaining[block.name] -= 1
+                if remaining[block.name] == 0:
+                    blocks.pop(block.name).release()
+                yield from passed
+
+        try:
+            for frames in frames_stream:
+                block = SharedOHLCV(frames)
+                if not block.symbols:
+                    block.release()
+                    continue
+                futures = self._submit(block)
+                blocks[block.name] = block
+                remaining[block.name] = len(futures)
+                for future in futures:
+                    pending[future] = block
+
+                # 完了済みのタスクから結果を返す（取得と計算を重ねる）
+                yield from collect([f for f in list(pending) if f.done()])
+
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        finally:
+            for future in pending:
+                future.cancel()
+            wait(list(pending))
+            for block in blocks.values():
+                block.release()
@@ -0,0 +1,61 @@
+"""
+プロセス内で共有するデータ取得の状態
+レート制限・日足キャッシュ・銘柄情報キャッシュ・スクリーニング結果キャッシュを初回使用時に1つだけ作成し、
+screen.py・python/get-stock-data.py・cron/*.py のすべてで使い回す
+
+Serverless Function では1リクエスト = 1プロセスのことが多いが、
+常駐サービス（service.py）や再利用されたコンテナでは 2,000 calls/hour の予算とキャッシュの中身がリクエスト間で引き継がれる。
+"""
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from utils.fetch_scheduler import TokenBucket
+from utils.ohlcv_cache import OHLCVCache
+from utils.fundamentals_cache import FundamentalsCache
+from utils.result_cache import ScreenResultCache
+
+_instances: Dict[str, Any] = {}
+# 作成関数の中で他の共有インスタンスを取得するため再入可能なロックにする
+_lock = threading.RLock()
+
+
+def _shared(name: str, factory: Callable[[], Any]) -> Any:
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+
+def rate_limiter() -> TokenBucket:
+    """Yahoo Finance 呼び出しのレート制限（5 calls/s, 2,000 calls/hour）"""
+    return _shared('rate_limiter', lambda: TokenBucket(calls_per_second=5.0, calls_per_hour=2000.0))
+
+
+def ohlcv_cache() -> OHLCVCache:
+    """日足のローカルキャッシュ（保存先は OHLCV_CACHE_DIR）"""
+    return _shared('ohlcv_cache', OHLCVCache)
+
+
+def fundamentals_cache() -> FundamentalsCache:
+    """銘柄基本情報のキャッシュ（SQLite は FUNDAMENTALS_CACHE_PATH）"""
+    return _shared('fundamentals_cache', lambda: FundamentalsCache(
+        disk_path=os.environ.get('FUNDAMENTALS_CACHE_PATH', '/tmp/fundamentals-cache.sqlite')
+    ))
+
+
+def result_cache() -> ScreenResultCache:
+    """スクリーニング結果のキャッシュ（日足キャッシュの足の書き換えで無効化）"""
+    return _shared('result_cache', lambda: ScreenResultCache(ohlcv_cache=ohlcv_cache()))
+
+
+def yf_wrapper() -> 'YFinanceWrapper':
+    """上記のレート制限・キャッシュを使う YFinanceWrapper（同じ銘柄の日足の同時取得はこのインスタンス内で1回にまとめる）"""
+    from utils.yfinance_wrapper import YFinanceWrapper
+
+    return _shared('yf_wrapper', lambda: YFinanceWrapper(
+        rate_limiter=rate_limiter(), cache=ohlcv_cache(), info_cache=fundamentals_cache()
+    ))
@@ -0,0 +1,344 @@
+"""
+スクリーニング用スナップショットの保存・読み込み
+夜間バッチ（cron/update-snapshot.py）で全銘柄の最新指標とスコアを stock_data に書き込み、
+/api/screen の snapshot モードはこのテーブル（またはファイル書き出し）から応答する
+
+接続先:
+    postgresql://...          Supabase などの Postgres（psycopg2 が必要）
+    sqlite:////tmp/x.sqlite   ローカル検証用の SQLite（スキーマは自動作成）
+"""
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.technical_indicators import LATEST_INDICATOR_KEYS, EXTRA_INDICATOR_KEYS
+from utils.filter_compiler import FUNDAMENTAL_COLUMNS
+
+DEFAULT_DATABASE_URL = 'sqlite:////tmp/stock-snapshot.sqlite'
+
+# スナップショットに保存する指標
+SNAPSHOT_INDICATOR_KEYS = LATEST_INDICATOR_KEYS + EXTRA_INDICATOR_KEYS
+
+# 指標名 → stock_data のカラム名（記載のないものは同名）
+COLUMN_MAP = {
+    'price': 'current_price',
+    'open': 'open_price',
+    'high': 'high_price',
+    'low': 'low_price',
+    'score': 'screen_score',
+}
+
+# stock_data に書き込む項目（指標名）
+STOCK_DATA_FIELDS = (
+    'price', 'open', 'high', 'low', 'volume', 'dollar_volume', 'market_cap',
+) + SNAPSHOT_INDICATOR_KEYS + ('score',)
+
+# stocks に書き込む項目
+STOCK_FIELDS = ('name', 'sector', 'industry', 'market_cap', 'exchange', 'country')
+
+# 整数で保存する項目
+INTEGER_FIELDS = ('volume', 'market_cap', 'volume_avg_20', 'score')
+
+# SQLite 用のスキーマ（Postgres は prisma/migrations の 003・004 を適用）
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stocks (
+  symbol TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  sector TEXT,
+  industry TEXT,
+  market_cap INTEGER,
+  exchange TEXT,
+  country TEXT DEFAULT 'US',
+  is_active INTEGER DEFAULT 1,
+  last_updated TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS stock_data (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  symbol TEXT NOT NULL,
+  date TEXT NOT NULL,
+  {columns},
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE(symbol, date)
+);
+CREATE INDEX IF NOT EXISTS idx_stock_data_date ON stock_data(date DESC);
+"""
+
+
+def _column(field: str) -> str:
+    return COLUMN_MAP.get(field, field)
+
+
+def _to_db(value: Any, integer: bool = False) -> Any:
+    """numpy の値・NaN を DB ドライバが扱える型に変換"""
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, str):
+        return value
+    try:
+        if np.isnan(value):
+            return None
+    except TypeError:
+        return value
+    return int(value) if integer else float(value)
+
+
+class SnapshotStore:
+    """
+    stock_data スナップショットの読み書き
+
+    使い方:
+        store = SnapshotStore('sqlite:////tmp/stock-snapshot.sqlite')
+        store.write_snapshot(table)        # 1チャンク = 1トランザクション
+        table, as_of = store.load_latest()
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        """
+        Args:
+            url: 接続先（未指定時は環境変数 SNAPSHOT_DATABASE_URL、なければ /tmp の SQLite）
+        """
+        self.url = url or os.environ.get('SNAPSHOT_DATABASE_URL', DEFAULT_DATABASE_URL)
+        self.is_postgres = self.url.startswith(('postgres://', 'postgresql://'))
+
+        if self.is_postgres:
+            try:
+                import psycopg2
+                import psycopg2.extras
+            except ImportError as e:
+                raise ImportError('Postgres に接続するには psycopg2 が必要です') from e
+            self.extras = psycopg2.extras
+            self.db = psycopg2.connect(self.url)
+        else:
+            path = self.url[len('sqlite:///'):] if self.url.startswith('sqlite:///') else self.url
+            self.db = sqlite3.connect(path)
+            columns = ',\n  '.join(
+                f"{_column(f)} {'INTEGER' if f in INTEGER_FIELDS or f == 'perfect_order_bullish' else 'REAL'}"
+                for f in STOCK_DATA_FIELDS
+            )
+            self.db.executescript(SQLITE_SCHEMA.format(columns=columns))
+
+    def _upsert_sql(self, table: str, fields: Tuple[str, ...], keys: Tuple[str, ...]) -> str:
+        columns = [*keys, *fields]
+        updates = ', '.join(f'{c} = EXCLUDED.{c}' for c in fields)
+        values = '%s' if self.is_postgres else '(' + ', '.join('?' * len(columns)) + ')'
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values} "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+        )
+
+    def _execute_many(self, cursor, sql: str, rows: List[tuple]):
+        if self.is_postgres:
+            # 複数行を1文の VALUES にまとめて送信
+            self.extras.execute_values(cursor, sql, rows, page_size=len(rows) or 1)
+        else:
+            cursor.executemany(sql, rows)
+
+    def write_snapshot(self, table: pd.DataFrame, chunk_size: int = 500) -> int:
+        """
+        スナップショットを upsert（chunk_size 行ごとに1トランザクション）
+
+        stock_data.symbol は stocks を参照するため、同じトランザクションで先に stocks を更新する。
+
+        Args:
+            table: インデックスがシンボルのDataFrame（date・指標・銘柄情報・score 列）
+            chunk_size: 1トランザクションあたりの行数
+
+        Returns:
+            書き込んだ行数
+        """
+        stock_fields = tuple(_column(f) for f in STOCK_FIELDS)
+        data_fields = tuple(_column(f) for f in STOCK_DATA_FIELDS)
+        stocks_sql = self._upsert_sql('stocks', stock_fields, ('symbol',))
+        data_sql = self._upsert_sql('stock_data', data_fields, ('symbol', 'date'))
+
+        def value(row: Dict[str, Any], field: str) -> Any:
+            return _to_db(row.get(field), integer=field in INTEGER_FIELDS)
+
+        records = table.to_dict(orient='index')
+        symbols = list(records)
+        written = 0
+        for start in range(0, len(symbols), chunk_size):
+            stock_rows, data_rows = [], []
+            for symbol in symbols[start:start + chunk_size]:
+                row = records[symbol]
+                name = row.get('name')
+                stock_rows.append((symbol, name if isinstance(name, str) and name else symbol,
+                                   *(value(row, f) for f in STOCK_FIELDS[1:])))
+                data_rows.append((symbol, value(row, 'date'), *(value(row, f) for f in STOCK_DATA_FIELDS)))
+
+            cursor = self.db.cursor()
+            try:
+                self._execute_many(cursor, stocks_sql, stock_rows)
+                self._execute_many(cursor, data_sql, data_rows)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            finally:
+                cursor.close()
+            written += len(data_rows)
+
+        return written
+
+    def write_stocks(self, infos: Dict[str, Dict[str, Any]]) -> int:
+        """
+        銘柄マスタ（stocks）を upsert（1トランザクション）
+
+        Args:
+            infos: シンボルをキーとした get_stock_info の結果
+
+        Returns:
+            書き込んだ行数
+        """
+        stock_fields = tuple(_column(f) for f in STOCK_FIELDS)
+        rows = []
+        for symbol, info in infos.items():
+            name = info.get('name')
+            rows.append((symbol, name if isinstance(name, str) and name else symbol,
+                         *(_to_db(info.get(f), integer=f in INTEGER_FIELDS) for f in STOCK_FIELDS[1:])))
+
+        cursor = self.db.cursor()
+        try:
+            self._execute_many(cursor, self._upsert_sql('stocks', stock_fields, ('symbol',)), rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            cursor.close()
+        return len(rows)
+
+    def load_latest(self) -> Tuple[pd.DataFrame, Optional[str]]:
+        """
+        最新日付のスナップショットを読み込み
+
+        Returns:
+            (インデックスがシンボルのDataFrame（列名は指標名）, スナップショットの日付)
+        """
+        selects = ', '.join(
+            f'd.{_column(f)} AS {f}' for f in STOCK_DATA_FIELDS if f != 'market_cap'
+        )
+        infos = ', '.join(f's.{f}' for f in STOCK_FIELDS if f != 'market_cap')
+        sql = (
+            f'SELECT d.symbol, d.date, {selects}, COALESCE(d.market_cap, s.market_cap) AS market_cap, {infos} '
+            'FROM stock_data d LEFT JOIN stocks s ON s.symbol = d.symbol '
+            'WHERE d.date = (SELECT MAX(date) FROM stock_data)'
+        )
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(sql)
+            columns = [c[0] for c in cursor.description]
+            table = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        finally:
+            cursor.close()
+
+        table = _normalize_table(table.set_index('symbol'))
+        as_of = str(table['date'].iloc[0]) if len(table) else None
+        return table, as_of
+
+    def close(self):
+        self.db.close()
+
+
+def _normalize_table(table: pd.DataFrame) -> pd.DataFrame:
+    """数値列を float（Decimal・文字列を含む場合も）に揃える"""
+    text_columns = (set(FUNDAMENTAL_COLUMNS) - {'market_cap'}) | {'date'}
+    for column in table.columns:
+        if column not in text_columns:
+            table[column] = pd.to_numeric(table[column], errors='coerce')
+    table.index.name = 'symbol'
+    return table
+
+
+def export_snapshot(table: pd.DataFrame, path: str):
+    """
+    スナップショットをCSVに書き出し（一時ファイル経由で原子的に置き換え）
+
+    Args:
+        table: load_latest の戻り値と同じ形式のDataFrame
+        path: 書き出し先
+    """
+    tmp_path = f'{path}.tmp'
+    table.to_csv(tmp_path, index=True)
+    os.replace(tmp_path, path)
+
+
+# ファイル読み込みの結果（パス → (更新時刻, テーブル, 日付)）
+_FILE_CACHE: Dict[str, Tuple[float, pd.DataFrame, Optional[str]]] = {}
+
+
+def load_snapshot_file(path: str) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    書き出したスナップショットを読み込み（ファイルが更新されるまでプロセス内で再利用）
+
+    Args:
+        path: export_snapshot の書き出し先
+
+    Returns:
+        (インデックスがシンボルのDataFrame, スナップショットの日付)
+    """
+    mtime = os.path.getmtime(path)
+    cached = _FILE_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    table = pd.read_csv(path, index_col='symbol', keep_default_na=True)
+    table = _normalize_table(table)
+    as_of = str(table['date'].max()) if len(table) else None
+    _FILE_CACHE[path] = (mtime, table, as_of)
+    return table, as_of
+
+
+def row_to_indicators(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    スナップショットの1行を get_latest_indicators と同じ形式の辞書に変換
+
+    Args:
+        row: テーブルの1行（列名 → 値）
+
+    Returns:
+        最新指標の辞書
+    """
+    def number(key: str) -> Any:
+        value = row.get(key)
+        return None if value is None or pd.isna(value) else float(value)
+
+    indicators: Dict[str, Any] = {'price': number('price')}
+    for key in LATEST_INDICATOR_KEYS:
+        if key == 'perfect_order_bullish':
+            indicators[key] = bool(number(key))
+        elif key == 'volume_avg_20':
+            value = number(key)
+            indicators[key] = int(value) if value is not None else None
+        else:
+            indicators[key] = number(key)
+    return indicators
+
+
+def row_to_result(symbol: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    スナップショットの1行を /api/screen の結果1件に変換
+
+    Args:
+        symbol: ティッカーシンボル
+        row: CompiledFilter.apply の1行（score 列を含む）
+
+    Returns:
+        _screen_stocks の結果と同じ形式の辞書
+    """
+    indicators = row_to_indicators(row)
+    market_cap = row.get('market_cap')
+    return {
+        'symbol': symbol,
+        'name': row['name'] if isinstance(row.get('name'), str) else '',
+        'sector': row['sector'] if isinstance(row.get('sector'), str) else '',
+        'price': indicators['price'],
+        'market_cap': 0 if market_cap is None or pd.isna(market_cap) else int(market_cap),
+        'technical_indicators': indicators,
+        'score': int(row['score']),
+    }
@@ -0,0 +1,431 @@
+"""
+銘柄ユニバースのインデックス（SQLite）
+public/all-symbols.json（{symbol, name, exchange} の配列）を事前に SQLite に変換し、
+毎回 JSON 全体を読み込む・Wikipedia から構成銘柄を取得する処理をなくす
+
+- シンボルの完全一致: 主キー（B-tree）で O(log n)
+- 前方一致（オートコンプリート）: シンボル・銘柄名（小文字）の範囲検索で O(log n + 件数)
+- 取引所・指数（S&P 500 / NASDAQ-100）での絞り込み
+- ワラント・ライツ・ユニット（例: AACBR, AACBU）は kind 列で区別し、既定では除外
+
+インデックスは初回アクセス時に読み込み専用で開く（mmap で読む）。
+元の JSON が更新されている（サイズ・更新時刻が違う）場合、またはスキーマのバージョンが違う場合は作り直す。
+指数の構成銘柄は JSON にないため、cron/update-symbols.py が set_members で書き込む（作り直しても引き継ぐ）。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# スキーマを変えたら上げる（古いインデックスは作り直す）
+SCHEMA_VERSION = 1
+
+# 元データ（リポジトリの public/all-symbols.json）
+DEFAULT_SOURCE_PATH = Path(__file__).resolve().parent.parent.parent / 'public' / 'all-symbols.json'
+
+# インデックスの保存先
+DEFAULT_INDEX_PATH = os.environ.get('SYMBOL_INDEX_PATH', '/tmp/symbol-index.sqlite')
+
+# 構成銘柄を持つ指数
+INDEXES = ('sp500', 'nasdaq100')
+
+# 銘柄の種類（ワラント・ライツ・ユニット以外は common）
+DERIVATIVE_KINDS = ('warrant', 'right', 'unit')
+
+# 銘柄名の最後の「 - 」以降から種類を判定する（NASDAQ の銘柄名の形式）
+# 「Common Units representing limited partner interests」のようなMLPの普通株は「 - 」がないため対象外
+_KIND_PATTERNS = (
+    ('warrant', re.compile(r'\bwarrants?\b', re.IGNORECASE)),
+    ('right', re.compile(r'\brights?\b', re.IGNORECASE)),
+    ('unit', re.compile(r'\bunits?\b', re.IGNORECASE)),
+)
+
+# mmap で読む最大バイト数
+_MMAP_SIZE = 64 * 1024 * 1024
+
+
+def classify_security(name: str) -> str:
+    """
+    銘柄名から種類を判定
+
+    Args:
+        name: 銘柄名（例: 'Artius II Acquisition Inc. - Rights'）
+
+    Returns:
+        'warrant' / 'right' / 'unit' / 'common'
+    """
+    if ' - ' not in name:
+        return 'common'
+    suffix = name.rsplit(' - ', 1)[1]
+    for kind, pattern in _KIND_PATTERNS:
+        if pattern.search(suffix):
+            return kind
+    return 'common'
+
+
+def _prefix_bounds(prefix: str) -> tuple:
+    """前方一致を範囲検索にする（prefix <= 値 < 上限）"""
+    return prefix, prefix + '\U0010ffff'
+
+
+def _source_signature(path: Path) -> str:
+    stat = path.stat()
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def build_index(
+    source_path: Optional[str] = None,
+    index_path: Optional[str] = None,
+    members: Optional[Dict[str, Iterable[str]]] = None
+) -> int:
+    """
+    all-symbols.json からインデックスを作成（一時ファイルに書いてから置き換える）
+
+    Args:
+        source_path: 元のJSON（未指定時は public/all-symbols.json）
+        index_path: 保存先（未指定時は DEFAULT_INDEX_PATH）
+        members: 指数名をキーとした構成銘柄（未指定の指数は既存のインデックスから引き継ぐ）
+
+    Returns:
+        登録した銘柄数
+    """
+    source = Path(source_path or DEFAULT_SOURCE_PATH)
+    path = Path(index_path or DEFAULT_INDEX_PATH)
+    with open(source) as f:
+        entries = json.load(f)
+
+    now = str(time.time())
+    members = {name: (list(symbols), now) for name, symbols in (members or {}).items()}
+    for name, previous in _read_members(path).items():
+        members.setdefault(name, previous)
+
+    rows = {}
+    for entry in entries:
+        symbol = (entry.get('symbol') or '').strip().upper()
+        if not symbol:
+            continue
+        name = (entry.get('name') or '').strip()
+        rows[symbol] = (symbol, name, name.lower(), entry.get('exchange') or '', classify_security(name))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(
+            'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;'
+            'CREATE TABLE symbols ('
+            'symbol TEXT PRIMARY KEY, name TEXT NOT NULL, name_key TEXT NOT NULL, '
+            'exchange TEXT NOT NULL, kind TEXT NOT NULL) WITHOUT ROWID;'
+            'CREATE TABLE members (index_name TEXT NOT NULL, symbol TEXT NOT NULL, '
+            'PRIMARY KEY (index_name, symbol)) WITHOUT ROWID;'
+        )
+        db.executemany('INSERT INTO symbols VALUES (?, ?, ?, ?, ?)', sorted(rows.values()))
+        for name, (symbols, _) in members.items():
+            _insert_members(db, name, symbols)
+        db.executescript(
+            'CREATE INDEX symbols_name ON symbols (name_key);'
+            'CREATE INDEX symbols_exchange ON symbols (exchange, symbol);'
+        )
+        meta = {
+            'schema_version': str(SCHEMA_VERSION),
+            'source': str(source),
+            'source_signature': _source_signature(source),
+            'built_at': now,
+            'count': str(len(rows)),
+        }
+        for name, (_, updated_at) in members.items():
+            meta[f'members_updated_at:{name}'] = updated_at
+        db.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+        db.commit()
+    finally:
+        db.close()
+
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def _insert_members(db: sqlite3.Connection, name: str, symbols: Iterable[str]):
+    db.executemany(
+        'INSERT OR IGNORE INTO members VALUES (?, ?)',
+        ((name, symbol.strip().upper()) for symbol in symbols if symbol and symbol.strip())
+    )
+
+
+def _read_members(path: Path) -> Dict[str, tuple]:
+    """既存のインデックスの構成銘柄と更新時刻（読めない場合は空）"""
+    if not path.exists():
+        return {}
+    try:
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            members: Dict[str, list] = {}
+            for name, symbol in db.execute('SELECT index_name, symbol FROM members ORDER BY index_name, symbol'):
+                members.setdefault(name, []).append(symbol)
+            updated = dict(db.execute("SELECT key, value FROM meta WHERE key LIKE 'members_updated_at:%'"))
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return {}
+    return {
+        name: (symbols, updated.get(f'members_updated_at:{name}', '0'))
+        for name, symbols in members.items()
+    }
+
+
+class SymbolIndex:
+    """
+    銘柄インデックスの読み取り
+
+    使い方:
+        index = SymbolIndex.default()
+        index.lookup('AAPL')                       # {'symbol', 'name', 'exchange', 'kind', 'indexes'}
+        index.search('app', limit=10)              # シンボル → 銘柄名の順に前方一致
+        index.universe(exchanges=['NASDAQ'])       # ワラント等を除いたシンボル一覧
+        index.universe(index='sp500')              # S&P 500 構成銘柄
+
+    universe の結果は条件ごとにメモリに保持する（2回目以降はコピーを返すだけ）。
+    """
+
+    _default: Optional['SymbolIndex'] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, index_path: Optional[str] = None, source_path: Optional[str] = None):
+        """
+        Args:
+            index_path: インデックスのパス（未指定時は DEFAULT_INDEX_PATH）
+            source_path: 作り直すときの元のJSON（未指定時は public/all-symbols.json）
+        """
+        self.index_path = Path(index_path or DEFAULT_INDEX_PATH)
+        self.source_path = Path(source_path or DEFAULT_SOURCE_PATH)
+        self.db: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.universes: Dict[tuple, tuple] = {}
+
+    @classmethod
+    def default(cls) -> 'SymbolIndex':
+        """プロセス共通のインデックス（既定のパス）"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _is_current(self) -> bool:
+        """インデックスが現在のスキーマ・元データで作られているか"""
+        try:
+            db = sqlite3.connect(f'file:{self.index_path}?mode=ro', uri=True)
+            try:
+                meta = dict(db.execute('SELECT key, value FROM meta'))
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return False
+        if meta.get('schema_version') != str(SCHEMA_VERSION):
+            return False
+        # 元のJSONがない環境（デプロイ先など）では既存のインデックスをそのまま使う
+        if not self.source_path.exists():
+            return True
+        return meta.get('source_signature') == _source_signature(self.source_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        """初回のみインデックスを確認（必要なら作り直し）して開く"""
+        if self.db is not None:
+            return self.db
+        with self.lock:
+            if self.db is None:
+                if not self.index_path.exists() or not self._is_current():
+                    count = build_index(self.source_path, self.index_path)
+                    print(f"🗂️ 銘柄インデックス作成: {count}銘柄 → {self.index_path}")
+                db = sqlite3.connect(f'file:{self.index_path}?mode=ro', uri=True, check_same_thread=False)
+                db.execute(f'PRAGMA mmap_size = {_MMAP_SIZE}')
+                self.db = db
+        return self.db
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        db = self._connection()
+        with self.lock:
+            return db.execute(sql, params).fetchall()
+
+    def reload(self):
+        """インデックスを開き直す（set_members・build_index の後に呼ぶ）"""
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+            self.db = None
+            self.universes.clear()
+
+    def lookup(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        シンボルの完全一致
+
+        Returns:
+            {'symbol', 'name', 'exchange', 'kind', 'indexes'}（見つからない場合は None）
+        """
+        symbol = symbol.strip().upper()
+        rows = self._query('SELECT symbol, name, exchange, kind FROM symbols WHERE symbol = ?', (symbol,))
+        if not rows:
+            return None
+        indexes = [name for (name,) in self._query(
+            'SELECT index_name FROM members WHERE symbol = ? ORDER BY index_name', (symbol,)
+        )]
+        symbol, name, exchange, kind = rows[0]
+        return {'symbol': symbol, 'name': name, 'exchange': exchange, 'kind': kind, 'indexes': indexes}
+
+    def __contains__(self, symbol: str) -> bool:
+        return bool(self._query('SELECT 1 FROM symbols WHERE symbol = ?', (symbol.strip().upper(),)))
+
+    def search(
+        self,
+        prefix: str,
+        limit: int = 10,
+        exchanges: Optional[Iterable[str]] = None,
+        include_derivatives: bool = False
+    ) -> List[Dict[str, str]]:
+        """
+        シンボル・銘柄名の前方一致（オートコンプリート用）
+
+        シンボルの一致を先に、残りを銘柄名の一致で埋める（どちらもアルファベット順）。
+
+        Args:
+            prefix: 入力中の文字列（大文字・小文字は区別しない）
+            limit: 最大件数
+            exchanges: 取引所で絞り込む（例: ['NASDAQ', 'NYSE']）
+            include_derivatives: ワラント・ライツ・ユニットも含める
+
+        Returns:
+            {'symbol', 'name', 'exchange', 'kind'} のリスト
+        """
+        prefix = prefix.strip()
+        if not prefix or limit <= 0:
+            return []
+
+        where, params = self._conditions(exchanges, include_derivatives)
+        results: Dict[str, Dict[str, str]] = {}
+        for column, key in (('symbol', prefix.upper()), ('name_key', prefix.lower())):
+            low, high = _prefix_bounds(key)
+            rows = self._query(
+                f'SELECT symbol, name, exchange, kind FROM symbols '
+                f'WHERE {column} >= ? AND {column} < ?{where} ORDER BY {column} LIMIT ?',
+                (low, high, *params, limit)
+            )
+            for symbol, name, exchange, kind in rows:
+                if len(results) >= limit:
+                    break
+                results.setdefault(symbol, {'symbol': symbol, 'name': name, 'exchange': exchange, 'kind': kind})
+        return list(results.values())
+
+    @staticmethod
+    def _conditions(exchanges: Optional[Iterable[str]], include_derivatives: bool, table: str = '') -> tuple:
+        """取引所・種類の絞り込み条件（WHERE に AND で追加する部分とパラメータ。table は列名の前に付ける別名）"""
+        where, params = '', []
+        if exchanges is not None:
+            exchanges = [e.upper() for e in exchanges]
+            where += f" AND {table}exchange IN ({', '.join('?' * len(exchanges))})" if exchanges else ' AND 0'
+            params.extend(exchanges)
+        if not include_derivatives:
+            where += f" AND {table}kind NOT IN ({', '.join('?' * len(DERIVATIVE_KINDS))})"
+            params.extend(DERIVATIVE_KINDS)
+        return where, params
+
+    def universe(
+        self,
+        exchanges: Optional[Iterable[str]] = None,
+        index: Optional[str] = None,
+        include_derivatives: bool = False
+    ) -> List[str]:
+        """
+        条件に合うシンボルの一覧（アルファベット順）
+
+        Args:
+            exchanges: 取引所で絞り込む（未指定時は全取引所）
+            index: 'sp500' / 'nasdaq100' / 'all'（S&P 500 と NASDAQ-100 の和集合）
+            include_derivatives: ワラント・ライツ・ユニットも含める
+
+        Returns:
+            シンボルのリスト（指数の構成銘柄は all-symbols.json にない銘柄も含む）
+
+        Raises:
+            ValueError: 不明な指数名の場合
+        """
+        if index is not None and index != 'all' and index not in INDEXES:
+            raise ValueError(f'不明な指数です: {index}（{", ".join(INDEXES + ("all",))}）')
+        key = (tuple(sorted(e.upper() for e in exchanges)) if exchanges is not None else None,
+               index, include_derivatives)
+        cached = self.universes.get(key)
+        if cached is not None:
+            return list(cached)
+
+        if index is None:
+            where, params = self._conditions(exchanges, include_derivatives)
+            rows = self._query(f'SELECT symbol FROM symbols WHERE 1{where} ORDER BY symbol', params)
+        else:
+            names = INDEXES if index == 'all' else (index,)
+            # JSON にない構成銘柄（BRK-B など）は取引所・種類が不明なため、取引所の指定がなければ含める
+            condition, params = self._conditions(exchanges, include_derivatives, table='s.')
+            rows = self._query(
+                f"SELECT DISTINCT m.symbol FROM members m LEFT JOIN symbols s ON s.symbol = m.symbol "
+                f"WHERE m.index_name IN ({', '.join('?' * len(names))}) "
+                f"AND (s.symbol IS NOT NULL{condition} OR s.symbol IS NULL AND ?) ORDER BY m.symbol",
+                (*names, *params, exchanges is None)
+            )
+        symbols = tuple(symbol for (symbol,) in rows)
+        self.universes[key] = symbols
+        return list(symbols)
+
+    def members_updated_at(self, index: str) -> Optional[float]:
+        """指数の構成銘柄を最後に書き込んだ時刻（UNIX時間、未登録の場合は None）"""
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (f'members_updated_at:{index}',))
+        return float(rows[0][0]) if rows else None
+
+    def set_members(self, members: Dict[str, Iterable[str]]):
+        """
+        指数の構成銘柄を書き込み（指定した指数の構成銘柄を置き換える）
+
+        Args:
+            members: 指数名をキーとした構成銘柄（空の指数は書き込まない）
+        """
+        members = {name: list(symbols) for name, symbols in members.items() if symbols}
+        if not members:
+            return
+        self._connection()
+        db = sqlite3.connect(self.index_path)
+        try:
+            now = str(time.time())
+            with db:
+                for name, symbols in members.items():
+                    db.execute('DELETE FROM members WHERE index_name = ?', (name,))
+                    _insert_members(db, name, symbols)
+                    db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (f'members_updated_at:{name}', now))
+        finally:
+            db.close()
+        self.reload()
+
+    def stats(self) -> Dict[str, Any]:
+        """登録件数（取引所別・種類別・指数別）とメタデータ"""
+        meta = dict(self._query('SELECT key, value FROM meta'))
+        return {
+            'schema_version': int(meta['schema_version']),
+            'built_at': float(meta['built_at']),
+            'symbols': int(meta['count']),
+            'exchanges': dict(self._query('SELECT exchange, COUNT(*) FROM symbols GROUP BY exchange')),
+            'kinds': dict(self._query('SELECT kind, COUNT(*) FROM symbols GROUP BY kind')),
+            'indexes': dict(self._query('SELECT index_name, COUNT(*) FROM members GROUP BY index_name')),
+        }
+
+
+# テスト用
+if __name__ == "__main__":
+    import sys
+
+    index = SymbolIndex.default()
+    print(json.dumps(index.stats(), ensure_ascii=False, indent=2))
+    for query in sys.argv[1:] or ['AAPL', 'app']:
+        print(f"\n🔎 {query}: {index.lookup(query)}")
+        for row in index.search(query, limit=5):
+            print(f"   {row['symbol']:<6} {row['exchange']:<7} {row['name']}")
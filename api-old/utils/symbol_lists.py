@@ -1,11 +1,14 @@
 """
 銘柄リスト取得ユーティリティ
 S&P 500, NASDAQ 100, Russell 1000の銘柄リストを取得
+
+構成銘柄は銘柄インデックス（utils/symbol_index.py）に保存済みであればそこから読み、
+Wikipedia への取得は cron/update-symbols.py の構成銘柄更新時と、インデックスが空の場合のみ行う
 """
 import pandas as pd
 from typing import List, Set
-import requests
-from bs4 import BeautifulSoup
+
+from utils.symbol_index import SymbolIndex
 
 
 class SymbolLists:
@@ -81,13 +84,38 @@ class SymbolLists:
             return []
 
     @staticmethod
-    def get_all_symbols() -> List[str]:
+    def get_index_symbols(index: str = 'all') -> List[str]:
+        """
+        銘柄インデックスに保存済みの構成銘柄を取得（ネットワークは使わない）
+
+        Args:
+            index: 'sp500' / 'nasdaq100' / 'all'（両方の和集合）
+
+        Returns:
+            ティッカーシンボルのリスト（未保存・インデックスを開けない場合は空）
+        """
+        try:
+            return SymbolIndex.default().universe(index=index, include_derivatives=True)
+        except Exception as e:
+            print(f"⚠️ 銘柄インデックス読み込みエラー: {e}")
+            return []
+
+    @staticmethod
+    def get_all_symbols(use_index: bool = True) -> List[str]:
         """
         全銘柄リストを取得（重複削除）
 
+        Args:
+            use_index: 銘柄インデックスに構成銘柄があればそれを返す（False の場合は常にWikipediaから取得）
+
         Returns:
             ユニークなティッカーシンボルのリスト
         """
+        if use_index:
+            symbols = SymbolLists.get_index_symbols('all')
+            if symbols:
+                return symbols
+
         all_symbols: Set[str] = set()
 
         # S&P 500
@@ -1,10 +1,93 @@
 """
 テクニカル指標計算エンジン
 移動平均線、RSI、ADR、VWAPなどを計算
+
+日足のほか、日足から作った週足・月足（utils.timeframes）でも同じ指標を計算できる。
+最新値の計算では weekly_ / monthly_ を付けた指標名（例: weekly_ma_30）で上位足の指標を指定する。
 """
+import re
+
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Union, Optional, Iterable
+
+from utils import rolling_kernels
+from utils.timeframes import (
+    BARS_PER_52_WEEKS, TRADING_DAYS_PER_BAR, frame_dates, prefixed, resample_columns, split_field,
+)
+
+# パネル計算で扱うOHLCVフィールド
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+# get_latest_indicators が返す指標（price を除く、出力順）
+LATEST_INDICATOR_KEYS = (
+    'ma_10', 'ma_20', 'ma_50', 'ma_150', 'ma_200', 'rsi_14', 'adr_20', 'vwap',
+    'volume_avg_20', 'week_52_high', 'week_52_low', 'distance_ma_10', 'distance_ma_200',
+    'perfect_order_bullish',
+)
+
+# fields で指定した場合のみ計算する追加指標（スナップショット・列間比較用）
+EXTRA_INDICATOR_KEYS = (
+    'ema_10', 'ema_21', 'bb_upper', 'bb_middle', 'bb_lower', 'distance_ma_20', 'distance_ma_50',
+)
+
+# calculate_all_indicators が追加する float64 のカラム（追加順、最後に perfect_order_bullish）
+INDICATOR_COLUMNS = (
+    'ma_10', 'ma_20', 'ma_50', 'ma_150', 'ma_200', 'ema_10', 'ema_21', 'rsi_14', 'adr_20', 'vwap',
+    'bb_upper', 'bb_middle', 'bb_lower', 'volume_avg_20', 'week_52_high', 'week_52_low',
+    'distance_ma_10', 'distance_ma_20', 'distance_ma_50', 'distance_ma_200',
+)
+
+# 各指標の最新値の計算に必要な本数
+INDICATOR_LOOKBACK = {
+    'price': 1,
+    'ma_10': 10,
+    'ma_20': 20,
+    'ma_50': 50,
+    'ma_150': 150,
+    'ma_200': 200,
+    'rsi_14': 15,
+    'adr_20': 20,
+    'volume_avg_20': 20,
+    'distance_ma_10': 10,
+    'distance_ma_200': 200,
+    'perfect_order_bullish': 200,
+    'week_52_high': 252,
+    'week_52_low': 252,
+    'bb_upper': 20,
+    'bb_middle': 20,
+    'bb_lower': 20,
+    'distance_ma_20': 20,
+    'distance_ma_50': 50,
+}
+
+# 期間を名前で指定する指標（ma_30・ema_13・distance_ma_30 など、上の一覧にない期間も計算できる）
+_PERIOD_FIELD = re.compile(r'^(ma|ema|distance_ma)_([1-9][0-9]*)$')
+
+
+def indicator_lookback(field: str) -> Optional[int]:
+    """
+    指標の最新値の計算に必要な日足の本数
+
+    weekly_ / monthly_ の指標は上位足の本数 × 1本あたりの営業日数で見積もる。
+
+    Args:
+        field: 指標名（例: 'ma_50'、'weekly_ma_30'）
+
+    Returns:
+        日足の本数（不明な指標・EMA など全期間に依存する指標はNone）
+    """
+    timeframe, base = split_field(field)
+    if base in ('week_52_high', 'week_52_low'):
+        bars = BARS_PER_52_WEEKS[timeframe]
+    elif base in INDICATOR_LOOKBACK:
+        bars = INDICATOR_LOOKBACK[base]
+    else:
+        match = _PERIOD_FIELD.match(base)
+        if match is None or match.group(1) == 'ema':
+            return None
+        bars = int(match.group(2))
+    return bars * TRADING_DAYS_PER_BAR[timeframe]
 
 
 class TechnicalIndicators:
@@ -128,31 +211,478 @@ class TechnicalIndicators:
         }
 
     @staticmethod
-    def calculate_all_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    def _rolling(values: np.ndarray, period: int) -> 'pd.core.window.rolling.Rolling':
+        """配列をコピーせずに Series として rolling する"""
+        return pd.Series(values, copy=False).rolling(window=period)
+
+    @staticmethod
+    def calculate_all_indicators(
+        df: pd.DataFrame,
+        inplace: bool = False,
+        out: Optional[np.ndarray] = None,
+        timeframe: str = 'daily'
+    ) -> pd.DataFrame:
         """
         すべてのテクニカル指標を一括計算
 
+        指標は1つの (指標数, 本数) の float64 配列に直接書き込み、中間の Series は作らない。
+        ma_20 と bb_middle は同じ窓の平均を共有し、乖離率・RSI・ADR・VWAP は
+        使い回しの作業配列の上で計算する。値は各 calculate_* を個別に呼んだ場合と同じ。
+
+        Args:
+            df: 株価データフレーム (date, open, high, low, close, volume)
+            inplace: Trueの場合は df に指標のカラムを追加して df を返す
+                     （pandas はカラム追加時に値を複製するため、確保メモリは減らない）
+            out: 指標を書き込む (len(INDICATOR_COLUMNS), len(df)) の float64 配列。
+                 銘柄ごとに同じ配列を使い回すと、1銘柄あたりの確保は作業用の配列だけになる
+                 （戻り値の指標カラムは out を参照するため、次の銘柄の計算で上書きされる）
+            timeframe: df の時間軸（'daily' / 'weekly' / 'monthly'）。52週高値・安値の本数に使う
+                       （週足・月足は timeframes.resample_frame で日足から作る）
+
+        Returns:
+            指標を追加したDataFrame（inplace=False の場合、元のカラムは df と同じ配列を参照する）
+        """
+        n = len(df)
+        close = df['close'].to_numpy(dtype=np.float64)
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+
+        block = out if out is not None else np.empty((len(INDICATOR_COLUMNS), n), dtype=np.float64)
+        if block.shape != (len(INDICATOR_COLUMNS), n) or block.dtype != np.float64:
+            raise ValueError(f'out は ({len(INDICATOR_COLUMNS)}, {n}) の float64 配列を指定してください')
+        columns = dict(zip(INDICATOR_COLUMNS, block))
+        work = np.empty(n, dtype=np.float64)
+        work2 = np.empty(n, dtype=np.float64)
+        rolling = TechnicalIndicators._rolling
+        week_52 = BARS_PER_52_WEEKS[timeframe]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 移動平均線（20日の窓はボリンジャーバンドと共有）
+            for period in (10, 50, 150, 200):
+                np.copyto(columns[f'ma_{period}'], rolling(close, period).mean().to_numpy())
+            window_20 = rolling(close, 20)
+            np.copyto(columns['ma_20'], window_20.mean().to_numpy())
+
+            # EMA
+            for period in (10, 21):
+                ema = pd.Series(close, copy=False).ewm(span=period, adjust=False).mean()
+                np.copyto(columns[f'ema_{period}'], ema.to_numpy())
+
+            # RSI（先頭・欠損の値幅は0として扱う、calculate_rsi と同じ）
+            delta = work
+            delta[:1] = 0.0
+            np.subtract(close[1:], close[:-1], out=delta[1:])
+            np.fmax(delta, 0.0, out=work2)
+            gain = rolling(work2, 14).mean().to_numpy()
+            np.negative(delta, out=work)
+            np.fmax(work, 0.0, out=work)
+            loss = rolling(work, 14).mean().to_numpy()
+            rsi = columns['rsi_14']
+            np.divide(gain, loss, out=rsi)
+            rsi += 1
+            np.divide(100, rsi, out=rsi)
+            np.subtract(100, rsi, out=rsi)
+            del gain, loss
+
+            # ADR
+            np.subtract(high, low, out=work)
+            np.divide(work, close, out=work)
+            work *= 100
+            np.copyto(columns['adr_20'], rolling(work, 20).mean().to_numpy())
+
+            # VWAP（欠損は累積に含めない、pandas の cumsum と同じ）
+            np.add(high, low, out=work)
+            work += close
+            work /= 3
+            work *= volume
+            TechnicalIndicators._nan_cumsum(work)
+            np.copyto(work2, volume)
+            TechnicalIndicators._nan_cumsum(work2)
+            np.divide(work, work2, out=columns['vwap'])
+
+            # ボリンジャーバンド（中心線は ma_20 と同じ値）
+            np.copyto(columns['bb_middle'], columns['ma_20'])
+            np.multiply(window_20.std().to_numpy(), 2.0, out=work)
+            np.add(columns['ma_20'], work, out=columns['bb_upper'])
+            np.subtract(columns['ma_20'], work, out=columns['bb_lower'])
+
+            # 出来高平均
+            np.copyto(columns['volume_avg_20'], rolling(volume, 20).mean().to_numpy())
+
+            # 52週高値・安値
+            if rolling_kernels.use_kernel(high):
+                np.copyto(columns['week_52_high'], rolling_kernels.rolling_max(high, week_52))
+                np.copyto(columns['week_52_low'], rolling_kernels.rolling_min(low, week_52))
+            else:
+                np.copyto(columns['week_52_high'], rolling(high, week_52).max().to_numpy())
+                np.copyto(columns['week_52_low'], rolling(low, week_52).min().to_numpy())
+
+            # MA乖離率
+            for period in (10, 20, 50, 200):
+                distance = columns[f'distance_ma_{period}']
+                np.subtract(close, columns[f'ma_{period}'], out=distance)
+                np.divide(distance, columns[f'ma_{period}'], out=distance)
+                distance *= 100
+
+        # 移動平均線のパーフェクトオーダーチェック
+        perfect_order = columns['ma_10'] > columns['ma_20']
+        perfect_order &= columns['ma_20'] > columns['ma_50']
+        perfect_order &= columns['ma_50'] > columns['ma_150']
+        perfect_order &= columns['ma_150'] > columns['ma_200']
+        columns['perfect_order_bullish'] = perfect_order
+
+        if inplace:
+            df[list(INDICATOR_COLUMNS)] = block.T
+            df['perfect_order_bullish'] = perfect_order
+            return df
+
+        # 元のカラム・指標とも配列をコピーせずにDataFrameを組み立てる
+        return pd.DataFrame(
+            {**{column: df[column] for column in df.columns}, **columns}, index=df.index, copy=False
+        )
+
+    @staticmethod
+    def _nan_cumsum(values: np.ndarray):
+        """累積和をその場で計算（NaN は足さずに NaN のまま残す）"""
+        missing = np.isnan(values)
+        if missing.any():
+            values[missing] = 0.0
+            np.cumsum(values, out=values)
+            values[missing] = np.nan
+        else:
+            np.cumsum(values, out=values)
+
+    @staticmethod
+    def get_latest_indicators(df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        最新の指標値を辞書形式で取得
+
+        Args:
+            df: 指標計算済みのDataFrame
+
+        Returns:
+            最新指標の辞書
+        """
+        if df.empty:
+            return {}
+
+        latest = df.iloc[-1]
+
+        return {
+            'price': float(latest['close']),
+            'ma_10': float(latest['ma_10']) if not pd.isna(latest['ma_10']) else None,
+            'ma_20': float(latest['ma_20']) if not pd.isna(latest['ma_20']) else None,
+            'ma_50': float(latest['ma_50']) if not pd.isna(latest['ma_50']) else None,
+            'ma_150': float(latest['ma_150']) if not pd.isna(latest['ma_150']) else None,
+            'ma_200': float(latest['ma_200']) if not pd.isna(latest['ma_200']) else None,
+            'rsi_14': float(latest['rsi_14']) if not pd.isna(latest['rsi_14']) else None,
+            'adr_20': float(latest['adr_20']) if not pd.isna(latest['adr_20']) else None,
+            'vwap': float(latest['vwap']) if not pd.isna(latest['vwap']) else None,
+            'volume_avg_20': int(latest['volume_avg_20']) if not pd.isna(latest['volume_avg_20']) else None,
+            'week_52_high': float(latest['week_52_high']) if not pd.isna(latest['week_52_high']) else None,
+            'week_52_low': float(latest['week_52_low']) if not pd.isna(latest['week_52_low']) else None,
+            'distance_ma_10': float(latest['distance_ma_10']) if not pd.isna(latest['distance_ma_10']) else None,
+            'distance_ma_200': float(latest['distance_ma_200']) if not pd.isna(latest['distance_ma_200']) else None,
+            'perfect_order_bullish': bool(latest['perfect_order_bullish']),
+        }
+
+    # ------------------------------------------------------------------
+    # 最新バーのみの評価（テール）モード
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _tail_mean(values: np.ndarray, period: int) -> np.float64:
+        """末尾period本の平均（本数不足・NaN含みはNaN）"""
+        if len(values) < period:
+            return np.float64(np.nan)
+        return values[-period:].mean()
+
+    @staticmethod
+    def _tail_rsi(close: np.ndarray, period: int = 14) -> float:
+        """末尾period本の値幅から最新RSIを計算（calculate_rsi と同じ式）"""
+        n = len(close)
+        if n < period:
+            return np.nan
+
+        delta = np.diff(close[-(period + 1):])
+        if n == period:
+            # 全系列計算では先頭のdiff(NaN)が0として窓に含まれる
+            delta = np.concatenate(([0.0], delta))
+
+        gain = np.where(delta > 0, delta, 0.0).mean()
+        loss = np.where(delta < 0, -delta, 0.0).mean()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.float64(gain) / np.float64(loss)
+            return float(100 - (100 / (1 + rs)))
+
+    @staticmethod
+    def calculate_latest_indicators(
+        df: pd.DataFrame,
+        fields: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        最新バーの指標だけを末尾の窓から直接計算
+
+        get_latest_indicators(calculate_all_indicators(df)) と同じ辞書を返すが、
+        全期間の指標系列を作らずに済むためスクリーニング向け。
+        移動平均は末尾N本の平均、52週高値・安値は末尾252本の最大・最小から求める。
+        値は全系列計算と浮動小数点の丸め誤差の範囲で一致する。
+
         Args:
             df: 株価データフレーム (date, open, high, low, close, volume)
+            fields: 計算する指標（未指定時は get_latest_indicators と同じ項目）。
+                    EXTRA_INDICATOR_KEYS の指標、任意期間の ma_N / ema_N / distance_ma_N、
+                    weekly_ / monthly_ を付けた上位足の指標も指定できる。price は常に含まれる
+
+        Returns:
+            最新指標の辞書（上位足の指標は weekly_price などの終値と合わせて接頭辞付きのキーで返す）
+        """
+        if df.empty:
+            return {}
+
+        def column(name: str) -> np.ndarray:
+            return frame_dates(df) if name == 'date' else df[name].to_numpy(dtype=float)
+
+        return TechnicalIndicators.calculate_latest_from_columns(column, fields)
+
+    @staticmethod
+    def calculate_latest_from_columns(
+        column: Callable[[str], np.ndarray],
+        fields: Optional[Iterable[str]] = None,
+        timeframe: str = 'daily'
+    ) -> Dict[str, Any]:
+        """
+        calculate_latest_indicators の本体（DataFrame 以外の格納形式から計算する場合に使う）
+
+        Args:
+            column: カラム名（open, high, low, close, volume）から float64 配列を返す関数。
+                    必要なカラムだけ呼び出す。上位足の指標を指定する場合は
+                    'date' で日付（datetime64）の配列も返す
+            fields: 計算する指標（calculate_latest_indicators と同じ）
+            timeframe: column の時間軸（52週高値・安値の本数に使う）
+
+        Returns:
+            最新指標の辞書
+        """
+        close = column('close')
+        price = close[-1]
+        higher: Dict[str, set] = {}
+        if fields is None:
+            keys = LATEST_INDICATOR_KEYS
+        else:
+            wanted = set()
+            for field in fields:
+                field_timeframe, base = split_field(field)
+                (wanted if field_timeframe == 'daily' else higher.setdefault(field_timeframe, set())).add(base)
+            known = LATEST_INDICATOR_KEYS + EXTRA_INDICATOR_KEYS
+            keys = [key for key in known if key in wanted]
+            keys += sorted(key for key in wanted.difference(known) if _PERIOD_FIELD.match(key))
+
+        mas: Dict[int, np.float64] = {}
+
+        def ma(period: int) -> np.float64:
+            if period not in mas:
+                mas[period] = TechnicalIndicators._tail_mean(close, period)
+            return mas[period]
+
+        def to_float(value: float) -> Any:
+            return None if np.isnan(value) else float(value)
+
+        result: Dict[str, Any] = {'price': float(price)}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for key in keys:
+                if key.startswith('ma_'):
+                    result[key] = to_float(ma(int(key[3:])))
+
+                elif key == 'rsi_14':
+                    result[key] = to_float(TechnicalIndicators._tail_rsi(close, 14))
+
+                elif key == 'adr_20':
+                    # ADR
+                    high = column('high')[-20:]
+                    low = column('low')[-20:]
+                    result[key] = to_float(
+                        TechnicalIndicators._tail_mean((high - low) / close[-20:] * 100, 20)
+                    )
+
+                elif key == 'vwap':
+                    # VWAP（累積値なので全期間の合計）
+                    high = column('high')
+                    low = column('low')
+                    volume = column('volume')
+                    typical_price = (high + low + close) / 3
+                    vwap = np.nansum(typical_price * volume) / np.nansum(volume)
+                    # 最新バーの価格・出来高が欠損の場合、全系列計算（cumsum）ではその行がNaNになる
+                    result[key] = None if np.isnan(typical_price[-1] * volume[-1]) else to_float(vwap)
+
+                elif key == 'volume_avg_20':
+                    volume_avg_20 = TechnicalIndicators._tail_mean(column('volume'), 20)
+                    result[key] = int(volume_avg_20) if not np.isnan(volume_avg_20) else None
+
+                elif key == 'week_52_high':
+                    # 52週高値・安値
+                    high = column('high')
+                    week_52 = BARS_PER_52_WEEKS[timeframe]
+                    result[key] = to_float(high[-week_52:].max()) if len(high) >= week_52 else None
+
+                elif key == 'week_52_low':
+                    low = column('low')
+                    week_52 = BARS_PER_52_WEEKS[timeframe]
+                    result[key] = to_float(low[-week_52:].min()) if len(low) >= week_52 else None
+
+                elif key.startswith('distance_ma_'):
+                    period = int(key[len('distance_ma_'):])
+                    result[key] = to_float((price - ma(period)) / ma(period) * 100)
+
+                elif key == 'perfect_order_bullish':
+                    result[key] = bool(ma(10) > ma(20) > ma(50) > ma(150) > ma(200))
+
+                elif key.startswith('ema_'):
+                    # EMAは全履歴に依存するため系列全体から計算
+                    ema = pd.Series(close).ewm(span=int(key[4:]), adjust=False).mean().iloc[-1]
+                    result[key] = to_float(ema)
+
+                elif key.startswith('bb_'):
+                    # ボリンジャーバンド（ma_20 と同じ窓）
+                    std = close[-20:].std(ddof=1) if len(close) >= 20 else np.nan
+                    offset = {'bb_upper': 2.0, 'bb_middle': 0.0, 'bb_lower': -2.0}[key]
+                    result[key] = to_float(ma(20) + std * offset)
+
+        # 上位足の指標（日足から週足・月足を作って同じ計算を行い、接頭辞を付ける）
+        for higher_timeframe, higher_fields in higher.items():
+            values = TechnicalIndicators.calculate_latest_from_columns(
+                resample_columns(column, higher_timeframe), higher_fields, timeframe=higher_timeframe
+            )
+            result.update((prefixed(higher_timeframe, key), value) for key, value in values.items())
+
+        return result
+
+    # ------------------------------------------------------------------
+    # パネル（日付 × 銘柄）モード
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def build_panel(frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """
+        銘柄別のDataFrameを (日付 × 銘柄) のパネルに変換
+
+        get_historical_data の戻り値（Date列 + 小文字カラム）と
+        日付インデックスのDataFrameの両方を受け付ける。
+        日付は全銘柄の和集合に揃え、データのない日はNaNになる。
+
+        Args:
+            frames: シンボルをキーとした株価データフレームの辞書
+
+        Returns:
+            フィールド名をキーとした (日付 × 銘柄) のDataFrameの辞書
+        """
+        columns: Dict[str, Dict[str, pd.Series]] = {field: {} for field in PANEL_FIELDS}
+
+        for symbol, df in frames.items():
+            if df is None or df.empty:
+                continue
+            date_col = next((c for c in ('date', 'Date', 'datetime', 'Datetime') if c in df.columns), None)
+            index = pd.Index(df[date_col]) if date_col else df.index
+            for field in PANEL_FIELDS:
+                columns[field][symbol] = pd.Series(df[field].to_numpy(), index=index)
+
+        return {
+            field: pd.DataFrame(series_map).sort_index()
+            for field, series_map in columns.items()
+        }
+
+    @staticmethod
+    def _normalize_panel(
+        panel: Union[pd.DataFrame, Dict[str, Any]]
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        パネル入力を「フィールド → (日付 × 銘柄) DataFrame」の辞書に正規化
+
+        受け付ける形式:
+            - (field, symbol) または (symbol, field) のMultiIndexカラムDataFrame
+              （yf.download(group_by='ticker') の出力もそのまま渡せる）
+            - フィールド名をキーとした2次元DataFrameの辞書
+            - フィールド名をキーとした2次元NumPy配列の辞書（列番号が銘柄）
+        """
+        if isinstance(panel, pd.DataFrame):
+            if not isinstance(panel.columns, pd.MultiIndex):
+                raise ValueError('パネルDataFrameは (field, symbol) のMultiIndexカラムが必要です')
+
+            # フィールド名がどちらのレベルにあるかを判定（大文字小文字は無視）
+            field_level = 0
+            level_values = {str(v).lower() for v in panel.columns.get_level_values(1)}
+            if set(PANEL_FIELDS) <= level_values:
+                field_level = 1
+
+            result = {}
+            for field in PANEL_FIELDS:
+                matches = [
+                    c for c in panel.columns.get_level_values(field_level).unique()
+                    if str(c).lower() == field
+                ]
+                if not matches:
+                    raise ValueError(f'パネルに {field} カラムがありません')
+                result[field] = panel.xs(matches[0], axis=1, level=field_level)
+            return result
+
+        result = {}
+        for field in PANEL_FIELDS:
+            if field not in panel:
+                raise ValueError(f'パネルに {field} カラムがありません')
+            value = panel[field]
+            if isinstance(value, np.ndarray):
+                if value.ndim != 2:
+                    raise ValueError(f'{field} は (日付 × 銘柄) の2次元配列である必要があります')
+                value = pd.DataFrame(value)
+            result[field] = value
+        return result
+
+    @staticmethod
+    def calculate_all_indicators_panel(
+        panel: Union[pd.DataFrame, Dict[str, Any]]
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        全銘柄のテクニカル指標を (日付 × 銘柄) のパネルで一括計算
+
+        calculate_all_indicators と同じ式を列方向にまとめて適用するため、
+        各銘柄の結果は銘柄別計算と一致する（EMA カーネルは丸め誤差の範囲）。
+        パネルは日付の和集合なので、途中に欠損日（他の銘柄にだけある日付）がある銘柄は
+        窓に NaN が入り銘柄別計算と一致しなくなる。そうした銘柄はその銘柄の日付だけで
+        calculate_all_indicators を計算し直し、欠損日の行は NaN（perfect_order_bullish は False）にする。
+
+        Args:
+            panel: (日付 × 銘柄) のOHLCVブロック（_normalize_panel 参照）
 
         Returns:
-            指標を追加したDataFrame
+            指標名をキーとした (日付 × 銘柄) のDataFrameの辞書
+            （入力のOHLCVフィールドも含む）
         """
-        result = df.copy()
+        result: Dict[str, pd.DataFrame] = dict(TechnicalIndicators._normalize_panel(panel))
+        close = result['close']
 
         # 移動平均線
-        result['ma_10'] = TechnicalIndicators.calculate_sma(result, 10)
-        result['ma_20'] = TechnicalIndicators.calculate_sma(result, 20)
-        result['ma_50'] = TechnicalIndicators.calculate_sma(result, 50)
-        result['ma_150'] = TechnicalIndicators.calculate_sma(result, 150)
-        result['ma_200'] = TechnicalIndicators.calculate_sma(result, 200)
+        for period in (10, 20, 50, 150, 200):
+            result[f'ma_{period}'] = TechnicalIndicators.calculate_sma(result, period)
 
-        # EMA
-        result['ema_10'] = TechnicalIndicators.calculate_ema(result, 10)
-        result['ema_21'] = TechnicalIndicators.calculate_ema(result, 21)
+        # EMA（銘柄数が多い場合は全銘柄をまとめて再帰計算するカーネルを使う）
+        for period in (10, 21):
+            if rolling_kernels.use_kernel(close, 'ema'):
+                result[f'ema_{period}'] = rolling_kernels.ema(close, period)
+            else:
+                result[f'ema_{period}'] = TechnicalIndicators.calculate_ema(result, period)
 
         # RSI
-        result['rsi_14'] = TechnicalIndicators.calculate_rsi(result, 14)
+        # 銘柄別計算では先頭のdiff(NaN)が0として扱われるため、
+        # 上場前（終値NaN）の行だけをNaNに戻して同じ窓を再現する
+        delta = close.diff()
+        listed = close.notna()
+        gain = delta.where(delta > 0, 0).where(listed).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).where(listed).rolling(window=14).mean()
+        rs = gain / loss
+        result['rsi_14'] = 100 - (100 / (1 + rs))
 
         # ADR
         result['adr_20'] = TechnicalIndicators.calculate_adr(result, 20)
@@ -170,14 +700,17 @@ class TechnicalIndicators:
         result['volume_avg_20'] = result['volume'].rolling(window=20).mean()
 
         # 52週高値・安値
-        result['week_52_high'] = result['high'].rolling(window=252).max()
-        result['week_52_low'] = result['low'].rolling(window=252).min()
+        if rolling_kernels.use_kernel(result['high']):
+            result['week_52_high'] = rolling_kernels.rolling_max(result['high'], 252)
+            result['week_52_low'] = rolling_kernels.rolling_min(result['low'], 252)
+        else:
+            result['week_52_high'] = result['high'].rolling(window=252).max()
+            result['week_52_low'] = result['low'].rolling(window=252).min()
 
         # MA乖離率
-        result['distance_ma_10'] = ((result['close'] - result['ma_10']) / result['ma_10'] * 100)
-        result['distance_ma_20'] = ((result['close'] - result['ma_20']) / result['ma_20'] * 100)
-        result['distance_ma_50'] = ((result['close'] - result['ma_50']) / result['ma_50'] * 100)
-        result['distance_ma_200'] = ((result['close'] - result['ma_200']) / result['ma_200'] * 100)
+        for period in (10, 20, 50, 200):
+            ma = result[f'ma_{period}']
+            result[f'distance_ma_{period}'] = ((close - ma) / ma * 100)
 
         # 移動平均線のパーフェクトオーダーチェック
         result['perfect_order_bullish'] = (
@@ -187,38 +720,79 @@ class TechnicalIndicators:
             (result['ma_150'] > result['ma_200'])
         )
 
+        TechnicalIndicators._recalculate_gapped(result)
         return result
 
     @staticmethod
-    def get_latest_indicators(df: pd.DataFrame) -> Dict[str, Any]:
+    def _recalculate_gapped(result: Dict[str, pd.DataFrame]):
+        """途中に欠損日がある銘柄の指標を、その銘柄の日付だけで計算し直して上書き"""
+        valid = result['close'].notna().to_numpy()
+        if valid.size == 0:
+            return
+        n_rows = valid.shape[0]
+        first = np.argmax(valid, axis=0)
+        last = n_rows - 1 - np.argmax(valid[::-1], axis=0)
+        gapped = np.flatnonzero(valid.any(axis=0) & (valid.sum(axis=0) < last - first + 1))
+
+        for j in gapped:
+            rows = np.flatnonzero(valid[:, j])
+            df = pd.DataFrame({field: result[field].to_numpy()[rows, j] for field in PANEL_FIELDS})
+            computed = TechnicalIndicators.calculate_all_indicators(df)
+            for name in INDICATOR_COLUMNS + ('perfect_order_bullish',):
+                column = np.zeros(n_rows, dtype=bool) if name == 'perfect_order_bullish' else np.full(n_rows, np.nan)
+                column[rows] = computed[name].to_numpy()
+                result[name].iloc[:, j] = column
+
+    @staticmethod
+    def get_latest_indicators_panel(indicators: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
         """
-        最新の指標値を辞書形式で取得
+        パネル計算結果から銘柄ごとの最新指標を取得
+
+        各銘柄の「終値が存在する最後の行」を最新とみなし、
+        get_latest_indicators と同じ形式の辞書を返す。
 
         Args:
-            df: 指標計算済みのDataFrame
+            indicators: calculate_all_indicators_panel の戻り値
 
         Returns:
-            最新指標の辞書
+            シンボルをキーとした最新指標の辞書（データのない銘柄は含まない）
         """
-        if df.empty:
+        close = indicators['close']
+        valid = close.notna().to_numpy()
+        if valid.size == 0:
             return {}
 
-        latest = df.iloc[-1]
-
-        return {
-            'price': float(latest['close']),
-            'ma_10': float(latest['ma_10']) if not pd.isna(latest['ma_10']) else None,
-            'ma_20': float(latest['ma_20']) if not pd.isna(latest['ma_20']) else None,
-            'ma_50': float(latest['ma_50']) if not pd.isna(latest['ma_50']) else None,
-            'ma_150': float(latest['ma_150']) if not pd.isna(latest['ma_150']) else None,
-            'ma_200': float(latest['ma_200']) if not pd.isna(latest['ma_200']) else None,
-            'rsi_14': float(latest['rsi_14']) if not pd.isna(latest['rsi_14']) else None,
-            'adr_20': float(latest['adr_20']) if not pd.isna(latest['adr_20']) else None,
-            'vwap': float(latest['vwap']) if not pd.isna(latest['vwap']) else None,
-            'volume_avg_20': int(latest['volume_avg_20']) if not pd.isna(latest['volume_avg_20']) else None,
-            'week_52_high': float(latest['week_52_high']) if not pd.isna(latest['week_52_high']) else None,
-            'week_52_low': float(latest['week_52_low']) if not pd.isna(latest['week_52_low']) else None,
-            'distance_ma_10': float(latest['distance_ma_10']) if not pd.isna(latest['distance_ma_10']) else None,
-            'distance_ma_200': float(latest['distance_ma_200']) if not pd.isna(latest['distance_ma_200']) else None,
-            'perfect_order_bullish': bool(latest['perfect_order_bullish']),
-        }
+        # 銘柄ごとの最終有効行
+        n_rows = valid.shape[0]
+        last_pos = n_rows - 1 - np.argmax(valid[::-1], axis=0)
+        has_data = valid.any(axis=0)
+        cols = np.arange(valid.shape[1])
+
+        def latest(name: str) -> np.ndarray:
+            return indicators[name].to_numpy()[last_pos, cols]
+
+        latest_keys = [
+            'ma_10', 'ma_20', 'ma_50', 'ma_150', 'ma_200', 'rsi_14', 'adr_20', 'vwap',
+            'volume_avg_20', 'week_52_high', 'week_52_low', 'distance_ma_10', 'distance_ma_200',
+        ]
+        prices = latest('close').astype(float)
+        values = {key: latest(key).astype(float) for key in latest_keys}
+        perfect_order = latest('perfect_order_bullish')
+
+        results = {}
+        for j, symbol in enumerate(close.columns):
+            if not has_data[j]:
+                continue
+            row = {'price': float(prices[j])}
+            for key in latest_keys:
+                value = values[key][j]
+                if np.isnan(value):
+                    row[key] = None
+                elif key == 'volume_avg_20':
+                    row[key] = int(value)
+                else:
+                    row[key] = float(value)
+            row['perfect_order_bullish'] = bool(perfect_order[j])
+            results[symbol] = row
+
+        return results
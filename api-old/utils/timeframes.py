@@ -0,0 +1,202 @@
+"""
+日足からの週足・月足の作成（リサンプリング）
+ローカルに持っている日足から上位足の OHLCV を作り、ネットワークからは取得しない
+
+上位足の1本:
+    date: その期間の最初の営業日（yfinance の 1wk / 1mo と同じく期間の始まりの日付）
+    open: 最初の営業日の始値 / high・low: 期間中の最高値・最安値（欠損は除く）
+    close: 最後の営業日の終値 / volume: 期間中の合計
+    週は月曜始まり、月は暦月。最後の1本は期間の途中（未確定）の場合がある。
+
+指標名の接頭辞（weekly_ / monthly_）で上位足の指標を表す。
+    weekly_close  週足の終値（最新の日足の終値と同じ）
+    weekly_ma_30  30週移動平均
+    monthly_rsi_14  月足の RSI(14)
+"""
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TIMEFRAMES = ('daily', 'weekly', 'monthly')
+
+# 日足から作る上位足
+HIGHER_TIMEFRAMES = ('weekly', 'monthly')
+
+# yfinance の interval → 時間軸
+INTERVAL_TIMEFRAMES = {'1d': 'daily', '1wk': 'weekly', '1mo': 'monthly'}
+
+# 1本あたりの営業日数（必要な日足の本数の見積もり用）
+TRADING_DAYS_PER_BAR = {'daily': 1, 'weekly': 5, 'monthly': 21}
+
+# 52週（高値・安値）の本数
+BARS_PER_52_WEEKS = {'daily': 252, 'weekly': 52, 'monthly': 12}
+
+# 1970-01-01 は木曜日（+3 日ずらすと月曜始まりの週番号になる）
+_WEEK_SHIFT_DAYS = 3
+
+
+def split_field(field: str) -> Tuple[str, str]:
+    """
+    指標名を (時間軸, 接頭辞を除いた指標名) に分ける
+
+    例) 'weekly_ma_30' → ('weekly', 'ma_30')、'rsi_14' → ('daily', 'rsi_14')
+    """
+    for timeframe in HIGHER_TIMEFRAMES:
+        prefix = f'{timeframe}_'
+        if field.startswith(prefix):
+            return timeframe, field[len(prefix):]
+    return 'daily', field
+
+
+def prefixed(timeframe: str, field: str) -> str:
+    """時間軸の接頭辞を付けた指標名（daily はそのまま）"""
+    return field if timeframe == 'daily' else f'{timeframe}_{field}'
+
+
+def period_keys(dates: np.ndarray, timeframe: str) -> np.ndarray:
+    """
+    日付を期間の番号に変換（同じ週・月の日付は同じ番号、日付順なら番号も昇順）
+
+    Args:
+        dates: datetime64 の配列（タイムゾーンなしの現地日付）
+        timeframe: 'weekly' または 'monthly'
+    """
+    if timeframe == 'weekly':
+        days = dates.astype('datetime64[D]').astype(np.int64)
+        return (days + _WEEK_SHIFT_DAYS) // 7
+    if timeframe == 'monthly':
+        return dates.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f'不明な時間軸です: {timeframe}')
+
+
+def period_start(key: int, timeframe: str) -> np.datetime64:
+    """period_keys の番号 → その期間の初日（datetime64[ns]）"""
+    if timeframe == 'weekly':
+        return np.datetime64(int(key) * 7 - _WEEK_SHIFT_DAYS, 'D').astype('datetime64[ns]')
+    return np.datetime64(int(key), 'M').astype('datetime64[ns]')
+
+
+def _aggregate(
+    dates: np.ndarray,
+    column: Callable[[str], np.ndarray],
+    timeframe: str
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """日付順の日足を期間ごとに集計（(上位足の日付, {'open': ..., ...}) を返す）"""
+    if len(dates) == 0:
+        return dates[:0], {field: np.empty(0) for field in ('open', 'high', 'low', 'close', 'volume')}
+    keys = period_keys(dates, timeframe)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(dates)) - 1
+    return dates[starts], {
+        'open': column('open')[starts],
+        # 欠損（NaN）の日は高値・安値の計算に含めない
+        'high': np.fmax.reduceat(column('high'), starts),
+        'low': np.fmin.reduceat(column('low'), starts),
+        'close': column('close')[ends],
+        'volume': np.add.reduceat(column('volume'), starts),
+    }
+
+
+def resample_bars(bars: np.ndarray, timeframe: str) -> np.ndarray:
+    """
+    日足の構造化配列（OHLCVCache の BAR_DTYPE）を上位足に変換
+
+    Args:
+        bars: date / open / high / low / close / volume を持つ日付順の構造化配列
+        timeframe: 'weekly' または 'monthly'
+
+    Returns:
+        同じ dtype の上位足
+    """
+    dates, values = _aggregate(bars['date'], lambda name: bars[name], timeframe)
+    out = np.empty(len(dates), dtype=bars.dtype)
+    out['date'] = dates
+    for name, array in values.items():
+        out[name] = array
+    return out
+
+
+def update_resampled(
+    resampled: Optional[np.ndarray],
+    bars: np.ndarray,
+    timeframe: str,
+    changed_from: Optional[np.datetime64] = None
+) -> np.ndarray:
+    """
+    日足の末尾が追加・更新された後の上位足を、変わった期間から先だけ集計し直す
+
+    上位足の最後の1本（未確定の可能性がある）と changed_from を含む期間の早い方から先を
+    日足から作り直し、それより前の確定済みの上位足はそのまま使う。
+
+    Args:
+        resampled: 前回の上位足（None の場合は全期間を集計）
+        bars: 更新後の日足（構造化配列）
+        timeframe: 'weekly' または 'monthly'
+        changed_from: 日足が変わった最初の日付（None の場合は上位足の最後の期間から）
+
+    Returns:
+        更新後の上位足
+    """
+    if resampled is None or len(resampled) == 0 or len(bars) == 0:
+        return resample_bars(bars, timeframe)
+
+    key = int(period_keys(resampled['date'][-1:], timeframe)[0])
+    if changed_from is not None:
+        key = min(key, int(period_keys(np.array([changed_from], dtype='datetime64[ns]'), timeframe)[0]))
+    start = period_start(key, timeframe)
+
+    kept = resampled[:np.searchsorted(resampled['date'], start, side='left')]
+    tail = bars[np.searchsorted(bars['date'], start, side='left'):]
+    return np.concatenate([kept, resample_bars(tail, timeframe)])
+
+
+def frame_dates(df: pd.DataFrame) -> np.ndarray:
+    """Date列（なければインデックス）をタイムゾーンなしの現地日付（datetime64[ns]）の配列に変換"""
+    date_col = next((c for c in ('Date', 'date', 'Datetime', 'datetime') if c in df.columns), None)
+    dates = df[date_col] if date_col is not None else df.index
+    if getattr(dates.dtype, 'tz', None) is not None:
+        dates = pd.DatetimeIndex(dates).tz_localize(None)
+    # DatetimeIndex.normalize は頻度の推定に時間がかかるため numpy で日単位に切り捨てる
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype('datetime64[ns]')
+
+
+def resample_columns(
+    column: Callable[[str], np.ndarray],
+    timeframe: str
+) -> Callable[[str], np.ndarray]:
+    """
+    カラム取得関数（TechnicalIndicators.calculate_latest_from_columns の column）を上位足に変換
+
+    Args:
+        column: 'date'（datetime64）と open/high/low/close/volume（float64）を返す関数
+        timeframe: 'weekly' または 'monthly'
+
+    Returns:
+        上位足のカラムを返す関数
+    """
+    dates, values = _aggregate(column('date'), column, timeframe)
+    values['date'] = dates
+    return values.__getitem__
+
+
+def resample_frame(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    get_historical_data 形式の日足を上位足に変換（daily はそのまま返す）
+
+    Args:
+        df: Date列（または日付インデックス）+ 小文字の open/high/low/close/volume
+        timeframe: 'daily' / 'weekly' / 'monthly'
+
+    Returns:
+        同じ形式（Date列 + 小文字カラム）のDataFrame（タイムゾーンは元の Date列に合わせる）
+    """
+    if timeframe == 'daily':
+        return df
+    dates, values = _aggregate(
+        frame_dates(df), lambda name: df[name].to_numpy(dtype=np.float64), timeframe
+    )
+    date_col = next((c for c in ('Date', 'date', 'Datetime', 'datetime') if c in df.columns), None)
+    tz = pd.DatetimeIndex(df[date_col] if date_col is not None else df.index).tz
+    index = pd.DatetimeIndex(dates, name='Date')
+    return pd.DataFrame({'Date': index.tz_localize(tz) if tz is not None else index, **values})
@@ -1,13 +1,33 @@
 """
 Yahoo Finance API ラッパークラス
 レート制限管理とエラーハンドリングを実装
+
+yfinance は読み込みに時間がかかる（pandas に加えて約0.2秒）ため、最初にネットワークから取得するときに読み込む。
+キャッシュ・スナップショットだけで応答するリクエストでは読み込まない。
 """
-import yfinance as yf
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import threading
 import time
 
+from utils.fetch_scheduler import TokenBucket, RateLimitError, SingleFlight, is_retryable
+from utils.ohlcv_cache import OHLCVCache
+from utils.fundamentals_cache import FundamentalsCache
+from utils.timeframes import INTERVAL_TIMEFRAMES
+
+
+def _yf():
+    """yfinance モジュール（初回呼び出し時に読み込む）"""
+    import yfinance
+
+    return yfinance
+
+
+# yf.download はモジュール変数（shared._DFS など）に結果を集めるため、同時に呼ぶと結果が混ざる・終わらない。
+# 全インスタンス・全スレッドで1回ずつ実行する（1回の中では yfinance が銘柄ごとに並列取得する）
+_download_lock = threading.Lock()
+
 
 class YFinanceWrapper:
     """
@@ -15,36 +35,88 @@ class YFinanceWrapper:
     - レート制限: 2,000 calls/hour (推定)
     - リトライロジック実装
     - エラーハンドリング
+    - 同じ銘柄・期間の日足の同時取得は1回にまとめる（キャッシュ設定時）
+    - 週足・月足はキャッシュの日足から作る（キャッシュ設定時）
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        rate_limiter: Optional[TokenBucket] = None,
+        cache: Optional[OHLCVCache] = None,
+        info_cache: Optional[FundamentalsCache] = None
+    ):
+        """
+        Args:
+            rate_limiter: 共有のトークンバケット（並列取得時に指定）
+                          未指定時は呼び出し間隔 min_interval で直列に制限
+            cache: 日足のローカルキャッシュ（未指定時は毎回ネットワークから取得）
+            info_cache: 銘柄基本情報のキャッシュ（未指定時は毎回 ticker.info を取得）
+        """
         self.last_call_time = None
         self.min_interval = 0.5  # 最小呼び出し間隔（秒）
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.info_cache = info_cache
+
+        # 取得中の日足（(シンボル, 期間) → 取得中の処理）。後から要求したスレッドは完了を待って結果を共有する
+        self.history_flights = SingleFlight()
+
+    def _rate_limit(self, calls: int = 1):
+        """
+        レート制限を適用
+
+        Args:
+            calls: これから送るリクエスト数（yf.download は銘柄数）。
+                   トークンバケットでは calls 個のトークンを取得する
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(calls)
+            return
 
-    def _rate_limit(self):
-        """レート制限を適用"""
         if self.last_call_time:
             elapsed = time.time() - self.last_call_time
             if elapsed < self.min_interval:
                 time.sleep(self.min_interval - elapsed)
         self.last_call_time = time.time()
 
-    def get_stock_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+    def _download(self, tickers: List[str], **kwargs) -> pd.DataFrame:
+        """
+        yf.download を他のスレッドと重ならないように実行
+
+        yf.download は銘柄ごとに1リクエストを送るため、レート制限は銘柄数分を適用する。
+        """
+        with _download_lock:
+            self._rate_limit(len(tickers))
+            return _yf().download(tickers=tickers, **kwargs)
+
+    def get_stock_info(
+        self,
+        symbol: str,
+        raise_errors: bool = False,
+        fields: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         銘柄の基本情報を取得
 
         Args:
             symbol: ティッカーシンボル
+            raise_errors: Trueの場合は例外を送出（FetchSchedulerでのリトライ用）
+            fields: 必要な項目（キャッシュ設定時、これらが有効期限内ならキャッシュを返す）
 
         Returns:
             銘柄情報の辞書、エラー時はNone
         """
+        if self.info_cache is not None:
+            cached = self.info_cache.get(symbol, fields)
+            if cached is not None:
+                return cached
+
         try:
             self._rate_limit()
-            ticker = yf.Ticker(symbol)
+            ticker = _yf().Ticker(symbol)
             info = ticker.info
 
-            return {
+            result = {
                 'symbol': symbol,
                 'name': info.get('longName', ''),
                 'sector': info.get('sector', ''),
@@ -54,7 +126,14 @@ class YFinanceWrapper:
                 'exchange': info.get('exchange', ''),
                 'country': info.get('country', 'US'),
             }
+
+            if self.info_cache is not None:
+                self.info_cache.put(symbol, result)
+
+            return result
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error fetching info for {symbol}: {e}")
             return None
 
@@ -62,35 +141,333 @@ class YFinanceWrapper:
         self,
         symbol: str,
         period: str = "6mo",
-        interval: str = "1d"
+        interval: str = "1d",
+        raise_errors: bool = False
     ) -> Optional[pd.DataFrame]:
         """
         過去の株価データを取得
 
+        キャッシュ設定時の日足はローカルキャッシュから読み、
+        不足している末尾だけをネットワークから取得する。
+        同じ銘柄・期間を取得中のスレッドがあれば、その結果（の複製）を返す。
+        週足（1wk）・月足（1mo）はキャッシュの日足から作り、ネットワークからは取得しない。
+
         Args:
             symbol: ティッカーシンボル
             period: 期間 (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)
             interval: 間隔 (1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo)
+            raise_errors: Trueの場合は例外を送出（FetchSchedulerでのリトライ用）
 
         Returns:
             DataFrameまたはNone
         """
         try:
-            self._rate_limit()
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(period=period, interval=interval)
+            timeframe = INTERVAL_TIMEFRAMES.get(interval)
+            if self.cache is not None and timeframe is not None:
+                df, leader = self.history_flights.do(
+                    (symbol, period), lambda: self._get_cached_history(symbol, period, raise_errors)
+                )
+                if df is not None and timeframe != 'daily':
+                    return self.cache.load(symbol, period, timeframe)
+                return df if leader or df is None else df.copy()
+            return self._fetch_history(symbol, period=period, interval=interval, raise_errors=raise_errors)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error fetching historical data for {symbol}: {e}")
+            return None
+
+    def _fetch_history(
+        self,
+        symbol: str,
+        period: Optional[str] = None,
+        start: Optional[str] = None,
+        interval: str = "1d",
+        raise_errors: bool = False
+    ) -> Optional[pd.DataFrame]:
+        """Ticker.history でネットワークから取得（カラム名は小文字に統一）"""
+        self._rate_limit()
+        ticker = _yf().Ticker(symbol)
+        if start is not None:
+            df = ticker.history(start=start, interval=interval, raise_errors=raise_errors)
+        else:
+            df = ticker.history(period=period, interval=interval, raise_errors=raise_errors)
+
+        if df.empty:
+            return None
 
-            if df.empty:
+        # カラム名を小文字に統一
+        df.columns = [col.lower() for col in df.columns]
+        df.reset_index(inplace=True)
+
+        return df
+
+    def _get_cached_history(self, symbol: str, period: str, raise_errors: bool) -> Optional[pd.DataFrame]:
+        """キャッシュ経由で日足を取得（差分のみネットワークから取得）"""
+        action, start = self.cache.plan(symbol, period)
+
+        if action == 'delta':
+            try:
+                delta = self._fetch_history(symbol, start=start, raise_errors=True)
+            except Exception as e:
+                if is_retryable(e):
+                    if raise_errors:
+                        raise
+                    # 取得できなくても手元の履歴は返す（確認日は更新しない）
+                    print(f"Error fetching history delta for {symbol}: {e}")
+                    return self.cache.load(symbol, period)
+                # 新しい足がない（休場日など）
+                delta = None
+            if not self.cache.merge(symbol, delta):
+                print(f"♻️ {symbol}: 分割・配当調整を検出したため履歴を再取得")
+                action = 'full'
+
+        if action == 'full':
+            df = self._fetch_history(symbol, period=period, raise_errors=raise_errors)
+            if df is None:
                 return None
+            self.cache.store(symbol, df, period)
+
+        return self.cache.load(symbol, period)
+
+    def get_historical_data_bulk(
+        self,
+        symbols: List[str],
+        period: str = "6mo",
+        interval: str = "1d",
+        chunk_size: int = 100,
+        raise_errors: bool = False
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        複数銘柄の過去データを yf.download でまとめて取得
+
+        chunk_size 銘柄ごとに yf.download で取得し（yf.download は全スレッドで同時に1回まで、
+        レート制限は銘柄数分を適用）、銘柄別のDataFrame
+        （get_historical_data と同じ Date列 + 小文字カラムの形式）に分割する。
+        一括取得で失敗した銘柄だけを get_historical_data で個別に再取得するため、
+        1銘柄の不具合でチャンク全体を失うことはない。
+        キャッシュ設定時の日足は、未キャッシュ銘柄の全期間と
+        キャッシュ済み銘柄の差分（最終確定日が同じ銘柄ごと）だけを一括取得する。
+        他のスレッドが取得中の銘柄は取得せず、その完了を待って結果を共有する。
+        週足（1wk）・月足（1mo）は日足を同じ方法で取得し、キャッシュの日足から作る。
+        パネル形式が必要な場合は TechnicalIndicators.build_panel に渡す。
+
+        Args:
+            symbols: ティッカーシンボルのリスト
+            period: 期間 (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)
+            interval: 間隔 (1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo)
+            chunk_size: 1回の yf.download で取得する銘柄数
+            raise_errors: Trueの場合、チャンク全体がレート制限で失敗したら例外を送出
+
+        Returns:
+            シンボルをキーとしたDataFrameの辞書（取得できなかった銘柄は含まない）
+        """
+        timeframe = INTERVAL_TIMEFRAMES.get(interval)
+        if self.cache is not None and timeframe is not None:
+            frames = self._get_shared_history_bulk(symbols, period, chunk_size, raise_errors)
+            if timeframe == 'daily':
+                return frames
+            resampled = {symbol: self.cache.load(symbol, period, timeframe) for symbol in frames}
+            return {symbol: df for symbol, df in resampled.items() if df is not None}
+
+        frames, errors = self._download_history_chunks(
+            symbols, chunk_size, raise_errors, period=period, interval=interval
+        )
+
+        # 失敗した銘柄のみ個別に再取得
+        for symbol in errors:
+            df = self.get_historical_data(symbol, period=period, interval=interval)
+            if df is not None:
+                frames[symbol] = df
+
+        return frames
+
+    def _get_shared_history_bulk(
+        self,
+        symbols: List[str],
+        period: str,
+        chunk_size: int,
+        raise_errors: bool
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        他のスレッドが取得中でない銘柄だけを一括取得し、取得中の銘柄はその完了を待つ
+
+        自分の担当分を取得し終えてから待つため、担当が重なる一括取得同士でも待ち合いにはならない。
+        """
+        owned: Dict[str, Any] = {}
+        waiting: Dict[str, Any] = {}
+        for symbol in dict.fromkeys(symbols):
+            call, leader = self.history_flights.begin((symbol, period))
+            (owned if leader else waiting)[symbol] = call
+
+        try:
+            frames = self._get_cached_history_bulk(list(owned), period, chunk_size, raise_errors) if owned else {}
+        except BaseException as e:
+            for symbol, call in owned.items():
+                self.history_flights.finish((symbol, period), call, error=e)
+            raise
+        for symbol, call in owned.items():
+            self.history_flights.finish((symbol, period), call, result=frames.get(symbol))
+
+        for symbol, call in waiting.items():
+            try:
+                df = call.wait()
+            except Exception as e:
+                if raise_errors and is_retryable(e):
+                    raise
+                print(f"Error fetching historical data for {symbol}: {e}")
+                continue
+            if df is not None:
+                frames[symbol] = df.copy()
+
+        return {symbol: frames[symbol] for symbol in symbols if symbol in frames}
+
+    def _get_cached_history_bulk(
+        self,
+        symbols: List[str],
+        period: str,
+        chunk_size: int,
+        raise_errors: bool
+    ) -> Dict[str, pd.DataFrame]:
+        """キャッシュ経由の一括取得（全期間・差分をそれぞれまとめて取得）"""
+        full: List[str] = []
+        deltas: Dict[str, List[str]] = {}
+        for symbol in symbols:
+            action, start = self.cache.plan(symbol, period)
+            if action == 'full':
+                full.append(symbol)
+            elif action == 'delta':
+                deltas.setdefault(start, []).append(symbol)
+
+        retry: List[str] = []
+
+        if full:
+            frames, errors = self._download_history_chunks(full, chunk_size, raise_errors, period=period)
+            for symbol, df in frames.items():
+                self.cache.store(symbol, df, period)
+            retry.extend(errors)
+
+        for start, group in deltas.items():
+            # 配当・分割列も取得して調整を検出する
+            frames, errors = self._download_history_chunks(
+                group, chunk_size, raise_errors, start=start, actions=True
+            )
+            for symbol, df in frames.items():
+                if not self.cache.merge(symbol, df):
+                    retry.append(symbol)
+            for symbol, error in errors.items():
+                if is_retryable(error):
+                    retry.append(symbol)
+                else:
+                    # 新しい足がない（休場日など）
+                    self.cache.merge(symbol, None)
+
+        # 失敗・調整検出の銘柄のみ個別に再取得（取得中の処理として登録済みのため get_historical_data は使わない）
+        for symbol in retry:
+            try:
+                self._get_cached_history(symbol, period, raise_errors=False)
+            except Exception as e:
+                print(f"Error fetching historical data for {symbol}: {e}")
+
+        results = {}
+        for symbol in symbols:
+            df = self.cache.load(symbol, period)
+            if df is not None:
+                results[symbol] = df
+        return results
+
+    def _download_history_chunks(
+        self,
+        symbols: List[str],
+        chunk_size: int,
+        raise_errors: bool,
+        **download_kwargs
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Exception]]:
+        """
+        chunk_size 銘柄ずつ yf.download で取得して銘柄別に分割
+
+        Returns:
+            (取得できた銘柄のDataFrame, 取得できなかった銘柄の例外)。
+            例外は is_retryable でリトライ対象か判定できる
+            （yf.download が送出した例外はそのまま、データなしは LookupError、
+            チャンク全体がデータなしは RateLimitError）
+        """
+        results: Dict[str, pd.DataFrame] = {}
+        failed: Dict[str, Exception] = {}
+
+        for start in range(0, len(symbols), chunk_size):
+            chunk = list(symbols[start:start + chunk_size])
+            try:
+                data = self._download(
+                    chunk,
+                    group_by='ticker',
+                    auto_adjust=True,  # Ticker.history と同じ調整済み価格
+                    ignore_tz=False,
+                    threads=True,
+                    progress=False,
+                    **download_kwargs
+                )
+            except Exception as e:
+                if raise_errors and is_retryable(e):
+                    raise
+                print(f"Error in bulk history download: {e}")
+                failed.update({symbol: e for symbol in chunk})
+                continue
+
+            # yf.download は銘柄ごとのエラーを返さないため、データのない銘柄を失敗とする。
+            # 複数銘柄のチャンクが全銘柄データなしの場合はレート制限・通信障害とみなす
+            frames = self._split_download(data, chunk)
+            if not frames and len(chunk) > 1:
+                error = RateLimitError(f"Bulk history download returned no data: {len(chunk)} symbols")
+                if raise_errors:
+                    raise error
+                print(error)
+                failed.update({symbol: error for symbol in chunk})
+                continue
+
+            for symbol in chunk:
+                if symbol in frames:
+                    results[symbol] = frames[symbol]
+                else:
+                    failed[symbol] = LookupError(f"No data returned: {symbol}")
+
+        return results, failed
+
+    @staticmethod
+    def _split_download(data: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        yf.download(group_by='ticker') の結果を銘柄別DataFrameに分割
+
+        全銘柄で日付が揃えられているため、銘柄ごとに全NaNの行（上場前など）を除く。
+        全行NaNの銘柄は取得失敗とみなして含めない。
+        """
+        frames: Dict[str, pd.DataFrame] = {}
+        if data is None or data.empty:
+            return frames
+
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                df = data[symbol]
+            else:
+                # 1銘柄のみの場合はMultiIndexにならない
+                df = data
+
+            valid = df.notna().any(axis=1).to_numpy()
+            if not valid.any():
+                continue
+            if not valid.all():
+                df = df[valid]
 
             # カラム名を小文字に統一
-            df.columns = [col.lower() for col in df.columns]
-            df.reset_index(inplace=True)
+            # （data[symbol] の列の取り出し・欠損行の除外・reset_index はそれぞれ複製を作る）
+            index_name = df.index.name
+            df = df.reset_index()
+            df.columns = [col if col == index_name else str(col).lower() for col in df.columns]
+            frames[symbol] = df
 
-            return df
-        except Exception as e:
-            print(f"Error fetching historical data for {symbol}: {e}")
-            return None
+        return frames
 
     def get_multiple_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
         """
@@ -106,9 +483,8 @@ class YFinanceWrapper:
 
         # yfin download を使用した一括取得
         try:
-            self._rate_limit()
-            data = yf.download(
-                tickers=symbols,
+            data = self._download(
+                symbols,
                 period="1d",
                 interval="1d",
                 group_by='ticker',
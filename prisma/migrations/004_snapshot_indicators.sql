@@ -0,0 +1,38 @@
+-- =============================================================================
+-- スクリーニング用スナップショット列の追加
+-- cron/update-snapshot.py が毎晩全銘柄の最新指標とスコアを書き込み、
+-- /api/screen の snapshot モードはこのテーブルから応答する
+-- =============================================================================
+--
+-- 実行方法:
+-- 003_unified_schema.sql の適用後、Supabase Dashboard → SQL Editor で実行
+-- =============================================================================
+
+-- カラム追加: スクリーニングで参照する指標（既存カラムはそのまま）
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS ma_150 DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS ema_10 DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS ema_21 DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS bb_upper DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS bb_middle DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS bb_lower DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS vwap DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS week_52_high DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS week_52_low DECIMAL(12, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS distance_ma_10 DECIMAL(10, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS distance_ma_20 DECIMAL(10, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS distance_ma_50 DECIMAL(10, 4);
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS distance_ma_200 DECIMAL(10, 4);
+
+-- screen.py の _calculate_score（0-100点）
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS screen_score INT;
+
+-- yfinance の country は国名（'United States' など）のため2文字では収まらない
+ALTER TABLE stocks ALTER COLUMN country TYPE VARCHAR(100);
+
+-- インデックス: スナップショットのスコア順取得
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_stock_data_date_screen_score') THEN
+    CREATE INDEX idx_stock_data_date_screen_score ON stock_data(date DESC, screen_score DESC);
+  END IF;
+END $$;